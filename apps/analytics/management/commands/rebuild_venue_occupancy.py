@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.analytics.occupancy import rebuild_venue
+from apps.venues.models import Venue
+
+
+class Command(BaseCommand):
+    help = 'Rebuild precomputed venue occupancy bitmaps and venue analytics from bookings and events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--venue', help='Slug of a single venue to rebuild')
+        parser.add_argument('--months', type=int, default=12, help='Trailing months to rebuild (default: 12)')
+        parser.add_argument('--missing', action='store_true', help='Only backfill venues never precomputed')
+
+    def handle(self, *args, **options):
+        venues = Venue.objects.all()
+        if options['venue']:
+            venues = venues.filter(slug=options['venue'])
+        if options['missing']:
+            venues = venues.filter(occupancy_months__isnull=True)
+
+        count = 0
+        for venue in venues.iterator():
+            rebuild_venue(venue, months=options['months'])
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt occupancy for {count} venue(s).'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_initial'),
+        ('venues', '0003_alter_venuebookingrequest_requester'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('slot_bitmap', models.BinaryField(default=bytes)),
+                ('daily_totals', models.JSONField(blank=True, default=list)),
+                ('bookings_count', models.PositiveIntegerField(default=0)),
+                ('events_count', models.PositiveIntegerField(default=0)),
+                ('booked_minutes', models.PositiveIntegerField(default=0)),
+                ('guests', models.PositiveIntegerField(default=0)),
+                ('weekday_slots', models.PositiveIntegerField(default=0)),
+                ('weekend_slots', models.PositiveIntegerField(default=0)),
+                ('booking_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('event_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy_months', to='venues.venue')),
+            ],
+            options={
+                'verbose_name_plural': 'Venue occupancy',
+                'ordering': ['-month'],
+                'unique_together': {('venue', 'month')},
+            },
+        ),
+    ]
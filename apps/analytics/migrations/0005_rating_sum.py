@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:40
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    for model_name, field in (('EventAnalytics', 'event'), ('VenueAnalytics', 'venue')):
+        Analytics = apps.get_model('analytics', model_name)
+        totals = Review.objects.filter(status='approved', **{f'{field}__isnull': False}).values(f'{field}_id').annotate(
+            count=Count('pk'),
+            total=Sum('rating'),
+        ).order_by()
+        for row in totals:
+            Analytics.objects.update_or_create(
+                **{f'{field}_id': row[f'{field}_id']},
+                defaults={
+                    'reviews_count': row['count'],
+                    'rating_sum': row['total'],
+                    'average_rating': round(row['total'] / row['count'], 2),
+                },
+            )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_venueoccupancy'),
+        ('reviews', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventanalytics',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='venueanalytics',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -26,6 +26,7 @@ class EventAnalytics(TimeStampedModel):
     shares = models.PositiveIntegerField(default=0)
     comments_count = models.PositiveIntegerField(default=0)
     reviews_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     
     class Meta:
@@ -56,6 +57,7 @@ class VenueAnalytics(TimeStampedModel):
     
     # Rating metrics
     reviews_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     
     class Meta:
@@ -148,3 +150,38 @@ class UserActivity(TimeStampedModel):
     
     def __str__(self):
         return f"{self.user.username} - {self.get_activity_type_display()} at {self.created_at}"
+
+
+class VenueOccupancy(TimeStampedModel):
+    """Precomputed monthly occupancy for a venue, one bitmap of half-hour slots per day"""
+    
+    venue = models.ForeignKey('venues.Venue', on_delete=models.CASCADE, related_name='occupancy_months')
+    month = models.DateField(help_text='First day of the month')
+    
+    # Occupancy bitmaps: SLOT_BYTES per day of the month, one bit per half-hour slot
+    slot_bitmap = models.BinaryField(default=bytes)
+    
+    # Per-day [bookings, revenue in cents, guests], indexed by day of month - 1
+    daily_totals = models.JSONField(default=list, blank=True)
+    
+    # Monthly totals
+    bookings_count = models.PositiveIntegerField(default=0)
+    events_count = models.PositiveIntegerField(default=0)
+    booked_minutes = models.PositiveIntegerField(default=0)
+    guests = models.PositiveIntegerField(default=0)
+    weekday_slots = models.PositiveIntegerField(default=0)
+    weekend_slots = models.PositiveIntegerField(default=0)
+    booking_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    event_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    class Meta:
+        ordering = ['-month']
+        unique_together = ['venue', 'month']
+        verbose_name_plural = 'Venue occupancy'
+    
+    def __str__(self):
+        return f"Occupancy for {self.venue.name} - {self.month:%Y-%m}"
+    
+    @property
+    def total_revenue(self):
+        return self.booking_revenue + self.event_revenue
@@ -0,0 +1,336 @@
+"""
+Venue occupancy engine.
+
+Approved booking requests and hosted events are folded into one
+``VenueOccupancy`` row per venue and month. Every day of the month is stored
+as a bitmap of half-hour slots, so dashboards can compute utilization, booked
+hours and revenue for any window from a handful of small rows instead of
+scanning the booking and event tables.
+"""
+import calendar
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOT_BYTES = SLOTS_PER_DAY // 8
+
+# Hours a venue can be booked; only these slots count towards utilization
+OPEN_HOUR, CLOSE_HOUR = getattr(settings, 'VENUE_OPERATING_HOURS', (8, 24))
+OPEN_SLOTS = (CLOSE_HOUR - OPEN_HOUR) * 60 // SLOT_MINUTES
+OPEN_MASK = ((1 << (CLOSE_HOUR * 60 // SLOT_MINUTES)) - 1) & ~((1 << (OPEN_HOUR * 60 // SLOT_MINUTES)) - 1)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    """Shift a first-of-month date by ``count`` months."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def days_in_month(month):
+    return calendar.monthrange(month.year, month.month)[1]
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _end_minutes(start_time, end_time):
+    """End of a booking in minutes; bookings running past midnight are clamped to the day."""
+    end = _minutes(end_time)
+    if end <= _minutes(start_time):
+        end = 24 * 60
+    return end
+
+
+def slot_mask(start_time, end_time):
+    """Bitmask of the half-hour slots touched by a start/end time pair."""
+    first = _minutes(start_time) // SLOT_MINUTES
+    last = -(-_end_minutes(start_time, end_time) // SLOT_MINUTES)
+    return ((1 << last) - 1) & ~((1 << first) - 1)
+
+
+def booking_minutes(start_time, end_time):
+    return _end_minutes(start_time, end_time) - _minutes(start_time)
+
+
+def booking_value(quoted_price, hourly_rate, start_time, end_time):
+    """Revenue of a booking: the quoted price, or the hourly rate for the booked time."""
+    if quoted_price is not None:
+        return quoted_price
+    hours = Decimal(booking_minutes(start_time, end_time)) / 60
+    return (hourly_rate * hours).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def pack_days(masks):
+    return b''.join(mask.to_bytes(SLOT_BYTES, 'little') for mask in masks)
+
+
+def unpack_days(bitmap):
+    bitmap = bytes(bitmap or b'')
+    return [
+        int.from_bytes(bitmap[offset:offset + SLOT_BYTES], 'little')
+        for offset in range(0, len(bitmap), SLOT_BYTES)
+    ]
+
+
+def _cents(amount):
+    return int((amount * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def build_month(venue, month):
+    """Compute the occupancy fields for one venue and month from the source tables."""
+    from apps.events.models import Event
+    from apps.venues.models import VenueBookingRequest
+
+    month = month_start(month)
+    day_count = days_in_month(month)
+    month_end = month.replace(day=day_count)
+
+    booking_masks = [0] * day_count
+    event_masks = [0] * day_count
+    daily_totals = [[0, 0, 0] for _ in range(day_count)]  # bookings, revenue cents, guests
+    booking_revenue = Decimal('0')
+    event_revenue = Decimal('0')
+
+    bookings = VenueBookingRequest.objects.filter(
+        venue=venue,
+        status=VenueBookingRequest.Status.APPROVED,
+        booking_date__range=(month, month_end),
+    ).values_list('booking_date', 'start_time', 'end_time', 'expected_attendees', 'quoted_price')
+
+    for booking_date, start_time, end_time, attendees, quoted_price in bookings:
+        index = booking_date.day - 1
+        value = booking_value(quoted_price, venue.hourly_rate, start_time, end_time)
+        booking_masks[index] |= slot_mask(start_time, end_time)
+        daily_totals[index][0] += 1
+        daily_totals[index][1] += _cents(value)
+        daily_totals[index][2] += attendees
+        booking_revenue += value
+
+    events = Event.objects.filter(
+        venue=venue,
+        status__in=[Event.Status.PUBLISHED, Event.Status.COMPLETED],
+        event_date__range=(month, month_end),
+    ).values_list('event_date', 'start_time', 'end_time')
+
+    events_count = 0
+    for event_date, start_time, end_time in events:
+        index = event_date.day - 1
+        mask = slot_mask(start_time, end_time)
+        # Events usually sit inside an approved booking; only bill slots nobody paid for yet
+        unbilled_slots = (mask & ~booking_masks[index] & ~event_masks[index]).bit_count()
+        event_masks[index] |= mask
+        value = (venue.hourly_rate * unbilled_slots * SLOT_MINUTES / 60).quantize(Decimal('0.01'))
+        daily_totals[index][1] += _cents(value)
+        event_revenue += value
+        events_count += 1
+
+    day_masks = [booking | event for booking, event in zip(booking_masks, event_masks)]
+    weekday_slots = weekend_slots = 0
+    for index, mask in enumerate(day_masks):
+        open_slots = (mask & OPEN_MASK).bit_count()
+        if month.replace(day=index + 1).weekday() < 5:
+            weekday_slots += open_slots
+        else:
+            weekend_slots += open_slots
+
+    return {
+        'slot_bitmap': pack_days(day_masks),
+        'daily_totals': daily_totals,
+        'bookings_count': sum(day[0] for day in daily_totals),
+        'events_count': events_count,
+        'booked_minutes': sum(mask.bit_count() for mask in day_masks) * SLOT_MINUTES,
+        'guests': sum(day[2] for day in daily_totals),
+        'weekday_slots': weekday_slots,
+        'weekend_slots': weekend_slots,
+        'booking_revenue': booking_revenue,
+        'event_revenue': event_revenue,
+    }
+
+
+def refresh_venue_months(venue, months):
+    """Rebuild the occupancy rows for the given months and resync the venue's analytics."""
+    from .models import VenueOccupancy
+
+    for month in {month_start(month) for month in months}:
+        VenueOccupancy.objects.update_or_create(
+            venue=venue,
+            month=month,
+            defaults=build_month(venue, month),
+        )
+    sync_venue_analytics(venue)
+
+
+def refresh_on_commit(venue_id, days):
+    """
+    Rebuild the venue months containing ``days`` once the surrounding transaction commits.
+
+    Bulk ``update()`` calls skip model signals, so code that changes bookings
+    or events in bulk calls this directly.
+    """
+    from apps.venues.models import Venue
+
+    # Instances saved straight from form data still hold their dates as strings
+    months = {month_start(date.fromisoformat(day) if isinstance(day, str) else day) for day in days if day}
+
+    def refresh():
+        venue = Venue.objects.filter(pk=venue_id).first()
+        if venue is not None:
+            refresh_venue_months(venue, months)
+
+    transaction.on_commit(refresh)
+
+
+def rebuild_venue(venue, months=12, today=None):
+    """Rebuild the trailing ``months`` of occupancy plus every month with future bookings."""
+    from apps.venues.models import VenueBookingRequest
+
+    today = today or date.today()
+    current = month_start(today)
+    targets = {add_months(current, -offset) for offset in range(months)}
+    targets.update(
+        month_start(booking_date)
+        for booking_date in VenueBookingRequest.objects.filter(
+            venue=venue,
+            booking_date__gt=today,
+        ).values_list('booking_date', flat=True).distinct()
+    )
+    refresh_venue_months(venue, targets)
+
+
+def sync_venue_analytics(venue):
+    """Fold the occupancy rows and booking status counts into the venue's ``VenueAnalytics`` row."""
+    from apps.venues.models import VenueBookingRequest
+    from .models import VenueAnalytics
+
+    occupancy = venue.occupancy_months.aggregate(
+        booking_revenue=Sum('booking_revenue'),
+        event_revenue=Sum('event_revenue'),
+        events_count=Sum('events_count'),
+        occupied_slots=Sum('weekday_slots') + Sum('weekend_slots'),
+    )
+    statuses = venue.booking_requests.aggregate(
+        total=Count('id'),
+        confirmed=Count('id', filter=Q(status=VenueBookingRequest.Status.APPROVED)),
+        cancelled=Count('id', filter=Q(status__in=[
+            VenueBookingRequest.Status.REJECTED,
+            VenueBookingRequest.Status.CANCELLED,
+        ])),
+    )
+
+    open_slots = sum(
+        days_in_month(month) for month in venue.occupancy_months.values_list('month', flat=True)
+    ) * OPEN_SLOTS
+    booking_revenue = occupancy['booking_revenue'] or Decimal('0')
+    gross_revenue = booking_revenue + (occupancy['event_revenue'] or Decimal('0'))
+
+    VenueAnalytics.objects.update_or_create(
+        venue=venue,
+        defaults={
+            'total_bookings': statuses['total'],
+            'confirmed_bookings': statuses['confirmed'],
+            'cancelled_bookings': statuses['cancelled'],
+            'gross_revenue': gross_revenue,
+            'net_revenue': gross_revenue,
+            'average_booking_value': (
+                round(booking_revenue / statuses['confirmed'], 2) if statuses['confirmed'] else 0
+            ),
+            'occupancy_rate': (
+                round(Decimal((occupancy['occupied_slots'] or 0) * 100) / open_slots, 2) if open_slots else 0
+            ),
+            'total_events_hosted': occupancy['events_count'] or 0,
+        },
+    )
+
+
+def _percentage(part, whole):
+    return round(part * 100 / whole) if whole else 0
+
+
+def summarize_occupancy(venues, start, end):
+    """
+    Aggregate the occupancy rows of ``venues`` over the inclusive ``start``-``end`` window.
+
+    Reads one row per venue and month; per-day figures come from the bitmaps
+    and daily totals stored on each row.
+    """
+    from .models import VenueOccupancy
+
+    rows = VenueOccupancy.objects.filter(
+        venue__in=venues,
+        month__range=(month_start(start), end),
+    ).values_list('month', 'slot_bitmap', 'daily_totals')
+
+    summary = {
+        'bookings': 0,
+        'revenue_cents': 0,
+        'guests': 0,
+        'booked_minutes': 0,
+        'weekday_slots': 0,
+        'weekend_slots': 0,
+        'weekday_capacity': 0,
+        'weekend_capacity': 0,
+        'bookings_by_weekday': [0] * 7,
+    }
+    venue_count = len(venues) if isinstance(venues, (list, tuple)) else venues.count()
+
+    for month, bitmap, daily_totals in rows:
+        for index, mask in enumerate(unpack_days(bitmap)):
+            day = month.replace(day=index + 1)
+            if not start <= day <= end:
+                continue
+            bookings, revenue_cents, guests = daily_totals[index]
+            summary['bookings'] += bookings
+            summary['revenue_cents'] += revenue_cents
+            summary['guests'] += guests
+            summary['booked_minutes'] += mask.bit_count() * SLOT_MINUTES
+            summary['bookings_by_weekday'][day.weekday()] += bookings
+            key = 'weekday_slots' if day.weekday() < 5 else 'weekend_slots'
+            summary[key] += (mask & OPEN_MASK).bit_count()
+
+    day = start
+    while day <= end:
+        key = 'weekday_capacity' if day.weekday() < 5 else 'weekend_capacity'
+        summary[key] += OPEN_SLOTS * venue_count
+        day += timedelta(days=1)
+
+    summary['revenue'] = Decimal(summary['revenue_cents']) / 100
+    summary['weekday_utilization'] = _percentage(summary['weekday_slots'], summary['weekday_capacity'])
+    summary['weekend_utilization'] = _percentage(summary['weekend_slots'], summary['weekend_capacity'])
+    summary['utilization'] = _percentage(
+        summary['weekday_slots'] + summary['weekend_slots'],
+        summary['weekday_capacity'] + summary['weekend_capacity'],
+    )
+    return summary
+
+
+def monthly_revenue(venues, first_month, last_month):
+    """Total revenue per month for ``venues``, oldest first, as ``(month, amount)`` pairs."""
+    from .models import VenueOccupancy
+
+    totals = {
+        row['month']: (row['booking_revenue'] or 0) + (row['event_revenue'] or 0)
+        for row in VenueOccupancy.objects.filter(
+            venue__in=venues,
+            month__range=(first_month, last_month),
+        ).values('month').annotate(
+            booking_revenue=Sum('booking_revenue'),
+            event_revenue=Sum('event_revenue'),
+        )
+    }
+    series = []
+    month = first_month
+    while month <= last_month:
+        series.append((month, totals.get(month, Decimal('0'))))
+        month = add_months(month, 1)
+    return series
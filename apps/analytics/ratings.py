@@ -0,0 +1,45 @@
+"""
+Review ratings on ``EventAnalytics`` and ``VenueAnalytics``.
+
+Each review change arrives as signed deltas (see ``apps.reviews.summaries``)
+and is applied with a single ``UPDATE ... SET reviews_count = reviews_count
++ n, rating_sum = rating_sum + s`` per target. The average is recomputed in
+the same statement from the stored sum, so it never drifts from rounding.
+"""
+from django.db.models import Case, DecimalField, F, FloatField, Value, When
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThan
+
+from apps.reviews.summaries import target_deltas
+from .models import EventAnalytics, VenueAnalytics
+
+
+def _rating_updates(count, total):
+    new_count = F('reviews_count') + count
+    new_sum = F('rating_sum') + total
+    return {
+        'reviews_count': new_count,
+        'rating_sum': new_sum,
+        'average_rating': Case(
+            When(GreaterThan(new_count, 0), then=Round(Cast(new_sum, FloatField()) / new_count, 2)),
+            default=Value(0),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+    }
+
+
+def apply_rating_changes(changes):
+    """Apply ``(state, sign)`` review changes to the analytics rows of their targets."""
+    for (event_id, venue_id), delta in target_deltas(changes).items():
+        count = delta.get('review_count', 0)
+        total = delta.get('rating_sum', 0)
+        if event_id:
+            model, target = EventAnalytics, {'event_id': event_id}
+        else:
+            model, target = VenueAnalytics, {'venue_id': venue_id}
+        if model.objects.filter(**target).update(**_rating_updates(count, total)):
+            continue
+        # Rows are created on first use; a missing one has nothing to take away from
+        if count >= 0 and total >= 0:
+            model.objects.get_or_create(**target)
+            model.objects.filter(**target).update(**_rating_updates(count, total))
@@ -0,0 +1,104 @@
+"""
+Keep precomputed venue occupancy and review ratings in step with their sources
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.events.models import Event
+from apps.reviews.summaries import deleted_changes, saved_changes
+from .occupancy import refresh_on_commit
+from .ratings import apply_rating_changes
+
+
+# Fields the occupancy rows and venue analytics are built from, venue and day first
+BOOKING_FIELDS = ('venue', 'booking_date', 'start_time', 'end_time', 'status', 'expected_attendees', 'quoted_price')
+EVENT_FIELDS = ('venue', 'event_date', 'start_time', 'end_time', 'status')
+COUNTED_EVENT_STATUSES = (Event.Status.PUBLISHED, Event.Status.COMPLETED)
+
+
+def _attnames(model, fields):
+    return [model._meta.get_field(name).attname for name in fields]
+
+
+def _slot(instance, fields):
+    """The instance's values of ``fields``, with form strings parsed as the database returns them."""
+    return tuple(
+        field.to_python(getattr(instance, field.attname))
+        for field in map(instance._meta.get_field, fields)
+    )
+
+
+def _event_slot(values):
+    # Drafts and cancelled events occupy nothing
+    return values if values and values[4] in COUNTED_EVENT_STATUSES else None
+
+
+def _remember_previous(instance, fields, update_fields):
+    # Saves that touch none of the fields cannot move the occupancy
+    instance._occupancy_unchanged = update_fields is not None and not (
+        set(fields) | set(_attnames(instance, fields))
+    ).intersection(update_fields)
+    instance._occupancy_previous = None
+    if instance.pk and not instance._occupancy_unchanged:
+        instance._occupancy_previous = type(instance).objects.filter(pk=instance.pk).values_list(
+            *_attnames(instance, fields)
+        ).first()
+
+
+def _refresh(*slots):
+    touched = {}
+    for slot in slots:
+        if slot and slot[0] is not None:
+            touched.setdefault(slot[0], set()).add(slot[1])
+    for venue_id, days in touched.items():
+        refresh_on_commit(venue_id, days)
+
+
+def _refresh_saved(instance, fields, counted=lambda values: values):
+    if getattr(instance, '_occupancy_unchanged', False):
+        return
+    previous = counted(getattr(instance, '_occupancy_previous', None))
+    current = counted(_slot(instance, fields))
+    if previous != current:
+        _refresh(previous, current)
+
+
+@receiver(pre_save, sender='venues.VenueBookingRequest')
+def remember_booking_slot(sender, instance, update_fields=None, **kwargs):
+    _remember_previous(instance, BOOKING_FIELDS, update_fields)
+
+
+@receiver(post_save, sender='venues.VenueBookingRequest')
+def refresh_booking_occupancy(sender, instance, **kwargs):
+    _refresh_saved(instance, BOOKING_FIELDS)
+
+
+@receiver(post_delete, sender='venues.VenueBookingRequest')
+def remove_booking_occupancy(sender, instance, **kwargs):
+    _refresh(_slot(instance, BOOKING_FIELDS))
+
+
+@receiver(pre_save, sender='events.Event')
+def remember_event_slot(sender, instance, update_fields=None, **kwargs):
+    _remember_previous(instance, EVENT_FIELDS, update_fields)
+
+
+@receiver(post_save, sender='events.Event')
+def refresh_event_occupancy(sender, instance, **kwargs):
+    _refresh_saved(instance, EVENT_FIELDS, _event_slot)
+
+
+@receiver(post_delete, sender='events.Event')
+def remove_event_occupancy(sender, instance, **kwargs):
+    _refresh(_event_slot(_slot(instance, EVENT_FIELDS)))
+
+
+@receiver(post_save, sender='reviews.Review')
+def update_rating_analytics(sender, instance, **kwargs):
+    # The previous rating and status were captured by the reviews app's pre_save handler
+    apply_rating_changes(saved_changes(instance))
+
+
+@receiver(post_delete, sender='reviews.Review')
+def remove_rating_analytics(sender, instance, **kwargs):
+    apply_rating_changes(deleted_changes(instance))
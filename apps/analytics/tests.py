@@ -1,3 +1,167 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+from datetime import time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.payments.orders import confirm_orders
+from apps.payments.tests import OrderTestCase
+from apps.reviews.models import Review
+from apps.users.models import User
+from apps.venues.models import VenueBookingRequest
+from .models import VenueOccupancy
+from .occupancy import month_start
+
+
+class RatingAnalyticsTests(OrderTestCase):
+    def review(self, username, rating, status=Review.Status.APPROVED):
+        user = User.objects.create_user(username, f'{username}@example.com', 'pw')
+        return Review.objects.create(
+            user=user, event=self.event, rating=rating, title='-', content='-', status=status,
+        )
+
+    def assertRating(self, count, average):
+        analytics = self.event.analytics
+        analytics.refresh_from_db()
+        self.assertEqual((analytics.reviews_count, analytics.average_rating), (count, Decimal(average)))
+
+    def test_counts_only_approved_reviews(self):
+        self.review('a', 5)
+        self.review('b', 4)
+        pending = self.review('c', 1, status=Review.Status.PENDING)
+        self.assertRating(2, '4.50')
+
+        pending.status = Review.Status.APPROVED
+        pending.save()
+        self.assertRating(3, '3.33')
+
+    def test_follows_edits_rejections_and_deletes(self):
+        first = self.review('a', 5)
+        second = self.review('b', 3)
+        first.rating = 4
+        first.save()
+        self.assertRating(2, '3.50')
+
+        second.status = Review.Status.REJECTED
+        second.save()
+        self.assertRating(1, '4.00')
+
+        first.delete()
+        self.assertRating(0, '0.00')
+
+
+class OccupancyTests(OrderTestCase):
+    def occupancy(self, day):
+        return VenueOccupancy.objects.filter(venue=self.venue, month=month_start(day)).first()
+
+    def book(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return VenueBookingRequest.objects.create(
+                venue=self.venue, requester=self.planner, event_name='Gig', event_description='-',
+                booking_date=self.event.event_date, start_time=time(17), end_time=time(23), expected_attendees=50,
+                **fields,
+            )
+
+    def test_approved_bookings_fill_their_slots(self):
+        booking = self.book()
+        self.assertEqual(self.occupancy(booking.booking_date).bookings_count, 0)
+
+        booking.status = VenueBookingRequest.Status.APPROVED
+        booking.quoted_price = Decimal('500')
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        occupancy = self.occupancy(booking.booking_date)
+        self.assertEqual((occupancy.booked_minutes, occupancy.bookings_count), (6 * 60, 1))
+        self.assertEqual(occupancy.booking_revenue, Decimal('500'))
+        self.assertEqual(self.venue.analytics.confirmed_bookings, 1)
+
+    def test_saves_that_leave_the_slot_alone_do_not_rebuild(self):
+        booking = self.book()
+        with mock.patch('apps.analytics.signals.refresh_on_commit') as refresh:
+            booking.review_notes = 'Looks fine'
+            # Form data still holds the date and times as strings
+            booking.booking_date = booking.booking_date.isoformat()
+            booking.start_time = '17:00'
+            booking.save()
+            self.event.description = 'Updated'
+            self.event.save()
+            with self.assertNumQueries(1):
+                self.event.save(update_fields=['description'])
+            refresh.assert_not_called()
+
+            self.event.start_date += timedelta(hours=1)
+            self.event.save()
+            refresh.assert_called_once()
+
+    def test_moving_an_event_rebuilds_both_months(self):
+        old_date = self.event.event_date
+        self.event.start_date += timedelta(days=40)
+        with mock.patch('apps.analytics.signals.refresh_on_commit') as refresh:
+            self.event.save()
+        self.assertEqual(
+            {month_start(day) for call in refresh.call_args_list for day in call.args[1]},
+            {month_start(old_date), month_start(self.event.event_date)},
+        )
+
+    def test_drafts_occupy_nothing(self):
+        with mock.patch('apps.analytics.signals.refresh_on_commit') as refresh:
+            self.event.status = 'cancelled'
+            self.event.save()
+            self.event.status = 'draft'
+            self.event.save()
+        refresh.assert_called_once()
+
+    def test_backfill_runs_from_the_command_not_the_dashboard(self):
+        self.client.force_login(self.venue.manager)
+        self.assertEqual(self.client.get(reverse('venues:venue_analytics')).status_code, 200)
+        self.assertFalse(VenueOccupancy.objects.exists())
+
+        call_command('rebuild_venue_occupancy', '--missing', stdout=mock.Mock())
+        self.assertEqual(self.occupancy(self.event.event_date).events_count, 1)
+        with mock.patch('apps.analytics.management.commands.rebuild_venue_occupancy.rebuild_venue') as rebuild:
+            call_command('rebuild_venue_occupancy', '--missing', stdout=mock.Mock())
+        rebuild.assert_not_called()
+
+
+class ExportTests(OrderTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+
+    def export(self, name, **params):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse(f'analytics:export_{name}_data'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_events_stream_as_csv_with_ledger_totals(self):
+        _, order = self.checkout(quantity=3)
+        confirm_orders(self.planner, order_ids=[order.pk])
+        response, body = self.export('event')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['title'], rows[0]['tickets_sold'], rows[0]['net_revenue']), ('Gig', '3', '30.00'))
+
+    def test_users_filter_by_join_date_as_ndjson(self):
+        User.objects.filter(username='buyer').update(date_joined=timezone.now() - timedelta(days=30))
+        today = timezone.localdate().isoformat()
+        _, body = self.export('user', format='ndjson', **{'from': today, 'to': today})
+        usernames = {json.loads(line)['username'] for line in body.decode().splitlines()}
+        self.assertEqual(usernames, {'planner', 'venues', 'admin'})
+
+    def test_revenue_downloads_gzipped(self):
+        self.checkout()
+        response, body = self.export('revenue', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv.gz"'))
+        header, row = gzip.decompress(body).decode().splitlines()
+        self.assertTrue(header.startswith('order_number,created_at,status'))
+        self.assertIn(',buyer,1,10.00,10.00,cod,pending,', row)
@@ -1,5 +1,5 @@
 from django.shortcuts import render
-from django.views.generic import TemplateView
+from django.views.generic import TemplateView, View
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.utils import timezone
 from django.db.models import Sum, Count, Avg, Q, Value, FloatField, DecimalField, IntegerField
@@ -8,8 +8,10 @@ from django.db.models.functions import Coalesce
 from apps.users.models import User, RoleUpgradeRequest
 from apps.events.models import Event
 from apps.venues.models import Venue
-from apps.payments.models import Payment
+from apps.payments.ledger import platform_balance
+from apps.payments.models import Order
 from apps.reviews.models import Review, Comment
+from .exports import date_range, filter_dates, stream_export
 
 
 class AdminRequiredMixin(UserPassesTestMixin):
@@ -34,13 +36,7 @@ class AdminDashboardView(AdminRequiredMixin, TemplateView):
         total_users = User.objects.count()
         total_events = Event.objects.count()
         total_venues = Venue.objects.count()
-        platform_revenue = Payment.objects.filter(status=Payment.Status.COMPLETED).aggregate(
-            total=Coalesce(
-                Sum('amount'),
-                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            )
-        )['total']
+        platform_revenue = platform_balance().balance
 
         new_users_this_month = User.objects.filter(date_joined__gte=month_start).count()
         user_growth_percentage = round((new_users_this_month / total_users) * 100, 1) if total_users else 0
@@ -60,14 +56,14 @@ class AdminDashboardView(AdminRequiredMixin, TemplateView):
 
         top_events = Event.objects.select_related('venue').annotate(
             annotated_tickets_sold=Coalesce(
-                Sum('orders__ticket_quantity', filter=Q(orders__payment__status=Payment.Status.COMPLETED)),
+                'revenue_balance__tickets_sold',
                 Value(0, output_field=IntegerField()),
                 output_field=IntegerField()
             ),
             revenue=Coalesce(
-                Sum('payments__amount', filter=Q(payments__status=Payment.Status.COMPLETED)),
-                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
-                output_field=DecimalField(max_digits=12, decimal_places=2)
+                'revenue_balance__balance',
+                Value(0, output_field=DecimalField(max_digits=14, decimal_places=2)),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
             ),
             average_rating=Coalesce(
                 Avg('reviews__rating', filter=Q(reviews__status='approved')),
@@ -128,14 +124,46 @@ class AdminDashboardView(AdminRequiredMixin, TemplateView):
 class UserActivityView(AdminRequiredMixin, TemplateView):
     template_name = 'analytics/user_activity.html'
 
-class ExportEventDataView(AdminRequiredMixin, TemplateView):
-    template_name = 'analytics/export_events.html'
-
-class ExportUserDataView(AdminRequiredMixin, TemplateView):
-    template_name = 'analytics/export_users.html'
-
-class ExportRevenueDataView(AdminRequiredMixin, TemplateView):
-    template_name = 'analytics/export_revenue.html'
+class ExportEventDataView(AdminRequiredMixin, View):
+    """Stream events with their ledger totals; ``from``/``to`` filter on the event date"""
+    columns = [
+        'id', 'title', 'status', 'category', 'planner', 'venue', 'event_date', 'start_time', 'end_time',
+        'total_seats', 'base_price', 'is_free', 'tickets_sold', 'net_revenue', 'created_at',
+    ]
+
+    def get(self, request):
+        start, end = date_range(request)
+        events = filter_dates(Event.objects.order_by('pk'), 'event_date', start, end).values_list(
+            'id', 'title', 'status', 'category__name', 'manager__username', 'venue__name', 'event_date',
+            'start_time', 'end_time', 'total_seats', 'base_price', 'is_free',
+            'revenue_balance__tickets_sold', 'revenue_balance__balance', 'created_at',
+        )
+        return stream_export(request, 'events', self.columns, events)
+
+class ExportUserDataView(AdminRequiredMixin, View):
+    """Stream user accounts; ``from``/``to`` filter on the join date"""
+    columns = ['id', 'username', 'email', 'first_name', 'last_name', 'role', 'is_active', 'date_joined', 'last_login']
+
+    def get(self, request):
+        start, end = date_range(request)
+        users = filter_dates(User.objects.order_by('pk'), 'date_joined', start, end).values_list(*self.columns)
+        return stream_export(request, 'users', self.columns, users)
+
+class ExportRevenueDataView(AdminRequiredMixin, View):
+    """Stream ticket orders with their payments; ``from``/``to`` filter on the order date"""
+    columns = [
+        'order_number', 'created_at', 'status', 'event_id', 'event', 'planner', 'customer', 'tickets',
+        'unit_price', 'total_amount', 'payment_method', 'payment_status', 'payment_reference', 'processed_at',
+    ]
+
+    def get(self, request):
+        start, end = date_range(request)
+        orders = filter_dates(Order.objects.order_by('pk'), 'created_at', start, end).values_list(
+            'order_number', 'created_at', 'status', 'event_id', 'event__title', 'event__manager__username',
+            'user__username', 'ticket_quantity', 'unit_price', 'total_amount', 'payment__payment_method',
+            'payment__status', 'payment__reference', 'payment__processed_at',
+        )
+        return stream_export(request, 'revenue', self.columns, orders)
 
 class RevenueChartDataView(AdminRequiredMixin, TemplateView):
     template_name = 'analytics/revenue_chart.html'
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from apps.core import push
+
+
+class Command(BaseCommand):
+    help = (
+        'Hold thousands of idle notification streams in one process and measure their memory, '
+        'idle CPU and push latency. Runs in a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000, help='Open streams (default: 2000)')
+        parser.add_argument('--notifications', type=int, default=200, help='Notifications pushed (default: 200)')
+        parser.add_argument('--idle', type=float, default=5, help='Seconds to sit idle before pushing (default: 5)')
+        parser.add_argument('--heartbeat', type=int, default=15, help='Heartbeat interval in seconds (default: 15)')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            users = self._setup(options['connections'])
+            with override_settings(NOTIFICATION_PUSH_BACKEND='local'):
+                report = asyncio.run(self._run(users, options))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        count = options['connections']
+        self.stdout.write(f'{count} idle streams')
+        self.stdout.write(f'  connect all: {report["connect"]:.2f}s')
+        self.stdout.write(f'  memory: {report["memory"] / 1024:.1f} KiB per stream')
+        self.stdout.write(
+            f'  idle CPU: {report["idle_cpu"] * 1000 / options["idle"]:.1f} ms/s over {options["idle"]:.0f}s'
+        )
+        latencies = sorted(report['latencies'])
+        if latencies:
+            self.stdout.write(
+                f'  push latency over {len(latencies)} notifications: '
+                f'p50 {statistics.median(latencies):.2f}ms, '
+                f'p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f}ms, max {latencies[-1]:.2f}ms'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Polling every 30s, the same tabs would send {count / 30:.0f} requests/s; '
+            f'streams sent {report["heartbeats"]} heartbeat(s) and {len(latencies)} notification(s).'
+        ))
+
+    def _setup(self, count):
+        from apps.users.models import User
+
+        User.objects.bulk_create(
+            [User(username=f'bench-stream-{index}', email=f'stream{index}@example.com') for index in range(count)],
+            batch_size=500,
+        )
+        return list(User.objects.filter(username__startswith='bench-stream-'))
+
+    async def _run(self, users, options):
+        from apps.core.models import Notification
+
+        received = {}
+        heartbeats = 0
+        ready = 0
+
+        async def consume(user):
+            nonlocal heartbeats, ready
+            async for chunk in push.notification_events(user, heartbeat=options['heartbeat']):
+                if chunk.startswith('retry: '):
+                    ready += 1
+                elif chunk.startswith('id: '):
+                    received[json.loads(chunk[chunk.index('data: ') + 6:])['id']] = time.perf_counter()
+                elif chunk.startswith(':'):
+                    heartbeats += 1
+
+        async def connect(users):
+            tasks = [asyncio.create_task(consume(user)) for user in users]
+            target = ready + len(users)
+            while ready < target:
+                await asyncio.sleep(0.01)
+            # Database calls run one at a time in order, so this returns once every opening query has
+            await sync_to_async(lambda: None)()
+            return tasks
+
+        # Memory is traced over the last streams only, tracing every allocation being slow
+        sample = max(1, min(200, len(users) // 10))
+        started = time.perf_counter()
+        tasks = await connect(users[:-sample])
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tasks += await connect(users[-sample:])
+        memory = (tracemalloc.get_traced_memory()[0] - baseline) / sample
+        tracemalloc.stop()
+        connected = time.perf_counter() - started
+
+        cpu = time.process_time()
+        await asyncio.sleep(options['idle'])
+        idle_cpu = time.process_time() - cpu
+
+        create = sync_to_async(Notification.objects.create)
+        sent = {}
+        for user in random.choices(users, k=options['notifications']):
+            created = time.perf_counter()
+            notification = await create(recipient=user, subject='Benchmark', message='-')
+            sent[notification.pk] = created
+            await asyncio.sleep(0)
+        deadline = time.perf_counter() + 10
+        while len(received) < len(sent) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return {
+            'connect': connected,
+            'memory': memory,
+            'idle_cpu': idle_cpu,
+            'heartbeats': heartbeats,
+            'latencies': [(received[pk] - sent[pk]) * 1000 for pk in sent if pk in received],
+        }
@@ -0,0 +1,71 @@
+import tempfile
+import time
+from io import BytesIO
+
+import qrcode
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from apps.core import qr
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure QR renders per second: the original PIL image path versus the '
+        'QR service cold, from its disk cache and from its in-memory cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payloads', type=int, default=200, help='Distinct ticket payloads (default: 200)')
+        parser.add_argument('--repeat', type=int, default=5, help='Renders of each payload in the warm runs (default: 5)')
+
+    def handle(self, *args, **options):
+        payloads = [
+            f'TICKET:TKT{index:014d}:EVENT:{index % 97}:USER:{index % 1013}'
+            for index in range(options['payloads'])
+        ]
+        repeated = payloads * options['repeat']
+
+        with tempfile.TemporaryDirectory() as cache_root, override_settings(QR_CACHE_ROOT=cache_root):
+            qr.qr_storage.cache_clear()
+            qr.clear_memory_cache()
+            try:
+                self._report('Original PIL PNG (every call)', payloads, self._legacy_png)
+                # Same error correction level as the original, for a like-for-like comparison
+                png = lambda payload: qr.qr_png(payload, error_correction='L')
+                self._report('Service PNG, cold', payloads, png)
+                qr.clear_memory_cache()
+                self._report('Service PNG, disk cache', payloads, png)
+                self._report('Service PNG, memory cache', repeated, png)
+
+                qr.clear_memory_cache()
+                self._report('Service SVG, cold', payloads, qr.qr_svg)
+                qr.clear_memory_cache()
+                self._report('Service SVG, disk cache', payloads, qr.qr_svg)
+                self._report('Service SVG, memory cache', repeated, qr.qr_svg)
+
+                sizes = [len(png(payload)) for payload in payloads], [len(qr.qr_svg(payload)) for payload in payloads]
+                self.stdout.write(
+                    f'Average size: PNG {sum(sizes[0]) / len(payloads):.0f} bytes, '
+                    f'SVG {sum(sizes[1]) / len(payloads):.0f} bytes'
+                )
+            finally:
+                qr.qr_storage.cache_clear()
+                qr.clear_memory_cache()
+
+    def _legacy_png(self, payload):
+        code = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+        code.add_data(payload)
+        code.make(fit=True)
+        buffer = BytesIO()
+        code.make_image(fill_color='black', back_color='white').save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def _report(self, label, payloads, render):
+        started = time.perf_counter()
+        for payload in payloads:
+            render(payload)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{label}: {len(payloads)} renders in {elapsed * 1000:.0f}ms, {len(payloads) / elapsed:,.0f}/s'
+        )
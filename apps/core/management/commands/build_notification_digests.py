@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.core.notifications import DIGEST_BATCH_SIZE, build_digests
+
+
+class Command(BaseCommand):
+    help = 'Fold notifications left unread for long into one digest per recipient.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-hours',
+            type=int,
+            default=settings.NOTIFICATION_DIGEST_AFTER_HOURS,
+            help=f'Digest notifications unread for this many hours (default: {settings.NOTIFICATION_DIGEST_AFTER_HOURS})'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DIGEST_BATCH_SIZE, help=f'Recipients per batch (default: {DIGEST_BATCH_SIZE})'
+        )
+        parser.add_argument('--loop', action='store_true', help='Keep running instead of exiting after one pass')
+        parser.add_argument('--interval', type=int, default=3600, help='Seconds between passes with --loop (default: 3600)')
+
+    def handle(self, *args, **options):
+        while True:
+            older_than = timezone.now() - timedelta(hours=options['older_than_hours'])
+            while True:
+                digests, folded = build_digests(older_than, options['batch_size'])
+                if not digests:
+                    break
+                self.stdout.write(f'Folded {folded} notification(s) into {digests} digest(s).')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Notification digests finished.'))
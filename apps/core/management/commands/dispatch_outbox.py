@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.outbox import BATCH_SIZE, MAX_ATTEMPTS, drain
+
+
+class Command(BaseCommand):
+    help = 'Send pending outbox messages in batches, retrying failed ones with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Messages per batch (default: {BATCH_SIZE})')
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f'Give up on a message after this many failed sends (default: {MAX_ATTEMPTS})'
+        )
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting after one pass')
+        parser.add_argument('--interval', type=int, default=5, help='Seconds between passes with --loop (default: 5)')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain(options['batch_size'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} message(s), {failed} failed and left for retry.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Outbox dispatch finished.'))
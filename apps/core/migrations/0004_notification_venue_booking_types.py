@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_notification_notification_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('event_deactivated', 'Event Deactivated'), ('event_deleted', 'Event Deleted'), ('venue_deactivated', 'Venue Deactivated'), ('venue_deleted', 'Venue Deleted'), ('new_comment', 'New Comment'), ('comment_reply', 'Comment Reply'), ('new_review', 'New Review'), ('new_booking', 'New Booking'), ('venue_booking_approved', 'Venue Booking Approved'), ('venue_booking_rejected', 'Venue Booking Rejected'), ('other', 'Other')], default='other', max_length=30),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_notification_venue_booking_types'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('aggregate_type', models.CharField(max_length=50)),
+                ('aggregate_id', models.CharField(max_length=64)),
+                ('event_type', models.CharField(max_length=50)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('available_at', models.DateTimeField()),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['available_at', 'id'], name='outbox_undispatched_idx')],
+                'constraints': [models.UniqueConstraint(fields=('aggregate_type', 'aggregate_id', 'event_type', 'version'), name='unique_outbox_message')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', '-id'], name='notification_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_notification_unread_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='collapse_key',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('event_deactivated', 'Event Deactivated'), ('event_deleted', 'Event Deleted'), ('venue_deactivated', 'Venue Deactivated'), ('venue_deleted', 'Venue Deleted'), ('new_comment', 'New Comment'), ('comment_reply', 'Comment Reply'), ('new_review', 'New Review'), ('new_booking', 'New Booking'), ('venue_booking_approved', 'Venue Booking Approved'), ('venue_booking_rejected', 'Venue Booking Rejected'), ('digest', 'Digest'), ('other', 'Other')], default='other', max_length=30),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_read', False), models.Q(('collapse_key', ''), _negated=True)), fields=('recipient', 'collapse_key'), name='unique_unread_collapse_key'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 22:40
+
+from django.db import migrations, models
+
+
+def create_nodes(apps, schema_editor):
+    from apps.core.numbering import MAX_NODE
+
+    ReferenceNode = apps.get_model('core', 'ReferenceNode')
+    ReferenceNode.objects.bulk_create(
+        [ReferenceNode(node_id=node_id) for node_id in range(MAX_NODE + 1)],
+        batch_size=500,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_notification_collapse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_id', models.PositiveSmallIntegerField(unique=True)),
+                ('holder', models.CharField(blank=True, max_length=100)),
+                ('expires', models.BigIntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.RunPython(create_nodes, migrations.RunPython.noop),
+    ]
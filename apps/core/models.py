@@ -1,6 +1,9 @@
 from django.db import models
 from django.conf import settings
 
+from .notifications import invalidate_unread
+from .push import publish
+
 
 class TimeStampedModel(models.Model):
     """Abstract base class for models that need created_at and updated_at fields"""
@@ -12,6 +15,32 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class NotificationQuerySet(models.QuerySet):
+    """Bulk writes that bypass ``save`` still refresh their recipients' unread state and streams"""
+    
+    def _recipients(self):
+        return list(self.order_by().values_list('recipient_id', flat=True).distinct())
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        recipients = [obj.recipient_id for obj in objs]
+        invalidate_unread(*recipients)
+        publish(*recipients)
+        return objs
+    
+    def update(self, **kwargs):
+        recipients = self._recipients()
+        rows = super().update(**kwargs)
+        invalidate_unread(*recipients)
+        return rows
+    
+    def delete(self):
+        recipients = self._recipients()
+        deleted = super().delete()
+        invalidate_unread(*recipients)
+        return deleted
+
+
 class Notification(TimeStampedModel):
     """Notification model for admin actions"""
     
@@ -24,6 +53,9 @@ class Notification(TimeStampedModel):
         COMMENT_REPLY = 'comment_reply', 'Comment Reply'
         NEW_REVIEW = 'new_review', 'New Review'
         NEW_BOOKING = 'new_booking', 'New Booking'
+        VENUE_BOOKING_APPROVED = 'venue_booking_approved', 'Venue Booking Approved'
+        VENUE_BOOKING_REJECTED = 'venue_booking_rejected', 'Venue Booking Rejected'
+        DIGEST = 'digest', 'Digest'
         OTHER = 'other', 'Other'
     
     class ActionReason(models.TextChoices):
@@ -87,18 +119,97 @@ class Notification(TimeStampedModel):
         related_name='notifications'
     )
     
+    # Bursts of the same kind of notification about one event share an unread row (see apps.core.notifications)
+    collapse_key = models.CharField(max_length=100, blank=True)
+    count = models.PositiveIntegerField(default=1)
+    
     # Status
     is_read = models.BooleanField(default=False)
     read_at = models.DateTimeField(null=True, blank=True)
     
+    objects = NotificationQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipient', 'collapse_key'],
+                condition=models.Q(is_read=False) & ~models.Q(collapse_key=''),
+                name='unique_unread_collapse_key',
+            ),
+        ]
+        indexes = [
+            # Unread count and polling for new notifications
+            models.Index(
+                fields=['recipient', '-id'],
+                condition=models.Q(is_read=False),
+                name='notification_unread_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.subject} - {self.recipient.username}"
     
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        invalidate_unread(self.recipient_id)
+        if adding:
+            publish(self.recipient_id)
+    
+    def delete(self, *args, **kwargs):
+        deleted = super().delete(*args, **kwargs)
+        invalidate_unread(self.recipient_id)
+        return deleted
+    
     def mark_as_read(self):
         from django.utils import timezone
         self.is_read = True
         self.read_at = timezone.now()
         self.save()
+
+
+class OutboxMessage(models.Model):
+    """Side effect of a state change, written in the same transaction and sent later by the dispatcher"""
+    
+    aggregate_type = models.CharField(max_length=50)
+    aggregate_id = models.CharField(max_length=64)
+    event_type = models.CharField(max_length=50)
+    version = models.PositiveIntegerField(default=1)
+    payload = models.JSONField(default=dict, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField()
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['aggregate_type', 'aggregate_id', 'event_type', 'version'],
+                name='unique_outbox_message',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                condition=models.Q(dispatched_at__isnull=True),
+                name='outbox_undispatched_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.aggregate_type}:{self.aggregate_id} v{self.version}"
+
+
+class ReferenceNode(models.Model):
+    """Lease on one of the node ids embedded in reference numbers, so no two processes use the same one"""
+    
+    node_id = models.PositiveSmallIntegerField(unique=True)
+    holder = models.CharField(max_length=100, blank=True)
+    # Unix time the lease runs out; a process renews its lease long before then
+    expires = models.BigIntegerField(default=0, db_index=True)
+    
+    def __str__(self):
+        return f"Reference node {self.node_id} ({self.holder or 'free'})"
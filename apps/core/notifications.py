@@ -0,0 +1,219 @@
+"""
+Unread notification state for the polling endpoint.
+
+``base.html`` polls ``UserNotificationsView`` from every open tab. Each user
+has a generation number in the cache that every write to their notifications
+bumps (``Notification.save``/``delete`` and the ``NotificationQuerySet`` bulk
+paths); the generation and the client's cursors form the ETag, so a poll with
+nothing new costs one cache read and a 304. Clients send two cursors: ``since``,
+the newest id they have, and ``changed``, the newest ``updated_at`` they have
+seen, so notifications collapsed into a row they already hold come back too. The unread count is
+cached per generation, so it is only counted again after something changed.
+
+Busy events would otherwise bury their manager in near-identical rows, so
+``notify_collapsed`` folds a notification into the recipient's unread one of
+the same type about the same event from the current collapse window, and
+``build_digests`` sums up whatever stays unread for long into one digest.
+"""
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+
+
+POLL_LIMIT = 10
+# Recipients handled per digest round
+DIGEST_BATCH_SIZE = 500
+# Fewer stale unread notifications than this are left as they are
+DIGEST_MIN_ITEMS = 2
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _generation_key(user_id):
+    return f'notifications:generation:{user_id}'
+
+
+def _state_key(user_id, generation):
+    return f'notifications:unread:{user_id}:{generation}'
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Nobody has polled since the key expired; the next poll starts a fresh generation
+            pass
+
+
+def invalidate_unread(*user_ids):
+    """Start a new generation for these users, now and again once the transaction commits."""
+    keys = [_generation_key(user_id) for user_id in set(user_ids) if user_id]
+    if not keys:
+        return
+    _bump(keys)
+    # A poll between the write and the commit would cache what it read under the new generation
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def generation(user):
+    key = _generation_key(user.pk)
+    value = cache.get(key)
+    if value is None:
+        # Random, so a generation recreated after eviction never matches an ETag handed out before
+        cache.add(key, random.getrandbits(48), settings.NOTIFICATION_STATE_TTL)
+        value = cache.get(key)
+    return value
+
+
+def poll_etag(user, since, changed=0):
+    return f'{generation(user)}.{since}.{changed}'
+
+
+def to_changed_cursor(moment):
+    """``moment`` as the integer ``changed`` cursor, in microseconds since the epoch."""
+    return (moment - _EPOCH) // timedelta(microseconds=1) if moment else 0
+
+
+def _from_changed_cursor(changed):
+    return _EPOCH + timedelta(microseconds=changed)
+
+
+def unread_state(user):
+    """
+    ``{'unread': count, 'latest': newest unread id, 'changed': newest unread
+    update as a ``changed`` cursor}`` for the user's current generation.
+    """
+    from .models import Notification
+
+    key = _state_key(user.pk, generation(user))
+    state = cache.get(key)
+    if state is None:
+        state = Notification.objects.filter(recipient=user, is_read=False).aggregate(
+            unread=Count('pk'), latest=Max('pk'), changed=Max('updated_at'),
+        )
+        state['latest'] = state['latest'] or 0
+        state['changed'] = to_changed_cursor(state['changed'])
+        cache.set(key, state, settings.NOTIFICATION_STATE_TTL)
+    return state
+
+
+def unread_since(user, since, changed=0, limit=POLL_LIMIT):
+    """
+    Newest unread notifications with an id above ``since`` or, given a
+    ``changed`` cursor, updated after it, most recently updated first; none
+    when nothing is newer.
+    """
+    from .models import Notification
+
+    state = unread_state(user)
+    if state['latest'] <= since and (not changed or state['changed'] <= changed):
+        return []
+    newer = Q(pk__gt=since)
+    if changed:
+        newer |= Q(updated_at__gt=_from_changed_cursor(changed))
+    return list(
+        Notification.objects.filter(newer, recipient=user, is_read=False).order_by('-updated_at', '-pk')[:limit]
+    )
+
+
+def collapse_key(notification_type, event_id, now=None):
+    """Key shared by notifications of one type about one event within a ``NOTIFICATION_COLLAPSE_WINDOW``."""
+    window = max(1, settings.NOTIFICATION_COLLAPSE_WINDOW)
+    bucket = int((now or timezone.now()).timestamp()) // window
+    return f'{notification_type}:{event_id or 0}:{bucket}'
+
+
+def notify_collapsed(recipient, notification_type, event, **fields):
+    """
+    Notify ``recipient``, merging into their unread notification with the
+    same collapse key when there is one: its ``count`` goes up and the
+    subject, message, details and links become this notification's.
+    """
+    from .models import Notification
+    from .push import publish
+
+    now = timezone.now()
+    key = collapse_key(notification_type, event.pk if event else None, now)
+    unread = Notification.objects.filter(recipient=recipient, collapse_key=key, is_read=False)
+    with transaction.atomic():
+        if not unread.update(count=F('count') + 1, updated_at=now, **fields):
+            try:
+                # The unique unread key lets only one of concurrent first notifications insert
+                with transaction.atomic():
+                    Notification.objects.create(
+                        recipient=recipient,
+                        notification_type=notification_type,
+                        event=event,
+                        collapse_key=key,
+                        **fields,
+                    )
+                return
+            except IntegrityError:
+                # Another one won the insert; merge into its row instead
+                unread.update(count=F('count') + 1, updated_at=now, **fields)
+        # Open streams re-send the row with its new count
+        publish(recipient.pk)
+
+
+def _digest_line(group):
+    from .models import Notification
+
+    label = Notification.NotificationType(group['notification_type']).label
+    about = f' - {group["event__title"]}' if group['event__title'] else ''
+    return f'{group["total"]} x {label}{about}'
+
+
+def build_digests(older_than, batch_size=DIGEST_BATCH_SIZE):
+    """
+    Fold the unread notifications created before ``older_than`` into one
+    digest per recipient and mark them read; recipients with fewer than
+    ``DIGEST_MIN_ITEMS`` of them are skipped. Returns ``(digests, folded)``.
+    """
+    from .models import Notification
+
+    stale = Notification.objects.filter(is_read=False, created_at__lt=older_than).exclude(
+        notification_type=Notification.NotificationType.DIGEST,
+    )
+    recipients = list(
+        stale.order_by('recipient_id').values('recipient_id').annotate(rows=Count('pk'))
+        .filter(rows__gte=DIGEST_MIN_ITEMS).values_list('recipient_id', flat=True)[:batch_size]
+    )
+    if not recipients:
+        return 0, 0
+
+    with transaction.atomic():
+        # Pinned to the rows summarised, so anything arriving meanwhile stays unread
+        last_id = stale.filter(recipient_id__in=recipients).aggregate(last=Max('pk'))['last']
+        batch = stale.filter(recipient_id__in=recipients, pk__lte=last_id)
+        groups = defaultdict(list)
+        for group in (
+            batch.order_by('recipient_id', 'notification_type', 'event__title')
+            .values('recipient_id', 'notification_type', 'event__title')
+            .annotate(total=Sum('count'))
+        ):
+            groups[group['recipient_id']].append(group)
+
+        digests = []
+        for recipient_id, lines in groups.items():
+            total = sum(line['total'] for line in lines)
+            digests.append(Notification(
+                recipient_id=recipient_id,
+                notification_type=Notification.NotificationType.DIGEST,
+                subject=f'{total} notifications while you were away',
+                message='\n'.join(_digest_line(line) for line in lines),
+                details={
+                    'items': [
+                        {'type': line['notification_type'], 'event': line['event__title'], 'count': line['total']}
+                        for line in lines
+                    ],
+                },
+            ))
+        Notification.objects.bulk_create(digests, batch_size=500)
+        folded = batch.update(is_read=True, read_at=timezone.now())
+    return len(digests), folded
@@ -0,0 +1,249 @@
+"""
+Reference numbers for orders, tickets and payments.
+
+Numbers are generated without touching the database: a Snowflake-style
+64-bit ID (millisecond timestamp, node id, per-millisecond sequence) is
+unique per node by construction, then scrambled with a keyed Feistel
+permutation so consecutive numbers are not guessable. The result is written
+in Crockford base32 followed by a Luhn mod 32 check character, so typos can
+be rejected before any lookup.
+
+Each process leases its node id from the ``ReferenceNode`` table, renewing
+the lease while it runs, so web workers, serverless instances and command
+runs never share one. ``REFERENCE_NODE_ID`` pins the node id instead, for a
+deployment that runs a single process.
+"""
+import atexit
+import hashlib
+import os
+import socket
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'  # Crockford base32
+EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+BODY_LENGTH = 13  # ceil(64 / 5) base32 characters
+
+LEASE_SECONDS = 600
+CLAIM_ATTEMPTS = 5
+
+
+class NodeLease:
+    """A node id held in the ``ReferenceNode`` table by this process."""
+
+    def __init__(self):
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'[-100:]
+        self.node_id = None
+        self.expires = 0
+
+    def _execute(self, sql, params):
+        """Run ``sql`` on a connection of its own, so the lease commits even if the caller's transaction rolls back."""
+        from .models import ReferenceNode
+
+        shared = connections[DEFAULT_DB_ALIAS]
+        # SQLite takes one writer at a time, so a second connection would wait on the caller's transaction;
+        # it only serves single-process development, where sharing the connection is harmless
+        connection = shared if shared.vendor == 'sqlite' else connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                cursor.execute(sql.format(
+                    table=quote(ReferenceNode._meta.db_table),
+                    node_id=quote('node_id'),
+                    holder=quote('holder'),
+                    expires=quote('expires'),
+                ), params)
+                return cursor.rowcount, cursor.fetchone() if cursor.description else None
+        finally:
+            if connection is not shared:
+                connection.close()
+
+    def _claim(self, now):
+        expires = int(now) + LEASE_SECONDS
+        for _ in range(CLAIM_ATTEMPTS):
+            # Another process may take the same free row first; the expiry check then fails and we try again
+            claimed, _ = self._execute(
+                'UPDATE {table} SET {holder} = %s, {expires} = %s WHERE {expires} < %s AND {node_id} = '
+                '(SELECT {node_id} FROM {table} WHERE {expires} < %s ORDER BY {expires}, {node_id} LIMIT 1)',
+                [self.holder, expires, int(now), int(now)],
+            )
+            if claimed:
+                _, row = self._execute('SELECT {node_id} FROM {table} WHERE {holder} = %s', [self.holder])
+                self.node_id, self.expires = row[0], expires
+                return
+        raise RuntimeError('No reference node id is free; every one is leased by a running process')
+
+    def _renew(self, now):
+        expires = int(now) + LEASE_SECONDS
+        renewed, _ = self._execute(
+            'UPDATE {table} SET {expires} = %s WHERE {node_id} = %s AND {holder} = %s',
+            [expires, self.node_id, self.holder],
+        )
+        if renewed:
+            self.expires = expires
+        return bool(renewed)
+
+    def current(self):
+        """The leased node id, renewed once half the lease has passed and re-claimed if it was lost."""
+        now = time.time()
+        if self.node_id is not None and now < self.expires - LEASE_SECONDS / 2:
+            return self.node_id
+        if self.node_id is None or not self._renew(now):
+            self._claim(now)
+        return self.node_id
+
+    def release(self):
+        if self.node_id is not None:
+            self._execute(
+                'UPDATE {table} SET {holder} = %s, {expires} = 0 WHERE {node_id} = %s AND {holder} = %s',
+                ['', self.node_id, self.holder],
+            )
+            self.node_id = None
+
+
+class SnowflakeGenerator:
+    """Thread-safe generator of time-ordered 63-bit IDs for one node."""
+
+    def __init__(self, node_id):
+        if not 0 <= node_id <= MAX_NODE:
+            raise ValueError(f'node_id must be between 0 and {MAX_NODE}')
+        self.node_id = node_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now = int(time.time() * 1000) - EPOCH_MS
+            # Never step backwards if the wall clock does
+            now = max(now, self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond; borrow the next one
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (now << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self._sequence
+
+
+def _round_keys():
+    secret = hashlib.sha256(f'reference-numbers:{settings.SECRET_KEY}'.encode()).digest()
+    return [hashlib.sha256(secret + bytes([index])).digest() for index in range(4)]
+
+
+def _feistel(value, keys):
+    """Keyed bijection on 64-bit integers, so distinct IDs stay distinct."""
+    left, right = value >> 32, value & 0xFFFFFFFF
+    for key in keys:
+        digest = hashlib.blake2b(right.to_bytes(4, 'big'), key=key, digest_size=4).digest()
+        left, right = right, left ^ int.from_bytes(digest, 'big')
+    return (left << 32) | right
+
+
+def _encode(value):
+    chars = []
+    for _ in range(BODY_LENGTH):
+        value, index = divmod(value, 32)
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def check_character(body):
+    """Luhn mod 32 check character for a base32 string."""
+    total = 0
+    factor = 2
+    for char in reversed(body):
+        addend = factor * ALPHABET.index(char)
+        total += addend // 32 + addend % 32
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[(32 - total % 32) % 32]
+
+
+_generator = None
+_generator_lock = threading.Lock()
+_lease = None
+_keys = None
+
+
+def _get_generator():
+    global _generator, _lease, _keys
+    with _generator_lock:
+        if _keys is None:
+            _keys = _round_keys()
+        configured = getattr(settings, 'REFERENCE_NODE_ID', None)
+        if configured is not None:
+            node_id = int(configured)
+        else:
+            if _lease is None:
+                _lease = NodeLease()
+            node_id = _lease.current()
+        if _generator is None or _generator.node_id != node_id:
+            _generator = SnowflakeGenerator(node_id)
+    return _generator
+
+
+def _release_lease():
+    if _lease is not None:
+        try:
+            _lease.release()
+        except Exception:
+            # The lease simply runs out instead
+            pass
+
+
+atexit.register(_release_lease)
+
+
+def _reset_after_fork():
+    # Forked workers must not share the parent's node id and sequence
+    global _generator, _generator_lock, _lease
+    _generator = None
+    _generator_lock = threading.Lock()
+    _lease = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def generate_reference(prefix=''):
+    """Return a new unique reference such as ``ORD3K9V0XQ7M2B1DC``."""
+    generator = _get_generator()
+    body = _encode(_feistel(generator.next_id(), _keys))
+    return f'{prefix}{body}{check_character(body)}'
+
+
+def is_valid_reference(value, prefix=''):
+    """Check the shape and check character of a reference without a database lookup."""
+    value = (value or '').upper()
+    if not value.startswith(prefix) or len(value) != len(prefix) + BODY_LENGTH + 1:
+        return False
+    body, check = value[len(prefix):-1], value[-1]
+    if any(char not in ALPHABET for char in body):
+        return False
+    return check_character(body) == check
+
+
+def new_order_number():
+    return generate_reference('ORD')
+
+
+def new_ticket_number():
+    return generate_reference('TKT')
+
+
+def new_payment_reference():
+    return generate_reference('PAY')
@@ -0,0 +1,214 @@
+"""
+Transactional outbox.
+
+A state change that needs a side effect - an email today, a webhook
+tomorrow - calls ``publish`` inside the transaction making the change, so
+the request pays for one ``INSERT`` and the message commits or rolls back
+with the change. Messages are unique per (aggregate, event type, version):
+publishing the same transition again is a no-op, so re-saves and retried
+requests never send anything twice.
+
+``drain`` sends undispatched messages in batches, locking them with
+``SKIP LOCKED`` so concurrent dispatchers never pick up the same message,
+and marks each batch dispatched in the transaction that sent it. It runs
+from the ``dispatch_outbox`` command, on a schedule or as a ``--loop``
+worker. Long-lived servers can set ``OUTBOX_DISPATCH_IN_PROCESS`` to also
+drain from a background thread woken whenever a publishing transaction
+commits; serverless functions are frozen between requests, so it is off by
+default.
+"""
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxMessage
+from .utils import send_notification_email
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+RETRY_SECONDS = 30
+# The dispatcher thread also wakes on its own this often to pick up retries
+POLL_SECONDS = 60
+
+PAYMENT_COMPLETED = 'payment.completed'
+VENUE_BOOKING_REQUESTED = 'venue_booking.requested'
+ROLE_UPGRADE_REQUESTED = 'role_upgrade.requested'
+
+HANDLERS = {}
+
+
+def handles(event_type):
+    """Register the decorated function as the handler for ``event_type`` messages."""
+    def register(handler):
+        HANDLERS[event_type] = handler
+        return handler
+    return register
+
+
+def message(aggregate, event_type, payload=None, version=1):
+    """Unsaved outbox message for ``event_type`` happening to the model instance ``aggregate``."""
+    return OutboxMessage(
+        aggregate_type=aggregate._meta.label_lower,
+        aggregate_id=str(aggregate.pk),
+        event_type=event_type,
+        version=version,
+        payload=payload or {},
+    )
+
+
+def publish(*messages):
+    """
+    Write ``messages`` in the current transaction; duplicates are dropped.
+
+    Call it inside the ``transaction.atomic`` block that makes the state
+    change the messages describe.
+    """
+    if not messages:
+        return
+    now = timezone.now()
+    for outbox_message in messages:
+        outbox_message.available_at = now
+    OutboxMessage.objects.bulk_create(messages, batch_size=500, ignore_conflicts=True)
+    transaction.on_commit(wake_dispatcher)
+
+
+def pending(now=None, max_attempts=MAX_ATTEMPTS):
+    return OutboxMessage.objects.filter(
+        dispatched_at__isnull=True,
+        available_at__lte=now or timezone.now(),
+        attempts__lt=max_attempts,
+    ).order_by('available_at', 'id')
+
+
+def dispatch(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+    Send one batch of pending messages; returns ``(sent, failed)`` counts.
+
+    Each handler runs in a savepoint. A failed message is retried with
+    exponential backoff until it has been attempted ``max_attempts`` times,
+    after which it stays in the table with its ``last_error`` for inspection.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(pending(now, max_attempts).select_for_update(skip_locked=True)[:batch_size])
+        sent = []
+        failed = []
+        for outbox_message in batch:
+            handler = HANDLERS.get(outbox_message.event_type)
+            try:
+                if handler is None:
+                    raise LookupError(f'No outbox handler for {outbox_message.event_type!r}')
+                with transaction.atomic():
+                    handler(outbox_message.payload)
+            except Exception as exc:
+                logger.warning('Outbox message %s failed: %s', outbox_message.pk, exc)
+                outbox_message.attempts += 1
+                outbox_message.last_error = str(exc)
+                outbox_message.available_at = now + timedelta(seconds=RETRY_SECONDS * 2 ** (outbox_message.attempts - 1))
+                failed.append(outbox_message)
+            else:
+                sent.append(outbox_message.pk)
+
+        OutboxMessage.objects.filter(pk__in=sent).update(dispatched_at=now, attempts=F('attempts') + 1)
+        OutboxMessage.objects.bulk_update(failed, ['attempts', 'last_error', 'available_at'], batch_size=500)
+    return len(sent), len(failed)
+
+
+def drain(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """Dispatch batches until none is left; returns total ``(sent, failed)``."""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = dispatch(batch_size, max_attempts)
+        total_sent += sent
+        total_failed += failed
+        if sent + failed < batch_size:
+            return total_sent, total_failed
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def _run_dispatcher(wake):
+    while True:
+        wake.wait(POLL_SECONDS)
+        wake.clear()
+        try:
+            drain()
+        except Exception:
+            logger.exception('Outbox dispatch failed')
+        finally:
+            connections.close_all()
+
+
+def wake_dispatcher():
+    """Have this process's dispatcher thread drain the outbox, starting it if needed."""
+    global _dispatcher
+    if not getattr(settings, 'OUTBOX_DISPATCH_IN_PROCESS', False):
+        return
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            wake = threading.Event()
+            threading.Thread(target=_run_dispatcher, args=(wake,), name='outbox', daemon=True).start()
+            _dispatcher = wake
+    _dispatcher.set()
+
+
+def _reset_after_fork():
+    global _dispatcher, _dispatcher_lock
+    _dispatcher = None
+    _dispatcher_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@handles(PAYMENT_COMPLETED)
+def send_payment_confirmation(payload):
+    from apps.payments.models import Payment
+
+    payment = Payment.objects.select_related('user', 'event').filter(pk=payload['payment_id']).first()
+    if payment is None:
+        return
+    send_notification_email(
+        user=payment.user,
+        subject=f"Payment Confirmed - {payment.event.title}",
+        message=f"Your payment of ${payment.amount} for {payment.event.title} has been confirmed.",
+        event=payment.event,
+    )
+
+
+@handles(VENUE_BOOKING_REQUESTED)
+def notify_venue_manager(payload):
+    from apps.venues.models import VenueBookingRequest
+
+    booking = VenueBookingRequest.objects.select_related('venue__manager').filter(pk=payload['booking_id']).first()
+    if booking is None:
+        return
+    send_notification_email(
+        user=booking.venue.manager,
+        subject=f"New Booking Request - {booking.venue.name}",
+        message=f"New booking request for {booking.event_name} on {booking.booking_date}.",
+    )
+
+
+@handles(ROLE_UPGRADE_REQUESTED)
+def notify_admins(payload):
+    from django.contrib.auth import get_user_model
+
+    for admin in get_user_model().objects.filter(role='admin'):
+        send_notification_email(
+            user=admin,
+            subject="New Role Upgrade Request",
+            message=f"{payload['username']} has requested an upgrade to {payload['requested_role']}.",
+        )
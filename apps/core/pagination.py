@@ -1,5 +1,12 @@
+import base64
+import heapq
+from collections import namedtuple
+from itertools import islice
+
 from django.conf import settings
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
 
 CONTENT_CARDS_PER_PAGE = getattr(settings, 'CONTENT_CARDS_PER_PAGE', 15)
@@ -59,3 +66,69 @@ def get_page_window(page_obj, on_each_side=2):
         previous_page = number
 
     return items
+
+
+KeysetEntry = namedtuple('KeysetEntry', ['kind', 'object'])
+KeysetPage = namedtuple('KeysetPage', ['entries', 'next_cursor'])
+
+
+def encode_cursor(created_at, rank, pk):
+    raw = f'{created_at.isoformat()}|{rank}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """``(created_at, rank, pk)`` from a cursor, or ``None`` for a missing or malformed one."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        created_at, rank, pk = raw.split('|')
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            return None
+        return created_at, int(rank), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _after(queryset, rank, cursor):
+    """Rows of source ``rank`` that sort strictly after ``cursor`` in newest-first order."""
+    if cursor is None:
+        return queryset
+    created_at, cursor_rank, pk = cursor
+    condition = Q(created_at__lt=created_at)
+    if rank < cursor_rank:
+        condition |= Q(created_at=created_at)
+    elif rank == cursor_rank:
+        condition |= Q(created_at=created_at, pk__lt=pk)
+    return queryset.filter(condition)
+
+
+def _keyed_rows(kind, rank, rows):
+    for row in rows:
+        yield row.created_at, rank, row.pk, kind, row
+
+
+def keyset_merge(sources, cursor=None, per_page=None):
+    """
+    One newest-first page across several querysets, keyed on ``created_at``.
+
+    ``sources`` is a list of ``(kind, queryset)``; ties on ``created_at`` are
+    broken by source position and then primary key. Each source contributes
+    at most ``per_page + 1`` rows read from its ``(created_at, pk)`` order and
+    the rows are combined with a heap merge, so every page costs the same
+    however deep into the history it is.
+    """
+    per_page = per_page or CONTENT_CARDS_PER_PAGE
+    streams = [
+        _keyed_rows(kind, rank, _after(queryset, rank, cursor).order_by('-created_at', '-pk')[:per_page + 1])
+        for rank, (kind, queryset) in enumerate(sources)
+    ]
+    rows = list(islice(heapq.merge(*streams, key=lambda item: item[:3], reverse=True), per_page + 1))
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(*rows[-1][:3])
+    return KeysetPage([KeysetEntry(kind, row) for _, _, _, kind, row in rows], next_cursor)
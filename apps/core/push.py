@@ -0,0 +1,249 @@
+"""
+Push delivery of new notifications over Server-Sent Events.
+
+Every web process keeps a ``Hub`` of open notification streams by user. When
+a notification commits, its recipient's id is published through the
+configured backend (``NOTIFICATION_PUSH_BACKEND``): ``local`` hands it
+straight to this process's hub, ``postgres`` sends it with ``pg_notify`` and
+a listener thread in every process feeds its own hub. A woken stream reads
+the user's unread notifications after the last id it sent, plus those
+updated in place since it last looked (collapsed notifications, see
+``notify_collapsed``), so messages only say *who* to wake, coalesce freely
+and can never carry stale content, and a browser reconnecting with
+``Last-Event-ID`` is replayed from the same query.
+
+Idle streams cost one coroutine and an ``asyncio.Event`` each, plus a comment
+line every ``NOTIFICATION_STREAM_HEARTBEAT`` seconds to keep proxies from
+closing them. With no backend configured the stream endpoint answers 204
+and browsers keep polling ``UserNotificationsView``.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .notifications import unread_state
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'notifications'
+# Unread notifications sent per query when a stream catches up
+REPLAY_LIMIT = 50
+RETRY_MS = 5000
+
+
+class Subscription:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+
+class Hub:
+    """Open streams of this process by user; ``deliver`` may be called from any thread"""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def deliver(self, user_ids):
+        with self._lock:
+            woken = [s for user_id in user_ids for s in self._subscriptions.get(user_id, ())]
+        for subscription in woken:
+            try:
+                subscription.wake()
+            except RuntimeError:
+                # The stream's event loop has already shut down
+                pass
+        return len(woken)
+
+    def deliver_all(self):
+        with self._lock:
+            user_ids = list(self._subscriptions)
+        return self.deliver(user_ids)
+
+    def __len__(self):
+        with self._lock:
+            return sum(map(len, self._subscriptions.values()))
+
+
+hub = Hub()
+
+
+class LocalBackend:
+    """Delivery within this process only; enough for a single ASGI worker"""
+
+    def publish(self, user_ids):
+        hub.deliver(user_ids)
+
+    def start(self):
+        pass
+
+
+class PostgresBackend:
+    """Fan-out across processes and servers with ``LISTEN``/``NOTIFY`` on the default database"""
+
+    def __init__(self):
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, user_ids):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, ','.join(map(str, user_ids))])
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='notification-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg
+
+        while True:
+            try:
+                params = connections['default'].get_connection_params()
+                with psycopg.connect(**params, autocommit=True) as listener:
+                    listener.execute(f'LISTEN {CHANNEL}')
+                    # Streams may have missed messages while the listener was down
+                    hub.deliver_all()
+                    for notify in listener.notifies():
+                        hub.deliver([int(user_id) for user_id in notify.payload.split(',') if user_id])
+            except Exception:
+                logger.exception('Notification listener failed; reconnecting')
+                time.sleep(RETRY_MS / 1000)
+
+
+BACKENDS = {
+    'local': LocalBackend,
+    'postgres': PostgresBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The configured backend, or ``None`` when push delivery is off."""
+    global _backend
+    name = getattr(settings, 'NOTIFICATION_PUSH_BACKEND', '')
+    if not name:
+        return None
+    with _backend_lock:
+        if _backend is None or not isinstance(_backend, BACKENDS[name]):
+            _backend = BACKENDS[name]()
+    return _backend
+
+
+def publish(*user_ids):
+    """Wake the streams of these users once the current transaction commits."""
+    backend = get_backend()
+    user_ids = sorted({user_id for user_id in user_ids if user_id})
+    if backend is None or not user_ids:
+        return
+    transaction.on_commit(lambda: backend.publish(user_ids))
+
+
+def _serialize(notification, unread_count, last_id, event='notification'):
+    data = json.dumps({
+        'id': notification.id,
+        'subject': notification.subject,
+        'message': notification.message,
+        'type': notification.notification_type,
+        'created_at': notification.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'event_id': notification.event_id,
+        'venue_id': notification.venue_id,
+        'count': notification.count,
+        'unread_count': unread_count,
+    })
+    # The id is always the newest notification sent, so a reconnect replays from there
+    return f'id: {last_id}\nevent: {event}\ndata: {data}\n\n'
+
+
+async def _unread_changes(user, last_id, changed_since):
+    """Unread notifications created after ``last_id`` or updated after ``changed_since``."""
+    from .models import Notification
+
+    notifications = Notification.objects.filter(recipient=user, is_read=False).filter(
+        Q(pk__gt=last_id) | Q(updated_at__gt=changed_since),
+    ).order_by('updated_at', 'pk')
+    return [notification async for notification in notifications[:REPLAY_LIMIT]]
+
+
+async def notification_events(user, last_event_id=None, heartbeat=None):
+    """
+    SSE lines for ``user``'s notifications created after ``last_event_id``.
+
+    Without a ``last_event_id`` the stream starts at the newest unread
+    notification, the page having loaded the current ones already.
+    """
+    heartbeat = heartbeat or settings.NOTIFICATION_STREAM_HEARTBEAT
+    get_backend().start()
+    subscription = hub.subscribe(user.pk)
+    changed_since = timezone.now()
+    try:
+        if last_event_id is None:
+            last_event_id = (await sync_to_async(unread_state)(user))['latest']
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            # Cleared before reading, so a notification committed during the read wakes the next round
+            subscription.event.clear()
+            while True:
+                notifications = await _unread_changes(user, last_event_id, changed_since)
+                if not notifications:
+                    break
+                unread_count = (await sync_to_async(unread_state)(user))['unread']
+                changed_since = max(changed_since, *(notification.updated_at for notification in notifications))
+                for notification in sorted(notifications, key=lambda notification: notification.pk):
+                    if notification.pk > last_event_id:
+                        last_event_id = notification.pk
+                        yield _serialize(notification, unread_count, last_event_id)
+                    else:
+                        yield _serialize(notification, unread_count, last_event_id, 'notification_update')
+            # Heartbeats go out without touching the database until something is published
+            while True:
+                try:
+                    await asyncio.wait_for(subscription.event.wait(), heartbeat)
+                    break
+                except asyncio.TimeoutError:
+                    yield ': heartbeat\n\n'
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def _reset_after_fork():
+    global hub, _backend, _backend_lock
+    hub = Hub()
+    _backend = None
+    _backend_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,129 @@
+"""
+QR code rendering.
+
+The module matrix for a payload is computed once (``qrcode`` picks the
+smallest version that fits) and rendered as compact SVG - a single path of
+horizontal runs - or as PNG on demand. Rendered output is memoized in a
+per-process LRU and in a disk cache under ``QR_CACHE_ROOT`` keyed by a hash
+of the payload and render options, so the same ticket always yields the
+same bytes and a cold process reads them back instead of re-encoding. Where
+that storage is read-only, as on serverless deploys, only the LRU is used.
+"""
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image
+
+
+# Bump when the rendering changes so disk-cached files are not reused
+RENDER_VERSION = 1
+
+ERROR_CORRECTION = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+BORDER = 4
+MEMORY_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=MEMORY_CACHE_SIZE)
+def qr_matrix(payload, error_correction='M', border=BORDER):
+    """Module matrix for ``payload`` as a tuple of rows of booleans, quiet zone included."""
+    qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECTION[error_correction], border=border)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return tuple(tuple(row) for row in qr.get_matrix())
+
+
+def dark_runs(matrix):
+    """``(row, start, length)`` for every horizontal run of dark modules."""
+    for y, row in enumerate(matrix):
+        x = 0
+        width = len(row)
+        while x < width:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < width and row[x]:
+                x += 1
+            yield y, start, x - start
+
+
+def render_svg(matrix, size=None):
+    count = len(matrix)
+    path = ''.join(f'M{x} {y}h{length}v1h-{length}z' for y, x, length in dark_runs(matrix))
+    dimensions = f' width="{size}" height="{size}"' if size else ''
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {count} {count}"{dimensions} '
+        f'shape-rendering="crispEdges" role="img" aria-label="QR code">'
+        f'<rect width="{count}" height="{count}" fill="#fff"/>'
+        f'<path d="{path}" fill="#000"/></svg>'
+    )
+
+
+def render_png(matrix, box_size=10):
+    count = len(matrix)
+    pixels = bytes(0 if dark else 255 for row in matrix for dark in row)
+    image = Image.frombytes('L', (count, count), pixels)
+    image = image.resize((count * box_size, count * box_size), Image.NEAREST).convert('1')
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def cache_key(payload, *options):
+    raw = '\x1f'.join([str(RENDER_VERSION), payload, *map(str, options)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def qr_storage():
+    return FileSystemStorage(location=getattr(settings, 'QR_CACHE_ROOT', settings.MEDIA_ROOT / 'qr'))
+
+
+def _disk_cached(digest, extension, render):
+    storage = qr_storage()
+    name = f'{digest[:2]}/{digest}.{extension}'
+    try:
+        if storage.exists(name):
+            with storage.open(name, 'rb') as stored:
+                return stored.read()
+    except OSError:
+        pass
+    data = render()
+    try:
+        if not storage.exists(name):
+            storage.save(name, ContentFile(data))
+    except OSError:
+        # Read-only filesystem: the in-process LRU is the only cache
+        pass
+    return data
+
+
+@lru_cache(maxsize=MEMORY_CACHE_SIZE)
+def qr_svg(payload, size=None, error_correction='M'):
+    """SVG markup for ``payload``; ``size`` sets the width and height attributes."""
+    digest = cache_key(payload, 'svg', size, error_correction)
+    data = _disk_cached(digest, 'svg', lambda: render_svg(qr_matrix(payload, error_correction), size).encode())
+    return data.decode()
+
+
+@lru_cache(maxsize=MEMORY_CACHE_SIZE)
+def qr_png(payload, box_size=10, error_correction='M'):
+    """PNG bytes for ``payload`` with ``box_size`` pixels per module."""
+    digest = cache_key(payload, 'png', box_size, error_correction)
+    return _disk_cached(digest, 'png', lambda: render_png(qr_matrix(payload, error_correction), box_size))
+
+
+def clear_memory_cache():
+    for cached in (qr_matrix, qr_svg, qr_png):
+        cached.cache_clear()
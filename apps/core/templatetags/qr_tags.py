@@ -0,0 +1,17 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from apps.core.qr import qr_svg
+
+register = template.Library()
+
+
+@register.simple_tag
+def qr_code(payload, size=None):
+    """
+    Inline SVG QR code for the payload, rendered once and cached.
+    Usage: {% load qr_tags %}{% qr_code ticket.qr_code 160 %}
+    """
+    if not payload:
+        return ''
+    return mark_safe(qr_svg(str(payload), size=size and int(size)))
@@ -0,0 +1,357 @@
+import asyncio
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.events.tokens import parse_token
+from apps.payments.models import IdempotencyKey
+from apps.payments.orders import confirm_orders
+from apps.payments.tests import OrderTestCase
+from . import numbering, outbox, push, qr, ticket_pdf
+from .models import Notification, NotificationQuerySet, OutboxMessage, ReferenceNode
+from .notifications import build_digests, collapse_key, notify_collapsed
+
+
+class TicketPdfTests(OrderTestCase):
+    def setUp(self):
+        ticket_pdf.pdf_storage.cache_clear()
+        self.addCleanup(ticket_pdf.pdf_storage.cache_clear)
+
+    def test_order_passes_carry_the_signed_ticket_token_after_keys_are_swept(self):
+        ticket, order = self.checkout(quantity=2)
+        confirm_orders(self.planner, order_ids=[order.pk])
+        IdempotencyKey.objects.all().delete()
+        order.refresh_from_db()
+        passes = ticket_pdf.order_passes(order)
+        self.assertEqual(passes[0].qr_payload, ticket.qr_code)
+        self.assertIsNotNone(parse_token(passes[0].qr_payload))
+
+    @override_settings(TICKET_PDF_ROOT='/dev/null/ticket_pdfs')
+    def test_downloads_render_in_memory_when_storage_is_read_only(self):
+        _, order = self.checkout()
+        confirm_orders(self.planner, order_ids=[order.pk])
+        response = self.client.get(f'/payments/order/{order.pk}/ticket/pdf/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+
+class QrTests(OrderTestCase):
+    def setUp(self):
+        qr.qr_storage.cache_clear()
+        qr.clear_memory_cache()
+        self.addCleanup(qr.qr_storage.cache_clear)
+        self.addCleanup(qr.clear_memory_cache)
+
+    def test_svg_is_deterministic(self):
+        svg = qr.qr_svg('HP1.1.T-1.1.sig', size=160)
+        qr.clear_memory_cache()
+        self.assertEqual(qr.qr_svg('HP1.1.T-1.1.sig', size=160), svg)
+        self.assertIn('width="160"', svg)
+
+    def test_runs_cover_every_dark_module(self):
+        matrix = qr.qr_matrix('payload')
+        dark = sum(length for _, _, length in qr.dark_runs(matrix))
+        self.assertEqual(dark, sum(map(sum, matrix)))
+
+    @override_settings(QR_CACHE_ROOT='/dev/null/qr')
+    def test_ticket_page_renders_when_storage_is_read_only(self):
+        _, order = self.checkout()
+        confirm_orders(self.planner, order_ids=[order.pk])
+        response = self.client.get(f'/payments/order/{order.pk}/ticket/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<svg')
+
+
+class CollapseTests(OrderTestCase):
+    def notify(self, message='-', notification_type=Notification.NotificationType.NEW_BOOKING, event=None):
+        notify_collapsed(
+            recipient=self.planner,
+            notification_type=notification_type,
+            subject='New Ticket Booking',
+            message=message,
+            event=event or self.event,
+            details={'message': message},
+        )
+
+    def test_repeats_within_the_window_share_one_row(self):
+        for index in range(3):
+            self.notify(f'order {index}')
+        notification = Notification.objects.get()
+        self.assertEqual((notification.count, notification.message, notification.details), (3, 'order 2', {'message': 'order 2'}))
+
+    def test_a_lost_insert_race_merges_into_the_winning_row(self):
+        self.notify('first')
+        update = NotificationQuerySet.update
+        calls = []
+
+        def racing_update(queryset, **kwargs):
+            # The first merge attempt ran before the concurrent insert committed
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(NotificationQuerySet, 'update', autospec=True, side_effect=racing_update):
+            self.notify('second')
+        notification = Notification.objects.get()
+        self.assertEqual((notification.count, notification.message), (2, 'second'))
+        self.assertEqual(len(calls), 2)
+
+    def test_other_types_and_read_rows_start_new_rows(self):
+        self.notify()
+        self.notify(notification_type=Notification.NotificationType.NEW_COMMENT)
+        Notification.objects.filter(notification_type=Notification.NotificationType.NEW_BOOKING).get().mark_as_read()
+        self.notify()
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 2)
+
+    @override_settings(NOTIFICATION_COLLAPSE_WINDOW=3600)
+    def test_keys_change_with_the_window(self):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        key = collapse_key(Notification.NotificationType.NEW_BOOKING, self.event.pk, start)
+        self.assertEqual(collapse_key('new_booking', self.event.pk, start + timedelta(minutes=59)), key)
+        self.assertNotEqual(collapse_key('new_booking', self.event.pk, start + timedelta(hours=1)), key)
+        self.assertNotEqual(collapse_key('new_booking', self.event.pk + 1, start), key)
+
+    def test_digest_folds_stale_unread_notifications(self):
+        for _ in range(3):
+            self.notify()
+        self.notify(notification_type=Notification.NotificationType.NEW_COMMENT)
+        Notification.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(build_digests(timezone.now() - timedelta(hours=24)), (1, 2))
+
+        digest = Notification.objects.get(is_read=False)
+        self.assertEqual(digest.notification_type, Notification.NotificationType.DIGEST)
+        self.assertEqual(digest.subject, '4 notifications while you were away')
+        self.assertEqual(build_digests(timezone.now() - timedelta(hours=24)), (0, 0))
+
+    def test_single_stale_notifications_are_left_alone(self):
+        self.notify()
+        Notification.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(build_digests(timezone.now() - timedelta(hours=24)), (0, 0))
+
+    @override_settings(NOTIFICATION_PUSH_BACKEND='local')
+    async def test_stream_pushes_collapsed_counts(self):
+        def notify(message):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.notify(message)
+
+        stream = push.notification_events(self.planner, heartbeat=60)
+        try:
+            self.assertTrue((await anext(stream)).startswith('retry: '))
+            await sync_to_async(notify)('first')
+            created = await asyncio.wait_for(anext(stream), 5)
+            self.assertIn('event: notification\n', created)
+            self.assertIn('"count": 1', created)
+
+            await sync_to_async(notify)('second')
+            updated = await asyncio.wait_for(anext(stream), 5)
+            self.assertIn('event: notification_update\n', updated)
+            self.assertIn('"count": 2', updated)
+            self.assertIn('"message": "second"', updated)
+        finally:
+            await stream.aclose()
+
+
+class PollingTests(OrderTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.planner)
+
+    def send(self, subject='-'):
+        return Notification.objects.create(
+            recipient=self.planner, notification_type=Notification.NotificationType.OTHER, subject=subject, message='-',
+        )
+
+    def poll(self, since=None, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(reverse('core:user_notifications'), {'since': since} if since is not None else {}, headers=headers)
+
+    def test_unchanged_inboxes_get_a_304_without_touching_notifications(self):
+        first = self.send()
+        response = self.poll()
+        self.assertEqual(response.json()['cursor'], first.pk)
+        with CaptureQueriesContext(connection) as queries:
+            repeat = self.poll(etag=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertFalse([query for query in queries if 'core_notification' in query['sql']])
+
+    def test_polls_return_only_newer_notifications(self):
+        first = self.send('first')
+        response = self.poll()
+        second = self.send('second')
+        changed = self.poll(since=response.json()['cursor'], etag=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        data = changed.json()
+        self.assertEqual([item['subject'] for item in data['notifications']], ['second'])
+        self.assertEqual((data['unread_count'], data['cursor']), (2, second.pk))
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertEqual(self.poll(since=first.pk).json()['notifications'][0]['id'], second.pk)
+
+    def test_polls_return_collapsed_updates_to_held_notifications(self):
+        def notify(message):
+            notify_collapsed(
+                recipient=self.planner, notification_type=Notification.NotificationType.NEW_BOOKING,
+                event=self.event, subject='New Ticket Booking', message=message,
+            )
+
+        notify('first')
+        response = self.poll()
+        data = response.json()
+        notify('second')
+        changed = self.client.get(
+            reverse('core:user_notifications'), {'since': data['cursor'], 'changed': data['changed']},
+            headers={'If-None-Match': response['ETag']},
+        )
+        self.assertEqual(changed.status_code, 200)
+        updated = changed.json()
+        self.assertEqual(
+            [(item['id'], item['message'], item['count']) for item in updated['notifications']],
+            [(data['cursor'], 'second', 2)],
+        )
+        self.assertGreater(updated['changed'], data['changed'])
+        repeat = self.client.get(reverse('core:user_notifications'), {'since': updated['cursor'], 'changed': updated['changed']})
+        self.assertEqual(repeat.json()['notifications'], [])
+
+    def test_bulk_writes_change_the_etag(self):
+        self.send()
+        etag = self.poll()['ETag']
+        Notification.objects.filter(recipient=self.planner).update(is_read=True)
+        response = self.poll(etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unread_count'], 0)
+
+
+@override_settings(NOTIFICATION_PUSH_BACKEND='local')
+class StreamTests(OrderTestCase):
+    def send(self, subject='-'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(
+                recipient=self.planner, notification_type=Notification.NotificationType.OTHER,
+                subject=subject, message='-',
+            )
+
+    def test_browsers_fall_back_to_polling(self):
+        url = reverse('core:notification_stream')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.planner)
+        # The test client speaks WSGI, where a stream would pin a worker thread
+        self.assertEqual(self.client.get(url).status_code, 204)
+        with self.settings(NOTIFICATION_PUSH_BACKEND=''):
+            self.assertEqual(self.client.get(url).status_code, 204)
+
+    async def test_new_notifications_are_pushed_once(self):
+        await sync_to_async(self.send)('before')
+        stream = push.notification_events(self.planner, heartbeat=60)
+        try:
+            self.assertEqual(await anext(stream), f'retry: {push.RETRY_MS}\n\n')
+            self.assertEqual(len(push.hub), 1)
+            created = await sync_to_async(self.send)('after')
+            message = await asyncio.wait_for(anext(stream), 5)
+            self.assertTrue(message.startswith(f'id: {created.pk}\nevent: notification\n'))
+            self.assertIn('"subject": "after"', message)
+            self.assertIn('"unread_count": 2', message)
+        finally:
+            await stream.aclose()
+        self.assertEqual(len(push.hub), 0)
+
+    async def test_reconnects_replay_from_the_last_event_id(self):
+        first = await sync_to_async(self.send)('first')
+        await sync_to_async(self.send)('second')
+        stream = push.notification_events(self.planner, last_event_id=first.pk, heartbeat=0.01)
+        try:
+            await anext(stream)
+            self.assertIn('"subject": "second"', await anext(stream))
+            self.assertEqual(await asyncio.wait_for(anext(stream), 5), ': heartbeat\n\n')
+        finally:
+            await stream.aclose()
+
+
+class NumberingTests(TestCase):
+    def test_references_are_unique_and_checked(self):
+        references = {numbering.generate_reference('ORD') for _ in range(5000)}
+        self.assertEqual(len(references), 5000)
+        reference = references.pop()
+        self.assertTrue(numbering.is_valid_reference(reference, 'ORD'))
+        typo = reference[:5] + ('1' if reference[5] != '1' else '2') + reference[6:]
+        self.assertFalse(numbering.is_valid_reference(typo, 'ORD'))
+
+    def test_processes_lease_distinct_node_ids(self):
+        leases = [numbering.NodeLease() for _ in range(3)]
+        self.assertEqual(len({lease.current() for lease in leases}), 3)
+        self.assertEqual(
+            set(ReferenceNode.objects.exclude(holder='').values_list('node_id', flat=True)),
+            {lease.node_id for lease in leases},
+        )
+
+    def test_lost_leases_are_claimed_again(self):
+        lease = numbering.NodeLease()
+        node_id = lease.current()
+        # Another process took the node after this one stalled past its lease
+        ReferenceNode.objects.filter(node_id=node_id).update(holder='someone-else')
+        lease.expires = 0
+        self.assertNotEqual(lease.current(), node_id)
+
+    def test_released_nodes_are_free_again(self):
+        lease = numbering.NodeLease()
+        node_id = lease.current()
+        lease.release()
+        self.assertEqual(ReferenceNode.objects.get(node_id=node_id).expires, 0)
+
+
+class OutboxTests(OrderTestCase):
+    def setUp(self):
+        self.sent = []
+        patcher = mock.patch.dict(outbox.HANDLERS, {'test.event': self.sent.append})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def publish(self, version=1):
+        outbox.publish(outbox.message(self.event, 'test.event', {'event_id': self.event.pk}, version=version))
+
+    def test_messages_are_published_once_per_version(self):
+        self.publish()
+        self.publish()
+        self.publish(version=2)
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+
+    def test_rolled_back_messages_are_never_sent(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.publish()
+            raise RuntimeError
+        self.assertEqual(outbox.drain(), (0, 0))
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_drain_sends_each_message_once(self):
+        self.publish()
+        self.publish(version=2)
+        self.assertEqual(outbox.drain(batch_size=1), (2, 0))
+        self.assertEqual(outbox.drain(), (0, 0))
+        self.assertEqual(self.sent, [{'event_id': self.event.pk}] * 2)
+        self.assertFalse(OutboxMessage.objects.filter(dispatched_at__isnull=True).exists())
+
+    def test_failed_messages_are_retried_after_backoff(self):
+        outbox.HANDLERS['test.event'] = mock.Mock(side_effect=ConnectionError('smtp down'))
+        self.publish()
+        with self.assertLogs('apps.core.outbox', 'WARNING'):
+            self.assertEqual(outbox.drain(), (0, 1))
+        failed = OutboxMessage.objects.get()
+        self.assertEqual((failed.attempts, failed.last_error), (1, 'smtp down'))
+        self.assertGreater(failed.available_at, timezone.now())
+        self.assertEqual(outbox.drain(), (0, 0))
+
+        outbox.HANDLERS['test.event'] = self.sent.append
+        OutboxMessage.objects.update(available_at=timezone.now())
+        self.assertEqual(outbox.drain(), (1, 0))
+        self.assertEqual(len(self.sent), 1)
+
+    def test_web_processes_start_no_dispatcher_by_default(self):
+        with mock.patch.object(outbox.threading, 'Thread') as thread, self.captureOnCommitCallbacks(execute=True):
+            self.publish()
+        thread.assert_not_called()
+        self.assertEqual(OutboxMessage.objects.filter(dispatched_at__isnull=True).count(), 1)
@@ -0,0 +1,231 @@
+"""
+Ticket PDF rendering.
+
+Paragraph styles are built once per process and the static parts of a ticket
+(header, terms) once per thread. Each admission gets its own page with a
+vector QR code drawn straight into the PDF. Rendered files are stored under
+``TICKET_PDF_ROOT`` keyed by a hash of everything printed on them, so a
+repeat download is a file read and any change to the ticket or event renders
+a fresh file. Where that storage is read-only, as on serverless deploys,
+every download is rendered in memory instead.
+"""
+import hashlib
+import json
+import threading
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from reportlab.graphics.shapes import Drawing, Rect
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from apps.events.tokens import sign_ticket
+from .qr import dark_runs, qr_matrix
+
+
+# Bump when the layout changes so cached files are re-rendered
+LAYOUT_VERSION = 2
+
+QR_SIZE = 1.9 * inch
+
+TERMS = (
+    '<b>Terms and Conditions:</b><br/>'
+    '1. This ticket is non-transferable and non-refundable unless event is cancelled.<br/>'
+    '2. Please arrive at least 30 minutes before event start time.<br/>'
+    '3. Valid ID may be required for entry.<br/>'
+    '4. Photography and recording may not be permitted during the event.<br/>'
+)
+
+
+class TicketPass:
+    """Everything printed on a ticket, for one ticket or order."""
+
+    def __init__(self, number, event, holder, quantity, price, ticket_type='Regular', order_number='', qr_payload=''):
+        self.number = number
+        self.event_title = event.title
+        self.event_date = event.event_date
+        self.start_time = event.start_time
+        self.end_time = event.end_time
+        self.venue_name = event.venue.name
+        self.venue_address = event.venue.address
+        self.holder = holder
+        self.quantity = quantity
+        self.price = price
+        self.ticket_type = ticket_type
+        self.order_number = order_number
+        self.qr_payload = qr_payload or f'TICKET:{number}:EVENT:{event.pk}'
+
+    def fingerprint(self):
+        return {
+            'number': self.number,
+            'event': [self.event_title, str(self.event_date), str(self.start_time), str(self.end_time)],
+            'venue': [self.venue_name, self.venue_address],
+            'holder': self.holder,
+            'quantity': self.quantity,
+            'price': str(self.price),
+            'type': self.ticket_type,
+            'order': self.order_number,
+            'qr': self.qr_payload,
+        }
+
+
+def ticket_pass(ticket, order=None):
+    return TicketPass(
+        number=ticket.ticket_number,
+        event=ticket.event,
+        holder=(order.customer_name if order else '') or ticket.buyer.get_full_name() or ticket.buyer.username,
+        quantity=ticket.quantity,
+        price=ticket.total_price,
+        ticket_type=ticket.get_ticket_type_display(),
+        order_number=order.order_number if order else '',
+        qr_payload=ticket.qr_code or sign_ticket(ticket.event_id, ticket.ticket_number, ticket.quantity),
+    )
+
+
+def order_passes(order):
+    """Passes for an order: its ticket when known, otherwise the order itself."""
+    if order.ticket_id is not None:
+        return [ticket_pass(order.ticket, order)]
+    return [TicketPass(
+        number=order.order_number,
+        event=order.event,
+        holder=order.customer_name,
+        quantity=order.ticket_quantity,
+        price=order.total_amount,
+        order_number=order.order_number,
+        qr_payload=f'ORDER:{order.order_number}:EVENT:{order.event_id}:USER:{order.user_id}',
+    )]
+
+
+@lru_cache(maxsize=1)
+def _styles():
+    base = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'TicketTitle',
+            parent=base['Heading1'],
+            fontSize=24,
+            textColor=colors.darkblue,
+            alignment=TA_CENTER,
+            spaceAfter=30,
+        ),
+        'admission': ParagraphStyle('TicketAdmission', parent=base['Heading3'], alignment=TA_CENTER),
+        'body': base['Normal'],
+        'caption': ParagraphStyle('TicketCaption', parent=base['Normal'], alignment=TA_CENTER, fontSize=8),
+    }
+
+
+_static = threading.local()
+
+
+def _static_flowables():
+    """Header and terms flowables, built once per thread and reused on every page."""
+    if not hasattr(_static, 'flowables'):
+        styles = _styles()
+        _static.flowables = {
+            'title': Paragraph('EVENT TICKET', styles['title']),
+            'terms': Paragraph(TERMS, styles['body']),
+        }
+    return _static.flowables
+
+
+def qr_drawing(payload, size=QR_SIZE):
+    """Vector QR code: one rectangle per run of dark modules."""
+    matrix = qr_matrix(payload, border=2)
+    module = size / len(matrix)
+
+    drawing = Drawing(size, size)
+    for row_index, start, length in dark_runs(matrix):
+        drawing.add(Rect(
+            start * module, size - (row_index + 1) * module, length * module, module,
+            fillColor=colors.black, strokeColor=None, strokeWidth=0,
+        ))
+    return drawing
+
+
+def _admission_story(ticket, index):
+    styles = _styles()
+    static = _static_flowables()
+
+    details = Paragraph(
+        f'<b>Event:</b> {escape(ticket.event_title)}<br/>'
+        f'<b>Date:</b> {ticket.event_date}<br/>'
+        f'<b>Time:</b> {ticket.start_time} - {ticket.end_time}<br/>'
+        f'<b>Venue:</b> {escape(ticket.venue_name)}<br/>'
+        f'<b>Address:</b> {escape(ticket.venue_address)}<br/><br/>'
+        f'<b>Ticket Number:</b> {escape(ticket.number)}<br/>'
+        + (f'<b>Order:</b> {escape(ticket.order_number)}<br/>' if ticket.order_number else '')
+        + f'<b>Ticket Type:</b> {escape(ticket.ticket_type)}<br/>'
+        f'<b>Quantity:</b> {ticket.quantity}<br/>'
+        f'<b>Price:</b> ${ticket.price}<br/>'
+        f'<b>Holder:</b> {escape(ticket.holder)}<br/>',
+        styles['body'],
+    )
+    # The token covers the whole ticket: one scan admits the party
+    caption = f'Scan once to admit {ticket.quantity}' if ticket.quantity > 1 else 'Scan for entry'
+    qr = Table(
+        [[qr_drawing(ticket.qr_payload)], [Paragraph(caption, styles['caption'])]],
+        colWidths=[QR_SIZE],
+    )
+    layout = Table([[details, qr]], colWidths=[4.4 * inch, QR_SIZE + 0.3 * inch])
+    layout.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP')]))
+
+    story = [static['title']]
+    if ticket.quantity > 1:
+        story.append(Paragraph(f'Admission {index} of {ticket.quantity}', styles['admission']))
+    story += [Spacer(1, 12), layout, Spacer(1, 30), static['terms']]
+    return story
+
+
+def render_pdf(passes):
+    """Render every admission of ``passes`` into a single PDF in one build."""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, title='Event Tickets')
+    story = []
+    for ticket in passes:
+        for index in range(1, ticket.quantity + 1):
+            if story:
+                story.append(PageBreak())
+            story += _admission_story(ticket, index)
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def content_hash(passes):
+    payload = json.dumps(
+        {'layout': LAYOUT_VERSION, 'passes': [ticket.fingerprint() for ticket in passes]},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def pdf_storage():
+    return FileSystemStorage(location=getattr(settings, 'TICKET_PDF_ROOT', settings.MEDIA_ROOT / 'ticket_pdfs'))
+
+
+def open_pdf(passes):
+    """Readable file with the PDF for ``passes``, rendering it only if it is not stored yet."""
+    digest = content_hash(passes)
+    name = f'{digest[:2]}/{digest}.pdf'
+    storage = pdf_storage()
+    try:
+        if storage.exists(name):
+            return storage.open(name, 'rb')
+    except OSError:
+        pass
+    data = render_pdf(passes)
+    try:
+        storage.save(name, ContentFile(data))
+    except OSError:
+        # Read-only filesystem: serve this rendering without caching it
+        pass
+    return BytesIO(data)
@@ -1,25 +1,37 @@
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.generic import View
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_POST
+from django.utils.cache import patch_cache_control
 from django.utils.decorators import method_decorator
 from .models import Notification
+from .notifications import poll_etag, to_changed_cursor, unread_since, unread_state
+from .push import get_backend, notification_events
+
+
+def _poll_cursor(request, name='since'):
+    value = request.GET.get(name, '')
+    return int(value) if value.isdigit() else 0
+
+
+def _poll_etag(request):
+    return poll_etag(request.user, _poll_cursor(request), _poll_cursor(request, 'changed'))
 
 
 class UserNotificationsView(LoginRequiredMixin, View):
-    """API view to get user's unread notifications"""
+    """API view to get user's unread notifications, only those newer than the ``since``/``changed`` cursors when given"""
     
+    @method_decorator(condition(etag_func=_poll_etag))
     def get(self, request):
-        """Get unread notifications for current user"""
-        notifications = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).order_by('-created_at')
-        
-        unread_count = notifications.count()
+        """Answered with 304 from the cache alone while nothing changed since the client's ETag"""
+        since = _poll_cursor(request)
+        changed = _poll_cursor(request, 'changed')
+        state = unread_state(request.user)
+        notifications = unread_since(request.user, since, changed)
         
         notifications_data = []
-        for notif in notifications[:10]:  # Limit to last 10
+        for notif in notifications:
             notifications_data.append({
                 'id': notif.id,
                 'subject': notif.subject,
@@ -28,12 +40,42 @@ class UserNotificationsView(LoginRequiredMixin, View):
                 'created_at': notif.created_at.strftime('%Y-%m-%d %H:%M:%S'),
                 'event_id': notif.event_id,
                 'venue_id': notif.venue_id,
+                'count': notif.count,
             })
         
-        return JsonResponse({
-            'unread_count': unread_count,
-            'notifications': notifications_data
+        response = JsonResponse({
+            'unread_count': state['unread'],
+            'notifications': notifications_data,
+            'cursor': max([since] + [notif.id for notif in notifications]),
+            # Notifications already held by the client come back once this passes their update
+            'changed': max([changed] + [to_changed_cursor(notif.updated_at) for notif in notifications]),
         })
+        # Clients revalidate every poll with If-None-Match
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class NotificationStreamView(View):
+    """Server-Sent Events stream of the user's new notifications; 204 tells browsers to poll instead"""
+    
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=403)
+        # Under WSGI a stream would hold a worker thread for as long as the tab stays open
+        if get_backend() is None or not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        last_event_id = int(last_event_id) if last_event_id.isdigit() else None
+        response = StreamingHttpResponse(
+            notification_events(user, last_event_id),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Keep nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 
 class MarkNotificationReadView(LoginRequiredMixin, View):
@@ -85,6 +127,8 @@ class GetNotificationDetailView(LoginRequiredMixin, View):
                 order_number = notification.details.get('order_number')
                 if order_number:
                     redirect_url = f'/payments/manager/order/{order_number}/'
+            elif notification.notification_type in ['venue_booking_approved', 'venue_booking_rejected']:
+                redirect_url = '/payments/my-orders/'
             
             # Mark as read
             notification.mark_as_read()
@@ -0,0 +1,174 @@
+"""
+Door check-in.
+
+Online scanners post a ticket token and get an answer from one conditional
+``UPDATE ... WHERE is_used = false``, so two doors scanning the same ticket
+can never both admit it. Offline scanners download a per-event manifest -
+the event's signing key plus sorted hashes of its admissible and already
+used tickets - check tickets locally, and later push their scans back in a
+single sync request.
+"""
+import bisect
+import struct
+from collections import namedtuple
+
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from apps.payments.models import Order
+from .models import Ticket
+from .tokens import DIGEST_BYTES, event_key, parse_token, ticket_digest
+
+
+MANIFEST_MAGIC = b'HPTM'
+MANIFEST_VERSION = 1
+# magic, version, event id, generated at (unix seconds), admissible count, used count
+MANIFEST_HEADER = struct.Struct('>4sBIqII')
+SYNC_BATCH_SIZE = 500
+
+ScanResult = namedtuple('ScanResult', ['status', 'ticket_number', 'quantity', 'used_at'])
+
+ADMITTED = 'admitted'
+ALREADY_USED = 'already_used'
+INVALID = 'invalid'
+WRONG_EVENT = 'wrong_event'
+NOT_ADMISSIBLE = 'not_admissible'
+
+
+def admissible_tickets(event_id):
+    """Tickets for the event whose order has been confirmed."""
+    return Ticket.objects.filter(
+        event_id=event_id,
+        pk__in=Order.objects.filter(
+            event_id=event_id,
+            status=Order.Status.CONFIRMED,
+            ticket__isnull=False,
+        ).values('ticket_id'),
+    )
+
+
+def scan_ticket(event, token, now=None):
+    """Admit the ticket in ``token`` at ``event`` if it is valid and unused."""
+    claim = parse_token(token)
+    if claim is None:
+        return ScanResult(INVALID, None, None, None)
+    if claim.event_id != event.pk:
+        return ScanResult(WRONG_EVENT, claim.ticket_number, claim.quantity, None)
+
+    now = now or timezone.now()
+    admitted = admissible_tickets(event.pk).filter(ticket_number=claim.ticket_number, is_used=False).update(
+        is_used=True,
+        used_at=now,
+        updated_at=now,
+    )
+    if admitted:
+        return ScanResult(ADMITTED, claim.ticket_number, claim.quantity, now)
+
+    ticket = admissible_tickets(event.pk).filter(ticket_number=claim.ticket_number).only('used_at').first()
+    if ticket is None:
+        return ScanResult(NOT_ADMISSIBLE, claim.ticket_number, claim.quantity, None)
+    return ScanResult(ALREADY_USED, claim.ticket_number, claim.quantity, ticket.used_at)
+
+
+def build_manifest(event, now=None):
+    """Binary check-in manifest for ``event``."""
+    now = now or timezone.now()
+    admissible = []
+    used = []
+    for ticket_number, is_used in admissible_tickets(event.pk).values_list('ticket_number', 'is_used').iterator(chunk_size=2000):
+        (used if is_used else admissible).append(ticket_digest(ticket_number))
+    admissible.sort()
+    used.sort()
+    header = MANIFEST_HEADER.pack(
+        MANIFEST_MAGIC, MANIFEST_VERSION, event.pk, int(now.timestamp()), len(admissible), len(used),
+    )
+    return b''.join([header, event_key(event.pk), *admissible, *used])
+
+
+class Manifest:
+    """Reader for a check-in manifest, as an offline scanner would use it."""
+
+    def __init__(self, data):
+        magic, version, self.event_id, generated_at, admissible, used = MANIFEST_HEADER.unpack_from(data)
+        if magic != MANIFEST_MAGIC or version != MANIFEST_VERSION:
+            raise ValueError('Not a check-in manifest')
+        self.generated_at = generated_at
+        offset = MANIFEST_HEADER.size
+        self.key = data[offset:offset + 32]
+        offset += 32
+        self.admissible = self._digests(data, offset, admissible)
+        offset += admissible * DIGEST_BYTES
+        self.used = self._digests(data, offset, used)
+
+    @staticmethod
+    def _digests(data, offset, count):
+        return [data[offset + index * DIGEST_BYTES:offset + (index + 1) * DIGEST_BYTES] for index in range(count)]
+
+    @staticmethod
+    def _contains(digests, digest):
+        index = bisect.bisect_left(digests, digest)
+        return index < len(digests) and digests[index] == digest
+
+    def check(self, token):
+        """Status of ``token`` according to this manifest alone."""
+        claim = parse_token(token, key=self.key)
+        if claim is None:
+            return INVALID
+        if claim.event_id != self.event_id:
+            return WRONG_EVENT
+        digest = ticket_digest(claim.ticket_number)
+        if self._contains(self.admissible, digest):
+            return ADMITTED
+        if self._contains(self.used, digest):
+            return ALREADY_USED
+        return NOT_ADMISSIBLE
+
+
+def sync_scans(event, scans):
+    """
+    Record entries made by an offline scanner.
+
+    ``scans`` is an iterable of ``(token, used_at)``. Unused tickets are
+    marked with their scan time in one ``UPDATE`` per batch; the earliest
+    scan wins when a ticket appears more than once. Returns a dict with the
+    number ``applied`` and lists of ``already_used`` and ``rejected`` scans.
+    """
+    earliest = {}
+    rejected = []
+    for token, used_at in scans:
+        claim = parse_token(token)
+        if claim is None or claim.event_id != event.pk or used_at is None:
+            rejected.append(token)
+            continue
+        if claim.ticket_number not in earliest or used_at < earliest[claim.ticket_number][0]:
+            earliest[claim.ticket_number] = (used_at, token)
+
+    applied = 0
+    already_used = []
+    now = timezone.now()
+    numbers = list(earliest)
+    for start in range(0, len(numbers), SYNC_BATCH_SIZE):
+        batch = numbers[start:start + SYNC_BATCH_SIZE]
+        tickets = admissible_tickets(event.pk).filter(ticket_number__in=batch).values_list(
+            'pk', 'ticket_number', 'is_used', 'used_at',
+        )
+        known = set()
+        pending = {}
+        for pk, ticket_number, is_used, used_at in tickets:
+            known.add(ticket_number)
+            if is_used:
+                already_used.append({'ticket': ticket_number, 'used_at': used_at})
+            else:
+                pending[pk] = earliest[ticket_number][0]
+        rejected.extend(earliest[number][1] for number in batch if number not in known)
+        if pending:
+            applied += Ticket.objects.filter(pk__in=list(pending), is_used=False).update(
+                is_used=True,
+                used_at=Case(
+                    *[When(pk=pk, then=Value(used_at)) for pk, used_at in pending.items()],
+                    output_field=DateTimeField(),
+                ),
+                updated_at=now,
+            )
+
+    return {'applied': applied, 'already_used': already_used, 'rejected': rejected}
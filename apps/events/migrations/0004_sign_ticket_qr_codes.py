@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:12
+
+from django.db import migrations
+
+
+def sign_qr_codes(apps, schema_editor):
+    from apps.events.tokens import is_signed_token, sign_ticket
+
+    Ticket = apps.get_model('events', 'Ticket')
+    tickets = []
+    for ticket in Ticket.objects.only('pk', 'event_id', 'ticket_number', 'quantity', 'qr_code').iterator(chunk_size=2000):
+        if not is_signed_token(ticket.qr_code):
+            ticket.qr_code = sign_ticket(ticket.event_id, ticket.ticket_number, ticket.quantity)
+            tickets.append(ticket)
+    Ticket.objects.bulk_update(tickets, ['qr_code'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_legacy_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(sign_qr_codes, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,8 @@ from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from apps.core.models import TimeStampedModel
+from apps.core.numbering import new_ticket_number
+from .tokens import sign_ticket
 
 
 class Category(models.Model):
@@ -207,7 +209,7 @@ class Ticket(TimeStampedModel):
     
     # Ticket identification
     ticket_number = models.CharField(max_length=20, unique=True)
-    qr_code = models.TextField(blank=True)  # Store QR code data
+    qr_code = models.TextField(blank=True)  # Signed check-in token, see tokens.py
     
     # Status
     is_used = models.BooleanField(default=False)
@@ -221,11 +223,13 @@ class Ticket(TimeStampedModel):
     
     def save(self, *args, **kwargs):
         if not self.ticket_number:
-            import uuid
-            self.ticket_number = str(uuid.uuid4())[:12].upper()
+            self.ticket_number = new_ticket_number()
         
         if not self.total_price:
             self.total_price = self.unit_price * self.quantity
+        
+        if not self.qr_code:
+            self.qr_code = sign_ticket(self.event_id, self.ticket_number, self.quantity)
             
         super().save(*args, **kwargs)
 
@@ -1,3 +1,129 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.test import override_settings
+from django.urls import reverse
+
+from apps.analytics.occupancy import month_start, refresh_venue_months
+from apps.payments.gateway import SimulatorGateway
+from apps.payments.ledger import manager_balance
+from apps.payments.models import EventRevenueBalance, IdempotencyKey, Order, Payment, Refund
+from apps.payments.orders import confirm_orders, decline_orders
+from apps.payments.refunds import process_refunds
+from apps.payments.tests import OrderTestCase
+from .checkin import (
+    ADMITTED, ALREADY_USED, INVALID, NOT_ADMISSIBLE, WRONG_EVENT, Manifest, build_manifest, scan_ticket, sync_scans,
+)
+from .models import Event
+from .tokens import parse_token
+
+
+class CheckInTests(OrderTestCase):
+    def confirmed_ticket(self):
+        ticket, order = self.checkout()
+        confirm_orders(self.planner, order_ids=[order.pk])
+        return ticket
+
+    def test_tokens_are_signed_per_event(self):
+        ticket, _ = self.checkout(quantity=2)
+        claim = parse_token(ticket.qr_code)
+        self.assertEqual(claim, (self.event.pk, ticket.ticket_number, 2))
+        self.assertIsNone(parse_token(ticket.qr_code[:-2] + 'AA'))
+        self.assertIsNone(parse_token(ticket.qr_code.replace('.2.', '.3.')))
+
+    def test_scan_admits_a_confirmed_ticket_once(self):
+        ticket = self.confirmed_ticket()
+        self.assertEqual(scan_ticket(self.event, ticket.qr_code).status, ADMITTED)
+        self.assertEqual(scan_ticket(self.event, ticket.qr_code).status, ALREADY_USED)
+
+    def test_scan_rejects_unconfirmed_and_forged_tickets(self):
+        ticket, _ = self.checkout()
+        self.assertEqual(scan_ticket(self.event, ticket.qr_code).status, NOT_ADMISSIBLE)
+        self.assertEqual(scan_ticket(self.event, ticket.qr_code[:-2] + 'AA').status, INVALID)
+        self.assertEqual(scan_ticket(Event(pk=self.event.pk + 1), ticket.qr_code).status, WRONG_EVENT)
+
+    def test_confirmed_tickets_stay_admissible_after_keys_are_swept(self):
+        ticket = self.confirmed_ticket()
+        IdempotencyKey.objects.all().delete()
+        self.assertEqual(Manifest(build_manifest(self.event)).check(ticket.qr_code), ADMITTED)
+        self.assertEqual(scan_ticket(self.event, ticket.qr_code).status, ADMITTED)
+
+    def test_manifest_checks_tickets_offline(self):
+        admitted = self.confirmed_ticket()
+        used = self.confirmed_ticket()
+        pending, _ = self.checkout()
+        scan_ticket(self.event, used.qr_code)
+        manifest = Manifest(build_manifest(self.event))
+        self.assertEqual(manifest.check(admitted.qr_code), ADMITTED)
+        self.assertEqual(manifest.check(used.qr_code), ALREADY_USED)
+        self.assertEqual(manifest.check(pending.qr_code), NOT_ADMISSIBLE)
+
+    def test_sync_keeps_the_earliest_scan(self):
+        ticket = self.confirmed_ticket()
+        pending, _ = self.checkout()
+        early = datetime(2026, 10, 19, 9, tzinfo=dt_timezone.utc)
+        result = sync_scans(self.event, [
+            (ticket.qr_code, early + timedelta(hours=1)),
+            (ticket.qr_code, early),
+            (pending.qr_code, early),
+            ('junk', early),
+        ])
+        self.assertEqual(result['applied'], 1)
+        self.assertCountEqual(result['rejected'], [pending.qr_code, 'junk'])
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.used_at, early)
+        self.assertEqual(sync_scans(self.event, [(ticket.qr_code, early)])['already_used'][0]['ticket'], ticket.ticket_number)
+
+
+    def test_scan_view_rejects_malformed_bodies(self):
+        ticket = self.confirmed_ticket()
+        self.client.force_login(self.planner)
+        url = reverse('events:checkin_scan', args=[self.event.pk])
+        for body in ('not json', '[1, 2]', '"token"', '{"token": 5}'):
+            response = self.client.post(url, body, content_type='application/json')
+            self.assertEqual((response.status_code, response.json()['status']), (400, INVALID))
+        response = self.client.post(url, {'token': ticket.qr_code}, content_type='application/json')
+        self.assertEqual((response.status_code, response.json()['status']), (200, ADMITTED))
+
+class CancelEventTests(OrderTestCase):
+    # Refunds are left to the process_refunds command instead of the worker pool
+    @override_settings(PAYMENT_WORKERS=0)
+    def test_cancelling_refunds_declines_and_frees_the_venue(self):
+        _, paid = self.checkout()
+        confirm_orders(self.planner, order_ids=[paid.pk])
+        _, pending = self.checkout()
+        refresh_venue_months(self.venue, [self.event.event_date])
+        occupancy = self.venue.occupancy_months.get(month=month_start(self.event.event_date))
+        self.assertEqual(occupancy.events_count, 1)
+
+        self.client.force_login(self.planner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('events:cancel_event', args=[self.event.pk]), {'reason': 'Storm'})
+        self.assertEqual(response.status_code, 302)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.status, Event.Status.CANCELLED)
+        self.assertTrue(Refund.objects.filter(original_payment_id=paid.payment_id).exists())
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, Order.Status.CANCELLED)
+        self.assertEqual(pending.payment.status, Payment.Status.FAILED)
+        occupancy.refresh_from_db()
+        self.assertEqual(occupancy.events_count, 0)
+
+    @override_settings(PAYMENT_WORKERS=0)
+    def test_cancelling_counts_every_refund(self):
+        orders = [self.checkout(quantity=2)[1] for _ in range(3)]
+        confirm_orders(self.planner, event_id=self.event.pk)
+        Payment.objects.update(payment_method=Payment.PaymentMethod.CREDIT_CARD)
+        decline_orders(self.planner, order_ids=[orders[0].pk])
+
+        self.client.force_login(self.planner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('events:cancel_event', args=[self.event.pk]), {'reason': 'Storm'})
+        self.assertEqual(process_refunds(gateway=SimulatorGateway(latency_ms=0), workers=1)['completed'], 3)
+
+        for balance in (manager_balance(self.planner), EventRevenueBalance.objects.get(event=self.event)):
+            self.assertEqual(
+                (balance.balance, balance.gross_revenue, balance.refunded_amount, balance.tickets_sold),
+                (0, 60, 60, 0),
+            )
+            self.assertEqual((balance.refunded_orders, balance.declined_orders), (3, 1))
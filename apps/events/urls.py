@@ -18,6 +18,7 @@ urlpatterns = [
     path('manage/event/<int:pk>/', views.ManageEventView.as_view(), name='manage_event'),
     path('manage/event/<int:pk>/edit/', views.EditEventView.as_view(), name='edit_event'),
     path('manage/event/<int:pk>/delete/', views.DeleteEventView.as_view(), name='delete_event'),
+    path('manage/event/<int:pk>/cancel/', views.CancelEventView.as_view(), name='cancel_event'),
     
     # Admin actions
     path('admin/event/<int:event_id>/deactivate/', views.DeactivateEventView.as_view(), name='admin_deactivate_event'),
@@ -27,6 +28,11 @@ urlpatterns = [
     path('manage/analytics/', views.EventAnalyticsView.as_view(), name='event_analytics'),
     path('manage/event/<int:pk>/analytics/', views.EventDetailAnalyticsView.as_view(), name='event_detail_analytics'),
     
+    # Door check-in
+    path('manage/event/<int:pk>/checkin/scan/', views.CheckInScanView.as_view(), name='checkin_scan'),
+    path('manage/event/<int:pk>/checkin/manifest/', views.CheckInManifestView.as_view(), name='checkin_manifest'),
+    path('manage/event/<int:pk>/checkin/sync/', views.CheckInSyncView.as_view(), name='checkin_sync'),
+    
     # Categories
     path('category/<int:pk>/', views.CategoryEventListView.as_view(), name='category_events'),
     path('manage/categories/', views.CategoryListView.as_view(), name='category_list'),
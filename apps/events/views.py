@@ -1,14 +1,30 @@
+import json
+from decimal import Decimal
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View, TemplateView
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db.models import Q, Count, Sum, Avg
+from django.db.models import Q, Count, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from apps.core.pagination import CONTENT_CARDS_PER_PAGE, build_query_string, paginate_queryset
 from .models import Event, Category, Ticket
+from . import checkin
+from .checkin import build_manifest, scan_ticket, sync_scans
 from .forms import EventForm, BookTicketForm
 from apps.venues.models import Venue
+from apps.payments.ledger import manager_balance, platform_balance
+from apps.analytics.occupancy import refresh_on_commit
+from apps.payments.models import Refund
+from apps.payments.orders import decline_orders
+from apps.payments.refunds import refund_event
+from apps.reviews.models import RatingSummary
+from apps.reviews.threads import attach_reply_windows
 
 
 class EventListView(ListView):
@@ -71,14 +87,18 @@ class EventDetailView(DetailView):
         event = self.get_object()
         
         # Reviews
-        approved_reviews = event.reviews.filter(status='approved')
-        context['reviews'] = approved_reviews.order_by('-created_at')[:5]
-        context['reviews_count'] = approved_reviews.count()
-        context['avg_rating'] = approved_reviews.aggregate(Avg('rating'))['rating__avg']
+        summary = RatingSummary.for_target(event=event)
+        context['reviews'] = event.reviews.filter(status='approved').order_by('-created_at')[:5]
+        context['reviews_count'] = summary.review_count
+        context['avg_rating'] = summary.average if summary.review_count else None
         
-        # Threaded Comments (Top-level only, prefetched replies)
+        # Threaded Comments (Top-level only, with the first direct replies of each)
         approved_comments = event.comments.filter(status='approved', parent__isnull=True)
-        context['comments'] = approved_comments.select_related('user').prefetch_related('replies__user').order_by('-is_pinned', '-created_at')[:10]
+        context['comments'] = attach_reply_windows(
+            approved_comments.select_related('user').order_by('-is_pinned', '-created_at')[:10],
+            size=2,
+            depth=1,
+        )
         context['comments_count'] = event.comments.filter(status='approved').count()
         
         # User specific logic
@@ -260,10 +280,41 @@ class ManageEventView(HorizonPlannerRequiredMixin, DetailView):
         context['tickets_sold'] = completed_orders.aggregate(total=Sum('ticket_quantity'))['total'] or 0
         context['revenue'] = completed_orders.aggregate(total=Sum('total_amount'))['total'] or 0
         context['recent_sales'] = completed_orders.order_by('-created_at')[:10]
+        refund_counts = dict(
+            Refund.objects.filter(original_payment__event=event).values('status').annotate(
+                total=Count('id')
+            ).values_list('status', 'total')
+        )
+        refund_counts['open'] = refund_counts.get(Refund.Status.REQUESTED, 0) + refund_counts.get(Refund.Status.PROCESSING, 0)
+        context['refund_counts'] = refund_counts
         
         return context
 
 
+class CancelEventView(HorizonPlannerRequiredMixin, View):
+    """Cancel an event and refund every completed payment for it"""
+    
+    def post(self, request, pk):
+        events = Event.objects.all()
+        if not request.user.is_admin_user:
+            events = events.filter(manager=request.user)
+        event = get_object_or_404(events, pk=pk)
+        reason = request.POST.get('reason', '').strip()
+        
+        with transaction.atomic():
+            Event.objects.filter(pk=event.pk).update(status=Event.Status.CANCELLED, updated_at=timezone.now())
+            # The bulk update skips the signal that keeps venue occupancy current
+            refresh_on_commit(event.venue_id, [event.event_date])
+            requested = refund_event(event, description=reason or 'Event cancelled', user=request.user)
+            declined = decline_orders(request.user, event_id=event.pk, reason=reason or 'Event cancelled')
+        
+        messages.success(
+            request,
+            f'"{event.title}" has been cancelled, {requested} refund(s) requested and {len(declined)} pending order(s) declined.'
+        )
+        return redirect('events:manage_event', pk=event.pk)
+
+
 class DeleteEventView(HorizonPlannerRequiredMixin, DeleteView):
     """Delete event"""
     model = Event
@@ -347,25 +398,21 @@ class EventAnalyticsView(HorizonPlannerRequiredMixin, View):
         else:
             events = Event.objects.filter(manager=request.user)
         
-        # Get recent events with related data
-        recent_events = events.select_related('category', 'manager').prefetch_related('tickets')[:10]
+        if request.user.is_admin_user:
+            revenue = platform_balance()
+        else:
+            revenue = manager_balance(request.user)
         
-        # Calculate total attendees
-        total_attendees = 0
-        for event in events:
-            total_attendees += event.tickets.aggregate(
-                total=Sum('quantity')
-            )['total'] or 0
+        # Get recent events with their ledger totals
+        recent_events = events.select_related('category', 'manager').annotate(
+            total_revenue=Coalesce('revenue_balance__balance', Value(Decimal('0'))),
+        )[:10]
         
         context = {
             'total_events': events.count(),
-            'total_attendees': total_attendees,
-            'total_revenue': events.aggregate(
-                total=Sum('tickets__total_price')
-            )['total'] or 0,
-            'total_tickets_sold': events.aggregate(
-                total=Sum('tickets__quantity')
-            )['total'] or 0,
+            'total_attendees': revenue.tickets_sold,
+            'total_revenue': revenue.balance,
+            'total_tickets_sold': revenue.tickets_sold,
             'recent_events': recent_events,
         }
         
@@ -393,13 +440,89 @@ class EventDetailAnalyticsView(HorizonPlannerRequiredMixin, DetailView):
         context['orders_count'] = completed_orders.count()
         context['recent_orders'] = completed_orders.order_by('-created_at')[:10]
 
-        reviews = event.reviews.filter(status='approved')
-        context['reviews_count'] = reviews.count()
-        context['avg_rating'] = reviews.aggregate(avg=Avg('rating'))['avg'] or 0
+        summary = RatingSummary.for_target(event=event)
+        context['reviews_count'] = summary.review_count
+        context['avg_rating'] = summary.average
 
         return context
 
 
+class CheckInMixin(HorizonPlannerRequiredMixin):
+    """Door check-in endpoints for an event the user manages"""
+    
+    def get_event(self):
+        events = Event.objects.all()
+        if not self.request.user.is_admin_user:
+            events = events.filter(manager=self.request.user)
+        return get_object_or_404(events.only('pk', 'title'), pk=self.kwargs['pk'])
+    
+    def json_body(self):
+        try:
+            return json.loads(self.request.body or b'{}')
+        except ValueError:
+            return None
+
+
+class CheckInScanView(CheckInMixin, View):
+    """Admit a scanned ticket token"""
+    
+    def post(self, request, *args, **kwargs):
+        token = request.POST.get('token')
+        if token is None:
+            body = self.json_body()
+            token = body.get('token') if isinstance(body, dict) else None
+            # Malformed bodies and non-string tokens are scanned as empty ones, which come back invalid
+            if not isinstance(token, str):
+                token = ''
+        result = scan_ticket(self.get_event(), token)
+        return JsonResponse({
+            'status': result.status,
+            'admitted': result.status == checkin.ADMITTED,
+            'ticket': result.ticket_number,
+            'quantity': result.quantity,
+            'used_at': result.used_at.isoformat() if result.used_at else None,
+        }, status=400 if result.status in (checkin.INVALID, checkin.WRONG_EVENT) else 200)
+
+
+class CheckInManifestView(CheckInMixin, View):
+    """Binary manifest for scanners that check tickets offline"""
+    
+    def get(self, request, *args, **kwargs):
+        event = self.get_event()
+        response = HttpResponse(build_manifest(event), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="checkin-{event.pk}.manifest"'
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+class CheckInSyncView(CheckInMixin, View):
+    """Entries recorded offline, pushed back as {"scans": [{"token": ..., "used_at": ...}]}"""
+    
+    def post(self, request, *args, **kwargs):
+        body = self.json_body()
+        if not isinstance(body, dict) or not isinstance(body.get('scans'), list):
+            return JsonResponse({'error': 'Expected a JSON object with a "scans" list.'}, status=400)
+        
+        scans = []
+        for scan in body['scans']:
+            if not isinstance(scan, dict):
+                continue
+            try:
+                used_at = parse_datetime(str(scan.get('used_at', '')))
+            except ValueError:
+                used_at = None
+            if used_at is not None and timezone.is_naive(used_at):
+                used_at = timezone.make_aware(used_at)
+            scans.append((str(scan.get('token', '')), used_at))
+        
+        result = sync_scans(self.get_event(), scans)
+        result['already_used'] = [
+            {'ticket': entry['ticket'], 'used_at': entry['used_at'].isoformat() if entry['used_at'] else None}
+            for entry in result['already_used']
+        ]
+        return JsonResponse(result)
+
+
 # Category Management Views
 class CategoryListView(HorizonPlannerRequiredMixin, ListView):
     """List all categories"""
@@ -0,0 +1,137 @@
+"""
+Payment gateway adapters.
+
+The active gateway is configured with the ``PAYMENT_GATEWAY`` setting: a
+dotted ``BACKEND`` path and the ``OPTIONS`` passed to its constructor. An
+empty backend disables card payments, leaving Cash on Delivery only.
+
+Gateway calls are slow and must never run on a web worker; see
+``apps.payments.processing`` for the worker pool that calls them.
+"""
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class GatewayError(Exception):
+    """The gateway could not be reached or timed out; the call can be retried."""
+
+
+class GatewayResult:
+    """Outcome of a charge or refund call."""
+
+    def __init__(self, succeeded, transaction_id='', response=None, message=''):
+        self.succeeded = succeeded
+        self.transaction_id = transaction_id
+        self.response = response or {}
+        self.message = message
+
+    def __repr__(self):
+        outcome = 'succeeded' if self.succeeded else 'declined'
+        return f'<GatewayResult {outcome} {self.transaction_id}>'
+
+
+class BaseGateway:
+    """
+    Interface every gateway backend implements.
+
+    ``charge`` and ``refund`` must be idempotent on ``payment.reference`` and
+    ``refund.refund_id``: a call retried after a crash or timeout returns the
+    original outcome instead of moving money twice.
+    """
+    name = ''
+
+    def charge(self, payment):
+        raise NotImplementedError
+
+    def refund(self, refund):
+        raise NotImplementedError
+
+
+class SimulatorGateway(BaseGateway):
+    """
+    Local stand-in for a card processor.
+
+    Every call sleeps for ``latency_ms`` (plus up to ``jitter_ms``), raises
+    ``GatewayError`` with probability ``error_rate`` and is declined with
+    probability ``failure_rate``. Outcomes are remembered per idempotency key.
+    """
+    name = 'simulator'
+
+    def __init__(self, latency_ms=500, jitter_ms=0, failure_rate=0.0, error_rate=0.0, seed=None, history_size=10000):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.history_size = history_size
+        self._random = random.Random(seed)
+        self._history = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _call(self, kind, key, amount, currency):
+        with self._lock:
+            if key in self._history:
+                return self._history[key]
+            latency = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+            errored = self._random.random() < self.error_rate
+            declined = self._random.random() < self.failure_rate
+
+        time.sleep(latency / 1000)
+        if errored:
+            raise GatewayError(f'Simulated gateway timeout after {latency:.0f}ms')
+
+        transaction_id = f'sim_{kind[:2]}_{uuid.uuid4().hex[:20]}'
+        result = GatewayResult(
+            succeeded=not declined,
+            transaction_id=transaction_id,
+            response={
+                'gateway': self.name,
+                'id': transaction_id,
+                'type': kind,
+                'status': 'declined' if declined else 'succeeded',
+                'amount': str(amount),
+                'currency': currency,
+                'latency_ms': round(latency),
+                'created': int(time.time()),
+            },
+            message='Card declined by issuer' if declined else '',
+        )
+        with self._lock:
+            self._history[key] = result
+            while len(self._history) > self.history_size:
+                self._history.popitem(last=False)
+        return result
+
+    def charge(self, payment):
+        return self._call('charge', payment.reference, payment.amount, payment.currency)
+
+    def refund(self, refund):
+        return self._call('refund', str(refund.refund_id), refund.refund_amount, refund.original_payment.currency)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """The configured gateway instance, or ``None`` if card payments are disabled."""
+    global _gateway
+    config = getattr(settings, 'PAYMENT_GATEWAY', None) or {}
+    if not config.get('BACKEND'):
+        return None
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _gateway
+
+
+def set_gateway(gateway):
+    """Replace the configured gateway instance, e.g. with a differently tuned simulator."""
+    global _gateway
+    _gateway = gateway
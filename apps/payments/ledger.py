@@ -0,0 +1,172 @@
+"""
+Revenue ledger for ticket sales.
+
+Every change to ticket revenue is written as an append-only ``RevenueEntry``
+and folded into running ``ManagerRevenueBalance`` and ``EventRevenueBalance``
+rows in the same transaction, so dashboards read revenue from a single row
+instead of summing the order table.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import EventRevenueBalance, ManagerRevenueBalance, RevenueEntry
+
+
+BALANCE_FIELDS = (
+    'balance',
+    'gross_revenue',
+    'refunded_amount',
+    'tickets_sold',
+    'confirmed_orders',
+    'declined_orders',
+    'refunded_orders',
+)
+
+EntryType = RevenueEntry.EntryType
+
+
+def _entry(order, entry_type, amount, tickets, refund=None):
+    return RevenueEntry(
+        entry_type=entry_type,
+        order=order,
+        event_id=order.event_id,
+        manager_id=order.event.manager_id,
+        refund=refund,
+        amount=amount,
+        tickets=tickets,
+    )
+
+
+def confirmation_entry(order):
+    return _entry(order, EntryType.ORDER_CONFIRMED, order.total_amount, order.ticket_quantity)
+
+
+def decline_entry(order, was_confirmed=False):
+    """Decline of ``order``; declining a confirmed order reverses its revenue."""
+    if was_confirmed:
+        return _entry(order, EntryType.ORDER_DECLINED, -order.total_amount, -order.ticket_quantity)
+    return _entry(order, EntryType.ORDER_DECLINED, Decimal('0'), 0)
+
+
+def refund_entry(refund, order):
+    """Refund of a confirmed ``order``; the order is cancelled, so its tickets are released."""
+    return _entry(order, EntryType.ORDER_REFUNDED, -refund.refund_amount, -order.ticket_quantity, refund=refund)
+
+
+def _deltas(entry):
+    """Balance field changes implied by one ledger entry."""
+    deltas = {'balance': entry.amount}
+    if entry.entry_type == EntryType.ORDER_REFUNDED:
+        deltas['refunded_amount'] = -entry.amount
+        deltas['refunded_orders'] = 1
+        deltas['tickets_sold'] = entry.tickets
+        return deltas
+
+    deltas['gross_revenue'] = entry.amount
+    deltas['tickets_sold'] = entry.tickets
+    if entry.entry_type == EntryType.ORDER_CONFIRMED:
+        deltas['confirmed_orders'] = 1
+    else:
+        deltas['declined_orders'] = 1
+        if entry.tickets < 0:
+            deltas['confirmed_orders'] = -1
+    return deltas
+
+
+def _apply(model, key_field, totals):
+    """Add ``totals`` (key -> field deltas) to the balance rows of ``model``."""
+    if not totals:
+        return
+    model.objects.bulk_create(
+        [model(**{key_field: key}) for key in totals],
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    for key, deltas in totals.items():
+        model.objects.filter(**{key_field: key}).update(
+            updated_at=now,
+            **{field: F(field) + value for field, value in deltas.items() if value},
+        )
+
+
+def post_entries(entries):
+    """
+    Append ``entries`` to the ledger and update the running balances.
+
+    Runs in one transaction with a single ``UPDATE`` per affected manager and
+    event, so callers confirming or declining orders in bulk pay for the
+    number of planners and events touched, not the number of orders.
+    """
+    entries = list(entries)
+    if not entries:
+        return []
+
+    by_manager = defaultdict(lambda: defaultdict(int))
+    by_event = defaultdict(lambda: defaultdict(int))
+    for entry in entries:
+        for field, value in _deltas(entry).items():
+            by_manager[entry.manager_id][field] += value
+            by_event[entry.event_id][field] += value
+
+    with transaction.atomic():
+        RevenueEntry.objects.bulk_create(entries, batch_size=500)
+        _apply(ManagerRevenueBalance, 'manager_id', by_manager)
+        _apply(EventRevenueBalance, 'event_id', by_event)
+    return entries
+
+
+def record_refund(refund, order):
+    post_entries([refund_entry(refund, order)])
+
+
+def manager_balance(manager):
+    """The planner's balance row, or an empty unsaved one if nothing was posted yet."""
+    return ManagerRevenueBalance.objects.filter(manager=manager).first() or ManagerRevenueBalance(manager=manager)
+
+
+def platform_balance():
+    """Ledger totals across all planners as an unsaved balance; sums one row per planner."""
+    totals = ManagerRevenueBalance.objects.aggregate(**{field: Sum(field) for field in BALANCE_FIELDS})
+    return ManagerRevenueBalance(**{field: value or 0 for field, value in totals.items()})
+
+
+def _ledger_totals(key_field):
+    """Recompute balance fields from the ledger, grouped by ``key_field``."""
+    confirmed = Q(entry_type=EntryType.ORDER_CONFIRMED)
+    declined = Q(entry_type=EntryType.ORDER_DECLINED)
+    refunded = Q(entry_type=EntryType.ORDER_REFUNDED)
+    rows = RevenueEntry.objects.values(key_field).annotate(
+        balance=Sum('amount'),
+        gross_revenue=Sum('amount', filter=~refunded),
+        refunded_amount=-Sum('amount', filter=refunded),
+        tickets_sold=Sum('tickets'),
+        confirmations=Count('id', filter=confirmed),
+        reversals=Count('id', filter=declined & Q(tickets__lt=0)),
+        declined_orders=Count('id', filter=declined),
+        refunded_orders=Count('id', filter=refunded),
+    ).order_by()
+    for row in rows:
+        row['confirmed_orders'] = row.pop('confirmations') - row.pop('reversals')
+        yield row.pop(key_field), {field: value or 0 for field, value in row.items()}
+
+
+def rebuild_balances():
+    """
+    Recompute every balance row from the ledger.
+
+    Balances are only ever changed by ``post_entries``; this is for
+    reconciliation after manual data fixes. Returns the number of manager
+    and event rows written.
+    """
+    counts = []
+    with transaction.atomic():
+        for model, key_field in ((ManagerRevenueBalance, 'manager_id'), (EventRevenueBalance, 'event_id')):
+            model.objects.all().delete()
+            rows = [model(**{key_field: key}, **totals) for key, totals in _ledger_totals(key_field)]
+            model.objects.bulk_create(rows, batch_size=500)
+            counts.append(len(rows))
+    return tuple(counts)
@@ -0,0 +1,114 @@
+import statistics
+import time
+from datetime import date, time as clock, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from apps.payments.gateway import SimulatorGateway, get_gateway, set_gateway
+from apps.payments.models import Payment
+from apps.payments.processing import settle_payment
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure card checkout latency against the simulated gateway, settling '
+        'charges inline versus in the worker pool. Runs in a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=20, help='Checkouts per run (default: 20)')
+        parser.add_argument('--latency', type=int, default=500, help='Simulated gateway latency in ms (default: 500)')
+        parser.add_argument('--workers', type=int, default=8, help='Worker threads for the queued run (default: 8)')
+
+    def handle(self, *args, **options):
+        previous_gateway = get_gateway()
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        set_gateway(SimulatorGateway(latency_ms=options['latency']))
+        try:
+            client, tickets = self._setup(options['checkouts'] * 2)
+            count = options['checkouts']
+
+            with override_settings(PAYMENT_WORKERS=0):
+                inline = self._run(client, tickets[:count], settle_inline=True)
+            self._report('Inline (web worker waits for the gateway)', inline)
+
+            with override_settings(PAYMENT_WORKERS=options['workers']):
+                queued = self._run(client, tickets[count:], settle_inline=False)
+                started = time.perf_counter()
+                while Payment.objects.filter(status=Payment.Status.PROCESSING).exists():
+                    time.sleep(0.05)
+                drained = time.perf_counter() - started
+            self._report(f'Queued ({options["workers"]} gateway workers)', queued)
+            self.stdout.write(
+                f'  all charges settled {drained * 1000:.0f}ms after the last checkout returned'
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Checkout throughput: {inline["throughput"]:.1f}/s inline, '
+                f'{queued["throughput"]:.1f}/s queued '
+                f'({queued["throughput"] / inline["throughput"]:.0f}x).'
+            ))
+        finally:
+            set_gateway(previous_gateway)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def _setup(self, ticket_count):
+        from apps.events.models import Category, Event, Ticket
+        from apps.users.models import User
+        from apps.venues.models import Venue
+
+        planner = User.objects.create_user('bench-planner', 'planner@example.com', 'x', role='horizon_planner')
+        buyer = User.objects.create_user('bench-buyer', 'buyer@example.com', 'x')
+        venue = Venue.objects.create(
+            name='Benchmark Hall', description='-', address='-', city='-', state='-', postal_code='-',
+            capacity=10000, hourly_rate=Decimal('100'), contact_person='-', contact_phone='-',
+            contact_email='venue@example.com', manager=planner,
+        )
+        event = Event.objects.create(
+            title='Benchmark Event', description='-', category=Category.objects.create(name='Benchmark'),
+            manager=planner, venue=venue, event_date=date.today() + timedelta(days=30),
+            start_time=clock(18), end_time=clock(22), total_seats=ticket_count, base_price=Decimal('25'),
+            status='published',
+        )
+        tickets = [
+            Ticket.objects.create(
+                event=event, buyer=buyer, quantity=1, unit_price=Decimal('25'), total_price=Decimal('25'),
+            )
+            for _ in range(ticket_count)
+        ]
+        client = Client()
+        client.force_login(buyer)
+        return client, tickets
+
+    def _run(self, client, tickets, settle_inline):
+        latencies = []
+        started = time.perf_counter()
+        for ticket in tickets:
+            request_started = time.perf_counter()
+            response = client.post(f'/payments/checkout/{ticket.id}/', {'payment_method': 'credit_card'})
+            if settle_inline:
+                # What a blocking checkout would cost: the charge runs inside the request
+                settle_payment(Payment.objects.latest('id').id)
+            latencies.append(time.perf_counter() - request_started)
+            assert response.status_code == 302, response.status_code
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'count': len(tickets),
+            'elapsed': elapsed,
+            'throughput': len(tickets) / elapsed,
+            'p50': statistics.median(latencies),
+            'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        }
+
+    def _report(self, label, result):
+        self.stdout.write(
+            f'{label}: {result["count"]} checkouts in {result["elapsed"]:.2f}s, '
+            f'{result["throughput"]:.1f}/s, p50 {result["p50"] * 1000:.0f}ms, p95 {result["p95"] * 1000:.0f}ms'
+        )
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from apps.payments.gateway import get_gateway
+from apps.payments.processing import settle_payment, stale_payment_ids
+
+
+def _settle(payment_id):
+    try:
+        return settle_payment(payment_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Settle card payments left in processing through the payment gateway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent gateway calls (default: 4)')
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=0,
+            help='Only settle payments processing for at least this many seconds, leaving newer ones to '
+                 'PAYMENT_WORKERS threads (default: 0)'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Payments fetched per pass (default: 500)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting after one pass')
+        parser.add_argument('--interval', type=int, default=5, help='Seconds between passes with --loop (default: 5)')
+        parser.add_argument(
+            '--max-interval',
+            type=int,
+            default=300,
+            help='Longest wait, in seconds, while passes settle nothing with --loop (default: 300)'
+        )
+
+    def handle(self, *args, **options):
+        if get_gateway() is None:
+            raise CommandError('No payment gateway is configured (PAYMENT_GATEWAY).')
+
+        delay = options['interval']
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='payments') as executor:
+            while True:
+                cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+                batch = stale_payment_ids(cutoff, limit=options['batch_size'])
+                outcomes = list(executor.map(_settle, batch))
+                settled = sum(1 for outcome in outcomes if outcome)
+
+                if batch:
+                    self.stdout.write(
+                        f'Settled {settled} of {len(batch)} payment(s); '
+                        f'{len(batch) - settled} left for a later pass.'
+                    )
+                if not options['loop']:
+                    break
+                if settled and len(batch) == options['batch_size']:
+                    # More may be waiting right behind a full batch
+                    delay = options['interval']
+                    continue
+                time.sleep(delay)
+                # Passes settling nothing (the gateway down, every charge still pending) back off
+                delay = min(delay * 2, options['max_interval']) if batch and not settled else options['interval']
+
+        self.stdout.write(self.style.SUCCESS('Payment processing finished.'))
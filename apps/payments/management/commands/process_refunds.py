@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.payments.refunds import BACKOFF_SECONDS, BATCH_SIZE, MAX_ATTEMPTS, create_refunds, process_refunds
+
+
+class Command(BaseCommand):
+    help = (
+        'Process requested refunds through the payment gateway, resuming any run '
+        'that was interrupted. With --event, first request refunds for every completed payment of that event.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help='Refund every completed payment of this event id')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent gateway calls (default: 4)')
+        parser.add_argument(
+            '--attempts',
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f'Gateway attempts per refund before leaving it for a later run (default: {MAX_ATTEMPTS})'
+        )
+        parser.add_argument(
+            '--backoff',
+            type=float,
+            default=BACKOFF_SECONDS,
+            help=f'Initial retry delay in seconds, doubled per attempt (default: {BACKOFF_SECONDS})'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Refunds per batch (default: {BATCH_SIZE})')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting after one pass')
+        parser.add_argument('--interval', type=int, default=30, help='Seconds between passes with --loop (default: 30)')
+
+    def handle(self, *args, **options):
+        if options['event']:
+            created = create_refunds(event_id=options['event'], description='Event cancelled')
+            self.stdout.write(f'Requested {created} refund(s) for event {options["event"]}.')
+
+        while True:
+            totals = process_refunds(
+                event_id=options['event'],
+                workers=options['workers'],
+                attempts=options['attempts'],
+                backoff=options['backoff'],
+                batch_size=options['batch_size'],
+            )
+            if any(totals.values()):
+                self.stdout.write(
+                    f'Completed {totals["completed"]}, rejected {totals["rejected"]}, '
+                    f'{totals["retry"]} left for a later pass.'
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Refund processing finished.'))
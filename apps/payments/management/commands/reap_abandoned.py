@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.payments.reaper import BATCH_SIZE, reap
+
+
+class Command(BaseCommand):
+    help = 'Expire pending orders nobody confirmed and delete abandoned tickets in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--order-ttl',
+            type=float,
+            help='Expire pending orders older than this many hours (default: PENDING_ORDER_TTL_HOURS)'
+        )
+        parser.add_argument(
+            '--ticket-ttl',
+            type=float,
+            help='Delete orphan tickets older than this many hours (default: ABANDONED_TICKET_TTL_HOURS)'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Rows per statement (default: {BATCH_SIZE})')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be reaped')
+
+    def handle(self, *args, **options):
+        report = reap(
+            order_ttl=timedelta(hours=options['order_ttl']) if options['order_ttl'] is not None else None,
+            ticket_ttl=timedelta(hours=options['ticket_ttl']) if options['ticket_ttl'] is not None else None,
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        prefix = 'Would expire' if options['dry_run'] else 'Expired'
+        self.stdout.write(
+            f'{prefix} {report["orders_expired"]} pending order(s) holding {report["seats_released"]} seat(s); '
+            f'{"would delete" if options["dry_run"] else "deleted"} {report["tickets_deleted"]} orphan ticket(s) '
+            f'in {report["seconds"]}s.'
+        )
+        self.stdout.write(self.style.SUCCESS('Reaper finished.'))
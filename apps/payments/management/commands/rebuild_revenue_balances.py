@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.payments.ledger import rebuild_balances
+
+
+class Command(BaseCommand):
+    help = 'Recompute planner and event revenue balances from the revenue ledger'
+
+    def handle(self, *args, **options):
+        managers, events = rebuild_balances()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt revenue balances for {managers} planner(s) and {events} event(s).'
+        ))
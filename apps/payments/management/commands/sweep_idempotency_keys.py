@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.payments.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete expired checkout idempotency keys in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Keys deleted per statement (default: 1000)')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        batch_size = options['batch_size']
+        deleted = 0
+
+        while True:
+            batch = list(
+                IdempotencyKey.objects.filter(expires_at__lt=now).values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            deleted += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency key(s).'))
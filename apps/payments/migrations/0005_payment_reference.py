@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:04
+
+from django.db import migrations, models
+
+
+def backfill_references(apps, schema_editor):
+    from apps.core.numbering import SnowflakeGenerator, _encode, _feistel, _round_keys, check_character
+
+    # A fixed node id instead of a lease: no process generated payment references before this migration
+    generator = SnowflakeGenerator(0)
+    keys = _round_keys()
+    Payment = apps.get_model('payments', 'Payment')
+    payments = list(Payment.objects.filter(reference__isnull=True).only('pk'))
+    for payment in payments:
+        body = _encode(_feistel(generator.next_id(), keys))
+        payment.reference = f'PAY{body}{check_character(body)}'
+    Payment.objects.bulk_update(payments, ['reference'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='reference',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_references, migrations.RunPython.noop),
+    ]
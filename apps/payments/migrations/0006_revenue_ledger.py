@@ -0,0 +1,141 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_ledger(apps, schema_editor):
+    """Post existing confirmed orders and completed refunds to the new ledger."""
+    Order = apps.get_model('payments', 'Order')
+    Refund = apps.get_model('payments', 'Refund')
+    RevenueEntry = apps.get_model('payments', 'RevenueEntry')
+    ManagerRevenueBalance = apps.get_model('payments', 'ManagerRevenueBalance')
+    EventRevenueBalance = apps.get_model('payments', 'EventRevenueBalance')
+
+    entries = [
+        RevenueEntry(
+            entry_type='order_confirmed',
+            order_id=order_id,
+            event_id=event_id,
+            manager_id=manager_id,
+            amount=total_amount,
+            tickets=quantity,
+        )
+        for order_id, event_id, manager_id, total_amount, quantity in Order.objects.filter(
+            status='confirmed',
+        ).values_list('id', 'event_id', 'event__manager_id', 'total_amount', 'ticket_quantity')
+    ]
+    entries += [
+        RevenueEntry(
+            entry_type='order_refunded',
+            order_id=order_id,
+            event_id=event_id,
+            manager_id=manager_id,
+            refund_id=refund_id,
+            amount=-refund_amount,
+            tickets=0,
+        )
+        for refund_id, order_id, event_id, manager_id, refund_amount in Refund.objects.filter(
+            status='completed',
+            original_payment__order__isnull=False,
+        ).values_list(
+            'id',
+            'original_payment__order__id',
+            'original_payment__order__event_id',
+            'original_payment__order__event__manager_id',
+            'refund_amount',
+        )
+    ]
+    RevenueEntry.objects.bulk_create(entries, batch_size=500)
+
+    balances = {'manager': {}, 'event': {}}
+    for entry in entries:
+        for scope, key in (('manager', entry.manager_id), ('event', entry.event_id)):
+            totals = balances[scope].setdefault(key, {
+                'balance': 0, 'gross_revenue': 0, 'refunded_amount': 0,
+                'tickets_sold': 0, 'confirmed_orders': 0, 'refunded_orders': 0,
+            })
+            totals['balance'] += entry.amount
+            if entry.entry_type == 'order_refunded':
+                totals['refunded_amount'] -= entry.amount
+                totals['refunded_orders'] += 1
+            else:
+                totals['gross_revenue'] += entry.amount
+                totals['tickets_sold'] += entry.tickets
+                totals['confirmed_orders'] += 1
+
+    ManagerRevenueBalance.objects.bulk_create(
+        [ManagerRevenueBalance(manager_id=key, **totals) for key, totals in balances['manager'].items()]
+    )
+    EventRevenueBalance.objects.bulk_create(
+        [EventRevenueBalance(event_id=key, **totals) for key, totals in balances['event'].items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_legacy_fields'),
+        ('payments', '0005_payment_reference'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventRevenueBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('gross_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tickets_sold', models.IntegerField(default=0)),
+                ('confirmed_orders', models.IntegerField(default=0)),
+                ('declined_orders', models.IntegerField(default=0)),
+                ('refunded_orders', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_balance', to='events.event')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ManagerRevenueBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('gross_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tickets_sold', models.IntegerField(default=0)),
+                ('confirmed_orders', models.IntegerField(default=0)),
+                ('declined_orders', models.IntegerField(default=0)),
+                ('refunded_orders', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('manager', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_balance', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RevenueEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('order_confirmed', 'Order Confirmed'), ('order_declined', 'Order Declined'), ('order_refunded', 'Order Refunded')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('tickets', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_entries', to='events.event')),
+                ('manager', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_entries', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_entries', to='payments.order')),
+                ('refund', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='revenue_entries', to='payments.refund')),
+            ],
+            options={
+                'verbose_name_plural': 'Revenue entries',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['manager', 'created_at'], name='payments_re_manager_dfcc90_idx'), models.Index(fields=['event', 'created_at'], name='payments_re_event_i_531f9c_idx')],
+            },
+        ),
+        migrations.RunPython(seed_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_revenue_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='payments_order_status_created'),
+        ),
+    ]
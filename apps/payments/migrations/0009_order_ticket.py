@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-19 22:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_tickets(apps, schema_editor):
+    Order = apps.get_model('payments', 'Order')
+    Ticket = apps.get_model('events', 'Ticket')
+    IdempotencyKey = apps.get_model('payments', 'IdempotencyKey')
+
+    linked = {}
+    for order_id, ticket_id in IdempotencyKey.objects.filter(order__isnull=False).values_list('order_id', 'ticket_id'):
+        linked[order_id] = ticket_id
+
+    # Orders placed before checkout keys existed: the buyer's latest unclaimed ticket for the event
+    # with the same quantity, created no later than the order
+    claimed = set(linked.values())
+    for order in Order.objects.exclude(pk__in=list(linked)).order_by('created_at'):
+        candidates = Ticket.objects.filter(
+            buyer_id=order.user_id,
+            event_id=order.event_id,
+            quantity=order.ticket_quantity,
+            created_at__lte=order.created_at,
+        ).exclude(pk__in=claimed).order_by('-created_at').values_list('pk', flat=True)
+        ticket_id = next(iter(candidates[:1]), None)
+        if ticket_id is not None:
+            linked[order.pk] = ticket_id
+            claimed.add(ticket_id)
+
+    Order.objects.bulk_update(
+        [Order(pk=order_id, ticket_id=ticket_id) for order_id, ticket_id in linked.items()],
+        ['ticket'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_sign_ticket_qr_codes'),
+        ('payments', '0008_order_user_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='ticket',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='events.ticket'),
+        ),
+        migrations.RunPython(link_tickets, migrations.RunPython.noop),
+    ]
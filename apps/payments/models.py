@@ -1,9 +1,16 @@
+from datetime import timedelta
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from apps.core.models import TimeStampedModel
+from apps.core.numbering import new_order_number, new_payment_reference
 import uuid
 
 
+CHECKOUT_IDEMPOTENCY_TTL = timedelta(hours=getattr(settings, 'CHECKOUT_IDEMPOTENCY_TTL_HOURS', 24))
+
+
 class Payment(TimeStampedModel):
     """Payment processing model"""
     
@@ -25,6 +32,7 @@ class Payment(TimeStampedModel):
     
     # Payment identification
     payment_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    reference = models.CharField(max_length=20, unique=True, null=True, blank=True, editable=False)
     transaction_id = models.CharField(max_length=100, blank=True)  # External payment gateway ID
     
     # User and event details
@@ -54,6 +62,11 @@ class Payment(TimeStampedModel):
     
     def __str__(self):
         return f"Payment {self.payment_id} - ${self.amount} ({self.get_status_display()})"
+    
+    def save(self, *args, **kwargs):
+        if not self.reference:
+            self.reference = new_payment_reference()
+        super().save(*args, **kwargs)
 
 
 class Order(TimeStampedModel):
@@ -68,6 +81,14 @@ class Order(TimeStampedModel):
     payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='order')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
     event = models.ForeignKey('events.Event', on_delete=models.CASCADE, related_name='orders')
+    # The ticket paid for; unlike the checkout's idempotency key it is never swept
+    ticket = models.ForeignKey(
+        'events.Ticket',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='orders'
+    )
     
     # Order details
     ticket_quantity = models.PositiveIntegerField()
@@ -87,15 +108,17 @@ class Order(TimeStampedModel):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='payments_order_status_created'),
+            models.Index(fields=['user', '-created_at', '-id'], name='payments_order_user_history'),
+        ]
     
     def __str__(self):
         return f"Order {self.order_number} - {self.event.title}"
     
     def save(self, *args, **kwargs):
         if not self.order_number:
-            import random
-            import string
-            self.order_number = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
+            self.order_number = new_order_number()
         super().save(*args, **kwargs)
 
 
@@ -143,3 +166,107 @@ class Refund(TimeStampedModel):
     
     def __str__(self):
         return f"Refund {self.refund_id} - ${self.refund_amount} ({self.get_status_display()})"
+
+
+class IdempotencyKey(models.Model):
+    """Client-supplied key that makes a checkout POST safe to replay"""
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=64)
+    ticket = models.ForeignKey('events.Ticket', on_delete=models.CASCADE, related_name='idempotency_keys')
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='idempotency_key'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+    
+    def __str__(self):
+        return f"Idempotency key {self.key} - {self.user.username}"
+    
+    def save(self, *args, **kwargs):
+        if not self.expires_at:
+            self.expires_at = timezone.now() + CHECKOUT_IDEMPOTENCY_TTL
+        super().save(*args, **kwargs)
+
+
+class RevenueEntry(models.Model):
+    """Append-only ledger line recording a change to ticket revenue"""
+    
+    class EntryType(models.TextChoices):
+        ORDER_CONFIRMED = 'order_confirmed', 'Order Confirmed'
+        ORDER_DECLINED = 'order_declined', 'Order Declined'
+        ORDER_REFUNDED = 'order_refunded', 'Order Refunded'
+    
+    entry_type = models.CharField(max_length=20, choices=EntryType.choices)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='revenue_entries')
+    event = models.ForeignKey('events.Event', on_delete=models.CASCADE, related_name='revenue_entries')
+    manager = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='revenue_entries')
+    refund = models.ForeignKey(
+        Refund,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='revenue_entries'
+    )
+    
+    # Signed changes applied to the balances
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    tickets = models.IntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name_plural = 'Revenue entries'
+        indexes = [
+            models.Index(fields=['manager', 'created_at']),
+            models.Index(fields=['event', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_entry_type_display()} {self.order_id}: {self.amount}"
+
+
+class RevenueBalance(models.Model):
+    """Running totals of the revenue ledger"""
+    
+    # Net revenue: confirmed orders minus reversals and refunds
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    gross_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tickets_sold = models.IntegerField(default=0)
+    confirmed_orders = models.IntegerField(default=0)
+    declined_orders = models.IntegerField(default=0)
+    refunded_orders = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        abstract = True
+
+
+class ManagerRevenueBalance(RevenueBalance):
+    """Revenue ledger totals across all events of one Horizon Planner"""
+    
+    manager = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='revenue_balance')
+    
+    def __str__(self):
+        return f"Revenue balance for {self.manager.username}: {self.balance}"
+
+
+class EventRevenueBalance(RevenueBalance):
+    """Revenue ledger totals for one event"""
+    
+    event = models.OneToOneField('events.Event', on_delete=models.CASCADE, related_name='revenue_balance')
+    
+    def __str__(self):
+        return f"Revenue balance for {self.event.title}: {self.balance}"
@@ -0,0 +1,179 @@
+"""
+Confirmation workflow for ticket orders.
+
+Planners confirm or decline orders in batches: orders and payments change
+with one ``UPDATE ... WHERE id IN`` each, buyer notifications are inserted
+with ``bulk_create`` and the revenue ledger is posted once per event, so a
+request confirming thousands of Cash on Delivery orders stays a handful of
+queries.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.core import outbox
+from apps.core.models import Notification
+from .ledger import confirmation_entry, decline_entry, post_entries, refund_entry
+from .models import Order, Payment, Refund
+from .processing import run_in_background
+from .refunds import OPEN_STATUSES, create_refunds, process_refunds
+
+
+def manageable_orders(user):
+    """Orders the user may confirm or decline: all for admins, their events' for planners."""
+    if user.is_admin_user:
+        return Order.objects.all()
+    return Order.objects.filter(event__manager=user)
+
+
+def _select(user, statuses, order_ids=None, event_id=None):
+    orders = manageable_orders(user).filter(status__in=statuses)
+    if order_ids is not None:
+        orders = orders.filter(pk__in=order_ids)
+    if event_id is not None:
+        orders = orders.filter(event_id=event_id)
+    return list(
+        orders.select_for_update(of=('self',)).select_related('event', 'payment').order_by('created_at', 'pk')
+    )
+
+
+def _seats_taken(event_ids):
+    """Seats already held by orders with a completed payment, per event."""
+    return dict(
+        Order.objects.filter(
+            event_id__in=event_ids,
+            payment__status=Payment.Status.COMPLETED,
+        ).values('event_id').annotate(taken=Sum('ticket_quantity')).values_list('event_id', 'taken')
+    )
+
+
+def _notify_confirmed(orders, reviewer):
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=order.user_id,
+            admin_user=reviewer,
+            notification_type=Notification.NotificationType.OTHER,
+            subject=f"Booking Accepted: {order.event.title}",
+            message=f"Your booking for '{order.event.title}' has been accepted! You can now download your ticket.",
+            event_id=order.event_id,
+            details={'action_url': f"/payments/order/{order.id}/ticket/"},
+        )
+        for order in orders
+    ], batch_size=500)
+
+
+def confirm_orders(user, order_ids=None, event_id=None):
+    """
+    Confirm the user's pending orders in ``order_ids`` and/or for ``event_id``.
+
+    Orders are confirmed oldest first while the event has seats left; card
+    orders whose charge has not gone through are never confirmed. Returns
+    ``(confirmed, skipped)`` lists of orders.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        selected = _select(user, [Order.Status.PENDING], order_ids, event_id)
+        if not selected:
+            return [], []
+
+        # Seat availability is worked out once per event, not once per order
+        taken = defaultdict(int, _seats_taken({order.event_id for order in selected}))
+        confirmed = []
+        skipped = []
+        for order in selected:
+            if order.payment.status in (Payment.Status.PROCESSING, Payment.Status.FAILED):
+                skipped.append(order)
+                continue
+            if order.payment.status == Payment.Status.COMPLETED:
+                # Already charged by the gateway, so its seats are already counted
+                confirmed.append(order)
+                continue
+            if taken[order.event_id] + order.ticket_quantity > order.event.total_seats:
+                skipped.append(order)
+                continue
+            taken[order.event_id] += order.ticket_quantity
+            confirmed.append(order)
+
+        if not confirmed:
+            return [], skipped
+
+        Order.objects.filter(pk__in=[order.pk for order in confirmed]).update(
+            status=Order.Status.CONFIRMED,
+            updated_at=now,
+        )
+        Payment.objects.filter(
+            pk__in=[order.payment_id for order in confirmed],
+            status=Payment.Status.PENDING,
+        ).update(status=Payment.Status.COMPLETED, processed_at=now, updated_at=now)
+        outbox.publish(*[
+            outbox.message(order.payment, outbox.PAYMENT_COMPLETED, {'payment_id': order.payment_id})
+            for order in confirmed
+            if order.payment.status == Payment.Status.PENDING
+        ])
+        for order in confirmed:
+            order.status = Order.Status.CONFIRMED
+
+        post_entries(confirmation_entry(order) for order in confirmed)
+        _notify_confirmed(confirmed, user)
+
+    return confirmed, skipped
+
+
+def decline_orders(user, order_ids=None, event_id=None, reason=''):
+    """
+    Decline the user's orders in ``order_ids`` and/or for ``event_id``.
+
+    Selected orders may be pending or confirmed; declining a confirmed order
+    reverses its revenue in the ledger, as a refund when its payment was taken.
+    Payments already taken are refunded through the refund pipeline, the rest
+    are marked failed; orders whose
+    card charge is still in flight are left alone. An event-wide decline
+    without ``order_ids`` only touches pending orders. Returns the declined
+    orders.
+    """
+    now = timezone.now()
+    reason = reason or 'No reason provided'
+    statuses = [Order.Status.PENDING] if order_ids is None else [Order.Status.PENDING, Order.Status.CONFIRMED]
+
+    with transaction.atomic():
+        declined = [
+            order for order in _select(user, statuses, order_ids, event_id)
+            if order.payment.status != Payment.Status.PROCESSING
+        ]
+        if not declined:
+            return []
+        captured = [order.payment_id for order in declined if order.payment.status == Payment.Status.COMPLETED]
+
+        Order.objects.filter(pk__in=[order.pk for order in declined]).update(
+            status=Order.Status.CANCELLED,
+            updated_at=now,
+        )
+        Payment.objects.filter(pk__in=[order.payment_id for order in declined]).exclude(pk__in=captured).update(
+            status=Payment.Status.FAILED,
+            notes=reason,
+            failed_at=now,
+            updated_at=now,
+        )
+        # Captured payments stay completed until their refund goes through
+        if create_refunds(payment_ids=captured, reason=Refund.Reason.OTHER, description=reason, user=user):
+            run_in_background(process_refunds)
+        # The refund pipeline skips cancelled orders, so refunds of confirmed ones are posted here
+        refunds = {
+            refund.original_payment_id: refund
+            for refund in Refund.objects.filter(original_payment_id__in=captured, status__in=OPEN_STATUSES)
+        }
+        entries = []
+        for order in declined:
+            confirmed = order.status == Order.Status.CONFIRMED
+            if confirmed and order.payment_id in refunds:
+                entries += [decline_entry(order), refund_entry(refunds[order.payment_id], order)]
+            else:
+                entries.append(decline_entry(order, was_confirmed=confirmed))
+        post_entries(entries)
+        for order in declined:
+            order.status = Order.Status.CANCELLED
+
+    return declined
@@ -0,0 +1,143 @@
+"""
+Asynchronous settlement of card payments.
+
+Checkout records a card payment as ``processing`` so web workers never wait
+on gateway latency. The ``process_payments`` command, run from cron or as a
+``--loop`` worker, calls the gateway and settles the payment. Long-lived
+servers can set ``PAYMENT_WORKERS`` to also settle each payment from a pool
+of threads in the web process once its transaction commits; serverless
+functions are frozen between requests, so the pool is off by default.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from apps.core import outbox
+from .gateway import GatewayError, get_gateway
+from .models import Order, Payment
+
+
+logger = logging.getLogger(__name__)
+
+# Payment methods settled through the configured gateway
+GATEWAY_METHODS = [Payment.PaymentMethod.CREDIT_CARD, Payment.PaymentMethod.DEBIT_CARD]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _worker_count():
+    return getattr(settings, 'PAYMENT_WORKERS', 0)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_worker_count(), thread_name_prefix='payments')
+    return _executor
+
+
+def _reset_after_fork():
+    # Threads do not survive a fork; forked web workers start their own pool
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _run_in_worker(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Background %s%r failed', function.__name__, args)
+    finally:
+        # Each worker thread holds its own connection; do not leak them
+        connections.close_all()
+
+
+def run_in_background(function, *args):
+    """
+    Call ``function(*args)`` in the worker pool once the current transaction commits.
+
+    With ``PAYMENT_WORKERS = 0`` nothing runs in-process and the work is left
+    to the ``process_payments`` and ``process_refunds`` commands instead.
+    Returns whether the call was queued.
+    """
+    if _worker_count() <= 0:
+        return False
+    transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, function, *args))
+    return True
+
+
+def enqueue_charge(payment_id):
+    """Settle the payment in the worker pool once the current transaction commits."""
+    run_in_background(settle_payment, payment_id)
+
+
+def settle_payment(payment_id, gateway=None):
+    """
+    Charge a ``processing`` payment through the gateway and record the outcome.
+
+    Returns the new status, or ``None`` if the payment was already settled or
+    the gateway could not be reached (the payment stays ``processing`` and is
+    retried later). A declined charge cancels the pending order.
+    """
+    gateway = gateway or get_gateway()
+    payment = Payment.objects.filter(pk=payment_id, status=Payment.Status.PROCESSING).first()
+    if payment is None or gateway is None:
+        return None
+
+    try:
+        result = gateway.charge(payment)
+    except GatewayError as exc:
+        Payment.objects.filter(pk=payment.pk, status=Payment.Status.PROCESSING).update(
+            gateway_response={'gateway': gateway.name, 'error': str(exc), 'at': timezone.now().isoformat()},
+        )
+        return None
+
+    now = timezone.now()
+    with transaction.atomic():
+        if result.succeeded:
+            status = Payment.Status.COMPLETED
+            updated = Payment.objects.filter(pk=payment.pk, status=Payment.Status.PROCESSING).update(
+                status=status,
+                transaction_id=result.transaction_id,
+                gateway_response=result.response,
+                processed_at=now,
+            )
+            if updated:
+                outbox.publish(outbox.message(payment, outbox.PAYMENT_COMPLETED, {'payment_id': payment.pk}))
+        else:
+            status = Payment.Status.FAILED
+            updated = Payment.objects.filter(pk=payment.pk, status=Payment.Status.PROCESSING).update(
+                status=status,
+                transaction_id=result.transaction_id,
+                gateway_response=result.response,
+                processed_at=now,
+                failed_at=now,
+                notes=result.message,
+            )
+            if updated:
+                Order.objects.filter(payment_id=payment.pk, status=Order.Status.PENDING).update(
+                    status=Order.Status.CANCELLED,
+                )
+    return status if updated else None
+
+
+def stale_payment_ids(older_than, limit=None):
+    """Ids of payments that have been ``processing`` since before ``older_than``."""
+    queryset = Payment.objects.filter(
+        status=Payment.Status.PROCESSING,
+        updated_at__lt=older_than,
+    ).order_by('created_at').values_list('pk', flat=True)
+    return list(queryset[:limit] if limit else queryset)
@@ -0,0 +1,191 @@
+"""
+Reaper for abandoned checkouts.
+
+Cash on Delivery orders that nobody confirms stay ``pending`` and tickets
+created by the booking form are never removed when the buyer walks away.
+``reap`` expires pending orders past ``PENDING_ORDER_TTL_HOURS`` and deletes
+tickets past ``ABANDONED_TICKET_TTL_HOURS`` that no live order refers to,
+both in batches so each statement stays short. It runs from the
+``reap_abandoned`` command or, with ``REAPER_INTERVAL_SECONDS`` set, from a
+background thread in each web process.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef, Sum
+from django.utils import timezone
+
+from apps.core.models import Notification
+from apps.events.models import Ticket
+from .models import Order, Payment
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+LIVE_ORDER_STATUSES = [Order.Status.PENDING, Order.Status.CONFIRMED]
+
+
+def expirable_orders(older_than):
+    """Pending orders created before ``older_than`` whose payment was never taken."""
+    return Order.objects.filter(
+        status=Order.Status.PENDING,
+        created_at__lt=older_than,
+        payment__status=Payment.Status.PENDING,
+    )
+
+
+def orphan_tickets(older_than):
+    """Tickets created before ``older_than`` that no pending or confirmed order refers to."""
+    # Live orders the backfill could not link to a ticket keep all of their buyer's tickets for the event
+    unlinked = Order.objects.filter(
+        ticket__isnull=True,
+        status__in=LIVE_ORDER_STATUSES,
+        user_id=OuterRef('buyer_id'),
+        event_id=OuterRef('event_id'),
+    )
+    return Ticket.objects.filter(created_at__lt=older_than).exclude(
+        orders__status__in=LIVE_ORDER_STATUSES,
+    ).exclude(Exists(unlinked))
+
+
+def _notify_expired(orders):
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=order.user_id,
+            notification_type=Notification.NotificationType.OTHER,
+            subject=f"Order Expired: {order.event.title}",
+            message=f"Your order {order.order_number} for '{order.event.title}' was not confirmed in time and has expired.",
+            event_id=order.event_id,
+            details={'order_number': order.order_number},
+        )
+        for order in orders
+    ], batch_size=500)
+
+
+def expire_pending_orders(older_than, batch_size=BATCH_SIZE):
+    """Cancel expirable orders and their payments; returns ``(orders, seats)`` released."""
+    expired = 0
+    seats = 0
+    now = timezone.now()
+    while True:
+        with transaction.atomic():
+            orders = list(
+                expirable_orders(older_than)
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('event')
+                .only('pk', 'payment_id', 'user_id', 'event_id', 'event__title', 'order_number', 'ticket_quantity')
+                .order_by('created_at')[:batch_size]
+            )
+            if not orders:
+                break
+            Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+                status=Order.Status.CANCELLED,
+                updated_at=now,
+            )
+            Payment.objects.filter(
+                pk__in=[order.payment_id for order in orders],
+                status=Payment.Status.PENDING,
+            ).update(status=Payment.Status.CANCELLED, notes='Order expired before confirmation', updated_at=now)
+            _notify_expired(orders)
+        expired += len(orders)
+        seats += sum(order.ticket_quantity for order in orders)
+        if len(orders) < batch_size:
+            break
+    return expired, seats
+
+
+def delete_orphan_tickets(older_than, batch_size=BATCH_SIZE):
+    """Delete orphan tickets in batches; returns how many were deleted."""
+    deleted = 0
+    while True:
+        batch = list(orphan_tickets(older_than).order_by().values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        Ticket.objects.filter(pk__in=batch).delete()
+        deleted += len(batch)
+        if len(batch) < batch_size:
+            break
+    return deleted
+
+
+def _ttl(name, default):
+    return timedelta(hours=getattr(settings, name, default))
+
+
+def reap(order_ttl=None, ticket_ttl=None, batch_size=BATCH_SIZE, dry_run=False):
+    """Expire stale orders and delete orphan tickets; returns a report dict."""
+    now = timezone.now()
+    order_cutoff = now - (order_ttl or _ttl('PENDING_ORDER_TTL_HOURS', 48))
+    ticket_cutoff = now - (ticket_ttl or _ttl('ABANDONED_TICKET_TTL_HOURS', 24))
+    started = time.perf_counter()
+
+    if dry_run:
+        orders = expirable_orders(order_cutoff)
+        report = {
+            'orders_expired': orders.count(),
+            'seats_released': orders.aggregate(total=Sum('ticket_quantity'))['total'] or 0,
+            'tickets_deleted': orphan_tickets(ticket_cutoff).count(),
+        }
+    else:
+        expired, seats = expire_pending_orders(order_cutoff, batch_size)
+        # Orders expired above no longer hold on to their tickets
+        report = {
+            'orders_expired': expired,
+            'seats_released': seats,
+            'tickets_deleted': delete_orphan_tickets(ticket_cutoff, batch_size),
+        }
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _run_scheduler(interval, stopped):
+    while not stopped.wait(interval):
+        try:
+            report = reap()
+            if report['orders_expired'] or report['tickets_deleted']:
+                logger.info('Reaper: %s', report)
+        except Exception:
+            logger.exception('Reaper run failed')
+        finally:
+            connections.close_all()
+
+
+def start_scheduler(interval=None):
+    """
+    Run ``reap`` every ``REAPER_INTERVAL_SECONDS`` in a daemon thread.
+
+    Does nothing when the interval is 0 (the default) or the thread is
+    already running. Concurrent runs in several processes are safe: rows
+    locked by one reaper are skipped by the others.
+    """
+    global _scheduler
+    interval = interval or getattr(settings, 'REAPER_INTERVAL_SECONDS', 0)
+    if interval <= 0:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            stopped = threading.Event()
+            thread = threading.Thread(target=_run_scheduler, args=(interval, stopped), name='reaper', daemon=True)
+            thread.start()
+            _scheduler = (thread, stopped)
+    return _scheduler[1]
+
+
+def _reset_after_fork():
+    global _scheduler, _scheduler_lock
+    _scheduler = None
+    _scheduler_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
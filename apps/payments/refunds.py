@@ -0,0 +1,231 @@
+"""
+Refund pipeline.
+
+``create_refunds`` inserts one ``Refund`` per completed payment of an event
+(or of a set of payments) with ``bulk_create``. ``process_refunds`` claims
+them in batches, sends card refunds through the gateway in a bounded pool of
+threads with retry and exponential backoff, and applies each batch's
+outcomes to refunds, payments, orders, the revenue ledger and buyer
+notifications in one transaction.
+
+Progress lives in the refund rows themselves. A run that dies leaves its
+batch ``processing``; those rows are claimed again once ``CLAIM_TIMEOUT``
+has passed, which is safe because gateway refunds are idempotent on
+``refund_id``. Re-running either step never refunds a payment twice.
+"""
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.models import Notification
+from .gateway import GatewayError, GatewayResult, get_gateway
+from .ledger import post_entries, refund_entry
+from .models import Order, Payment, Refund
+from .processing import GATEWAY_METHODS, run_in_background
+
+
+logger = logging.getLogger(__name__)
+
+# A payment with one of these refunds is never refunded again
+OPEN_STATUSES = [Refund.Status.REQUESTED, Refund.Status.PROCESSING, Refund.Status.COMPLETED]
+CLAIM_TIMEOUT = timedelta(minutes=10)
+BATCH_SIZE = 200
+MAX_ATTEMPTS = 4
+BACKOFF_SECONDS = 0.5
+
+
+def refundable_payments(event_id=None, payment_ids=None):
+    payments = Payment.objects.filter(status=Payment.Status.COMPLETED).exclude(refunds__status__in=OPEN_STATUSES)
+    if event_id is not None:
+        payments = payments.filter(event_id=event_id)
+    if payment_ids is not None:
+        payments = payments.filter(pk__in=payment_ids)
+    return payments
+
+
+def create_refunds(event_id=None, payment_ids=None, reason=Refund.Reason.EVENT_CANCELLED, description='', user=None):
+    """Request a full refund of every refundable payment selected; returns how many were created."""
+    with transaction.atomic():
+        payments = list(
+            refundable_payments(event_id, payment_ids).select_for_update(of=('self',)).only('pk', 'amount')
+        )
+        Refund.objects.bulk_create([
+            Refund(
+                original_payment_id=payment.pk,
+                refund_amount=payment.amount,
+                reason=reason,
+                reason_description=description,
+                processed_by=user,
+            )
+            for payment in payments
+        ], batch_size=500)
+    return len(payments)
+
+
+def _claimable(now):
+    return Q(status=Refund.Status.REQUESTED) | Q(status=Refund.Status.PROCESSING, updated_at__lt=now - CLAIM_TIMEOUT)
+
+
+def claim_refunds(limit, event_id=None, exclude=()):
+    """Move up to ``limit`` refunds to ``processing`` and return them, oldest first."""
+    now = timezone.now()
+    with transaction.atomic():
+        refunds = Refund.objects.filter(_claimable(now)).exclude(pk__in=list(exclude))
+        if event_id is not None:
+            refunds = refunds.filter(original_payment__event_id=event_id)
+        ids = list(
+            refunds.select_for_update(skip_locked=True, of=('self',))
+            .order_by('created_at', 'pk').values_list('pk', flat=True)[:limit]
+        )
+        Refund.objects.filter(pk__in=ids).update(status=Refund.Status.PROCESSING, updated_at=now)
+    return list(
+        Refund.objects.filter(pk__in=ids).select_related('original_payment').order_by('created_at', 'pk')
+    )
+
+
+def _refund_with_retry(gateway, refund, attempts, backoff):
+    """Gateway outcome for ``refund``, or the last ``GatewayError`` if every attempt failed."""
+    for attempt in range(attempts):
+        try:
+            return gateway.refund(refund)
+        except GatewayError as exc:
+            error = exc
+            if attempt + 1 < attempts:
+                # Exponential backoff with jitter so workers do not retry in lockstep
+                time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+    return error
+
+
+def _outcome(gateway, refund, attempts, backoff):
+    if refund.original_payment.payment_method not in GATEWAY_METHODS:
+        # Cash and transfers are paid back by the organiser, not through the gateway
+        return GatewayResult(True, response={'gateway': 'offline', 'amount': str(refund.refund_amount)})
+    if gateway is None:
+        return GatewayError('No payment gateway is configured')
+    return _refund_with_retry(gateway, refund, attempts, backoff)
+
+
+def _notify_refunded(refunds, orders):
+    notifications = []
+    for refund in refunds:
+        order = orders.get(refund.original_payment_id)
+        if order is None:
+            continue
+        notifications.append(Notification(
+            recipient_id=order.user_id,
+            notification_type=Notification.NotificationType.OTHER,
+            subject=f"Refund Issued: {order.event.title}",
+            message=f"Your payment of ${refund.refund_amount} for '{order.event.title}' has been refunded.",
+            event_id=order.event_id,
+            details={'refund_id': str(refund.refund_id), 'order_number': order.order_number},
+        ))
+    Notification.objects.bulk_create(notifications, batch_size=500)
+
+
+def _apply_outcomes(outcomes):
+    """Record a batch of gateway outcomes; returns counts per resulting refund status."""
+    now = timezone.now()
+    counts = {'completed': 0, 'rejected': 0, 'retry': 0}
+    with transaction.atomic():
+        # Skip rows another run has reclaimed and settled in the meantime
+        live = set(
+            Refund.objects.select_for_update(of=('self',))
+            .filter(pk__in=[refund.pk for refund, _ in outcomes], status=Refund.Status.PROCESSING)
+            .values_list('pk', flat=True)
+        )
+        changed = []
+        completed = []
+        for refund, outcome in outcomes:
+            if refund.pk not in live:
+                continue
+            if isinstance(outcome, GatewayError):
+                refund.status = Refund.Status.REQUESTED
+                refund.gateway_response = {'error': str(outcome), 'at': now.isoformat()}
+                counts['retry'] += 1
+            else:
+                refund.status = Refund.Status.COMPLETED if outcome.succeeded else Refund.Status.REJECTED
+                refund.gateway_refund_id = outcome.transaction_id
+                refund.gateway_response = outcome.response
+                refund.processed_at = now
+                if outcome.succeeded:
+                    completed.append(refund)
+                    counts['completed'] += 1
+                else:
+                    counts['rejected'] += 1
+            refund.updated_at = now
+            changed.append(refund)
+
+        Refund.objects.bulk_update(
+            changed,
+            ['status', 'gateway_refund_id', 'gateway_response', 'processed_at', 'updated_at'],
+            batch_size=500,
+        )
+        if not completed:
+            return counts
+
+        payment_ids = [refund.original_payment_id for refund in completed]
+        orders = {
+            order.payment_id: order
+            for order in Order.objects.select_for_update(of=('self',)).select_related('event').filter(payment_id__in=payment_ids)
+        }
+        Payment.objects.filter(pk__in=payment_ids).update(status=Payment.Status.REFUNDED, updated_at=now)
+        Order.objects.filter(payment_id__in=payment_ids).exclude(status=Order.Status.CANCELLED).update(
+            status=Order.Status.CANCELLED,
+            updated_at=now,
+        )
+        # Only confirmed orders were ever counted as revenue
+        post_entries(
+            refund_entry(refund, orders[refund.original_payment_id])
+            for refund in completed
+            if refund.original_payment_id in orders
+            and orders[refund.original_payment_id].status == Order.Status.CONFIRMED
+        )
+        _notify_refunded(completed, orders)
+    return counts
+
+
+def process_refunds(event_id=None, workers=None, attempts=MAX_ATTEMPTS, backoff=BACKOFF_SECONDS, batch_size=BATCH_SIZE, gateway=None):
+    """
+    Work through requested refunds until none are left to claim.
+
+    Gateway calls run in at most ``workers`` threads; a refund whose calls
+    all fail goes back to ``requested`` for a later run. Returns counts of
+    refunds completed, rejected and left for retry.
+    """
+    gateway = gateway or get_gateway()
+    workers = workers or getattr(settings, 'PAYMENT_WORKERS', 0) or 4
+    totals = {'completed': 0, 'rejected': 0, 'retry': 0}
+    attempted = set()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='refunds') as executor:
+        while True:
+            batch = claim_refunds(batch_size, event_id=event_id, exclude=attempted)
+            if not batch:
+                break
+            attempted.update(refund.pk for refund in batch)
+            results = executor.map(lambda refund: _outcome(gateway, refund, attempts, backoff), batch)
+            for status, count in _apply_outcomes(list(zip(batch, results))).items():
+                totals[status] += count
+            logger.info('Refund batch of %s processed: %s', len(batch), totals)
+    return totals
+
+
+def refund_event(event, description='', user=None):
+    """
+    Request refunds for every completed payment of a cancelled ``event``.
+
+    Processing starts in the payments worker pool once the transaction
+    commits, or is left to the ``process_refunds`` command. Returns the number
+    of refunds requested.
+    """
+    created = create_refunds(event_id=event.pk, description=description, user=user)
+    if created:
+        run_in_background(process_refunds, event.pk)
+    return created
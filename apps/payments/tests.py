@@ -1,3 +1,299 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.core.models import OutboxMessage
+from apps.core.pagination import decode_cursor, keyset_merge
+from apps.events.models import Category, Event, Ticket
+from apps.users.models import User
+from apps.venues.models import Venue, VenueBookingRequest
+from .gateway import SimulatorGateway
+from .ledger import BALANCE_FIELDS, manager_balance, rebuild_balances
+from .models import EventRevenueBalance, IdempotencyKey, ManagerRevenueBalance, Order, Payment, Refund, RevenueEntry
+from .orders import confirm_orders, decline_orders
+from .processing import settle_payment, stale_payment_ids
+from .reaper import reap
+from .refunds import create_refunds, process_refunds
+
+
+class OrderTestCase(TestCase):
+    """A published event with a planner and a buyer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.planner = User.objects.create_user('planner', 'planner@example.com', 'pw', role='horizon_planner')
+        cls.buyer = User.objects.create_user('buyer', 'buyer@example.com', 'pw', role='basic')
+        venue_manager = User.objects.create_user('venues', 'venues@example.com', 'pw', role='venue_manager')
+        cls.venue = Venue.objects.create(
+            name='Hall', description='-', address='-', city='-', state='-', postal_code='1', capacity=100,
+            hourly_rate=Decimal('100'), contact_person='-', contact_phone='1', contact_email='hall@example.com',
+            manager=venue_manager,
+        )
+        cls.event = Event.objects.create(
+            title='Gig', description='-', category=Category.objects.create(name='Music'), manager=cls.planner,
+            venue=cls.venue, event_date=date.today() + timedelta(days=5), start_time=time(18), end_time=time(22),
+            total_seats=10, base_price=Decimal('10'), status='published',
+        )
+
+    def checkout(self, quantity=1, payment_method='cod', key=None):
+        """Book a ticket and check it out through the checkout view; returns ``(ticket, order)``"""
+        ticket = Ticket.objects.create(
+            event=self.event, buyer=self.buyer, quantity=quantity, unit_price=Decimal('10'),
+            total_price=Decimal('10') * quantity,
+        )
+        self.client.force_login(self.buyer)
+        data = {'payment_method': payment_method}
+        if key:
+            data['idempotency_key'] = key
+        self.client.post(f'/payments/checkout/{ticket.pk}/', data)
+        return ticket, Order.objects.filter(ticket=ticket).order_by('-pk').first()
+
+
+class ReaperTests(OrderTestCase):
+    def age(self, days=5):
+        old = timezone.now() - timedelta(days=days)
+        Order.objects.update(created_at=old)
+        Ticket.objects.update(created_at=old)
+
+    def test_expires_stale_pending_orders(self):
+        ticket, order = self.checkout()
+        self.age()
+        report = reap()
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.CANCELLED)
+        self.assertEqual(order.payment.status, Payment.Status.CANCELLED)
+        self.assertEqual(report['orders_expired'], 1)
+        # The expired order no longer holds on to its ticket
+        self.assertFalse(Ticket.objects.filter(pk=ticket.pk).exists())
+
+    def test_keeps_tickets_of_confirmed_orders_after_keys_are_swept(self):
+        ticket, order = self.checkout()
+        confirm_orders(self.planner, order_ids=[order.pk])
+        IdempotencyKey.objects.all().delete()
+        self.age()
+        report = reap()
+        self.assertEqual(report['tickets_deleted'], 0)
+        self.assertTrue(Ticket.objects.filter(pk=ticket.pk).exists())
+
+    def test_keeps_tickets_of_unlinked_legacy_orders(self):
+        ticket, order = self.checkout()
+        confirm_orders(self.planner, order_ids=[order.pk])
+        Order.objects.update(ticket=None)
+        IdempotencyKey.objects.all().delete()
+        self.age()
+        self.assertEqual(reap()['tickets_deleted'], 0)
+
+    def test_deletes_tickets_never_checked_out(self):
+        Ticket.objects.create(event=self.event, buyer=self.buyer, unit_price=Decimal('10'), total_price=Decimal('10'))
+        fresh = Ticket.objects.create(event=self.event, buyer=self.buyer, unit_price=Decimal('10'), total_price=Decimal('10'))
+        Ticket.objects.exclude(pk=fresh.pk).update(created_at=timezone.now() - timedelta(days=5))
+        self.assertEqual(reap()['tickets_deleted'], 1)
+        self.assertTrue(Ticket.objects.filter(pk=fresh.pk).exists())
+
+
+class ConfirmDeclineTests(OrderTestCase):
+    def test_confirms_oldest_first_while_seats_last(self):
+        orders = [self.checkout(quantity=4)[1] for _ in range(3)]
+        confirmed, skipped = confirm_orders(self.planner, event_id=self.event.pk)
+        self.assertEqual([order.pk for order in confirmed], [order.pk for order in orders[:2]])
+        self.assertEqual([order.pk for order in skipped], [orders[2].pk])
+        balance = manager_balance(self.planner)
+        self.assertEqual((balance.balance, balance.tickets_sold, balance.confirmed_orders), (Decimal('80'), 8, 2))
+
+    def test_declining_a_confirmed_order_reverses_its_revenue(self):
+        _, order = self.checkout(quantity=2)
+        confirm_orders(self.planner, order_ids=[order.pk])
+        self.assertEqual(decline_orders(self.planner, order_ids=[order.pk], reason='Sold out'), [order])
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.CANCELLED)
+        balance = manager_balance(self.planner)
+        self.assertEqual((balance.balance, balance.tickets_sold, balance.declined_orders), (Decimal('0'), 0, 1))
+
+    def test_declining_a_captured_card_payment_refunds_it(self):
+        _, order = self.checkout(quantity=2)
+        Payment.objects.filter(pk=order.payment_id).update(
+            payment_method=Payment.PaymentMethod.CREDIT_CARD,
+            status=Payment.Status.COMPLETED,
+        )
+        confirm_orders(self.planner, order_ids=[order.pk])
+        decline_orders(self.planner, order_ids=[order.pk])
+        order.payment.refresh_from_db()
+        self.assertEqual(order.payment.status, Payment.Status.COMPLETED)
+        refund = Refund.objects.get(original_payment=order.payment)
+        self.assertEqual(refund.refund_amount, order.total_amount)
+
+        totals = process_refunds(gateway=SimulatorGateway(latency_ms=0), workers=1)
+        self.assertEqual(totals['completed'], 1)
+        order.payment.refresh_from_db()
+        self.assertEqual(order.payment.status, Payment.Status.REFUNDED)
+        # The decline already reversed the revenue; the refund does not take it out twice
+        self.assertEqual(manager_balance(self.planner).balance, Decimal('0'))
+
+    def test_declining_an_unpaid_order_fails_its_payment(self):
+        _, order = self.checkout()
+        decline_orders(self.planner, order_ids=[order.pk])
+        order.payment.refresh_from_db()
+        self.assertEqual(order.payment.status, Payment.Status.FAILED)
+        self.assertFalse(Refund.objects.exists())
+
+    def test_orders_with_a_charge_in_flight_are_not_declined(self):
+        _, order = self.checkout()
+        Payment.objects.filter(pk=order.payment_id).update(status=Payment.Status.PROCESSING)
+        self.assertEqual(decline_orders(self.planner, order_ids=[order.pk]), [])
+
+
+class IdempotentCheckoutTests(OrderTestCase):
+    def test_replays_return_the_original_order(self):
+        ticket, order = self.checkout(key='k-1')
+        response = self.client.post(f'/payments/checkout/{ticket.pk}/', {'payment_method': 'cod', 'idempotency_key': 'k-1'})
+        self.assertRedirects(response, f'/payments/checkout/confirm/{order.pk}/', fetch_redirect_response=False)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_keys_allow_a_new_checkout(self):
+        ticket, first = self.checkout(key='k-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.client.post(f'/payments/checkout/{ticket.pk}/', {'payment_method': 'cod', 'idempotency_key': 'k-1'})
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertNotEqual(IdempotencyKey.objects.get().order_id, first.pk)
+
+    def test_keys_of_declined_orders_allow_a_new_checkout(self):
+        ticket, first = self.checkout()
+        decline_orders(self.planner, order_ids=[first.pk])
+        self.client.post(f'/payments/checkout/{ticket.pk}/', {'payment_method': 'cod'})
+        self.assertEqual(Order.objects.filter(ticket=ticket, status=Order.Status.PENDING).count(), 1)
+
+
+class SettlementTests(OrderTestCase):
+    def test_card_checkout_leaves_the_charge_to_process_payments(self):
+        with mock.patch('apps.payments.processing._get_executor') as executor, self.captureOnCommitCallbacks(execute=True):
+            _, order = self.checkout(payment_method='credit_card')
+        executor.assert_not_called()
+        self.assertEqual(order.payment.status, Payment.Status.PROCESSING)
+        self.assertEqual(stale_payment_ids(timezone.now()), [order.payment_id])
+
+    def test_settled_payments_publish_their_confirmation(self):
+        _, order = self.checkout(payment_method='credit_card')
+        gateway = SimulatorGateway(latency_ms=0)
+        self.assertEqual(settle_payment(order.payment_id, gateway), Payment.Status.COMPLETED)
+        self.assertIsNone(settle_payment(order.payment_id, gateway))
+        self.assertEqual(OutboxMessage.objects.filter(aggregate_id=str(order.payment_id)).count(), 1)
+        self.assertEqual(stale_payment_ids(timezone.now()), [])
+
+    def test_declined_charges_cancel_the_order(self):
+        _, order = self.checkout(payment_method='credit_card')
+        self.assertEqual(settle_payment(order.payment_id, SimulatorGateway(latency_ms=0, failure_rate=1)), Payment.Status.FAILED)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.CANCELLED)
+
+    def test_unreachable_gateways_leave_the_payment_for_retry(self):
+        _, order = self.checkout(payment_method='credit_card')
+        self.assertIsNone(settle_payment(order.payment_id, SimulatorGateway(latency_ms=0, error_rate=1)))
+        order.payment.refresh_from_db()
+        self.assertEqual(order.payment.status, Payment.Status.PROCESSING)
+
+
+    def test_payment_loops_back_off_while_nothing_settles(self):
+        command = 'apps.payments.management.commands.process_payments'
+        outcomes = iter([None, None, None, Payment.Status.COMPLETED, None])
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 4:
+                raise KeyboardInterrupt
+
+        with mock.patch(f'{command}.get_gateway'), \
+                mock.patch(f'{command}.stale_payment_ids', return_value=[1]), \
+                mock.patch(f'{command}.settle_payment', side_effect=lambda payment_id: next(outcomes)), \
+                mock.patch(f'{command}.time.sleep', side_effect=sleep), \
+                self.assertRaises(KeyboardInterrupt):
+            call_command('process_payments', '--loop', '--batch-size=1', '--max-interval=15', stdout=mock.Mock())
+        self.assertEqual(sleeps, [5, 10, 15, 5])
+
+class LedgerTests(OrderTestCase):
+    def balances(self):
+        return [
+            [getattr(balance, field) for field in BALANCE_FIELDS]
+            for balance in (manager_balance(self.planner), EventRevenueBalance.objects.get(event=self.event))
+        ]
+
+    def test_repeated_confirmations_post_once(self):
+        _, order = self.checkout(quantity=3)
+        confirm_orders(self.planner, order_ids=[order.pk])
+        self.assertEqual(confirm_orders(self.planner, order_ids=[order.pk]), ([], []))
+        self.assertEqual(RevenueEntry.objects.count(), 1)
+        self.assertEqual(self.balances()[0], self.balances()[1])
+
+    def test_refunds_take_revenue_and_tickets_back(self):
+        orders = [self.checkout(quantity=2)[1] for _ in range(2)]
+        confirm_orders(self.planner, event_id=self.event.pk)
+        Payment.objects.filter(pk=orders[0].payment_id).update(payment_method=Payment.PaymentMethod.CREDIT_CARD)
+        create_refunds(payment_ids=[orders[0].payment_id], reason=Refund.Reason.OTHER)
+        process_refunds(gateway=SimulatorGateway(latency_ms=0), workers=1)
+
+        balance = manager_balance(self.planner)
+        self.assertEqual(
+            (balance.balance, balance.gross_revenue, balance.refunded_amount, balance.tickets_sold),
+            (Decimal('20'), Decimal('40'), Decimal('20'), 2),
+        )
+        self.assertEqual((balance.confirmed_orders, balance.refunded_orders), (2, 1))
+
+    def test_rebuild_matches_the_running_balances(self):
+        orders = [self.checkout(quantity=2)[1] for _ in range(3)]
+        confirm_orders(self.planner, order_ids=[orders[0].pk, orders[1].pk])
+        decline_orders(self.planner, order_ids=[orders[1].pk, orders[2].pk])
+        running = self.balances()
+
+        ManagerRevenueBalance.objects.update(balance=0, tickets_sold=0)
+        self.assertEqual(rebuild_balances(), (1, 1))
+        self.assertEqual(self.balances(), running)
+
+
+class OrderHistoryTests(OrderTestCase):
+    def setUp(self):
+        now = timezone.now()
+        orders = [self.checkout()[1] for _ in range(3)]
+        bookings = [
+            VenueBookingRequest.objects.create(
+                venue=self.venue, requester=self.buyer, event_name='Party', event_description='-',
+                booking_date=self.event.event_date, start_time=time(10), end_time=time(12), expected_attendees=10,
+            )
+            for _ in range(2)
+        ]
+        # An order and a booking share a timestamp; later sources sort first on ties
+        for order, minutes in zip(orders, (1, 3, 5)):
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(minutes=minutes))
+        for booking, minutes in zip(bookings, (3, 4)):
+            VenueBookingRequest.objects.filter(pk=booking.pk).update(created_at=now - timedelta(minutes=minutes))
+        self.expected = [
+            ('order', orders[0].pk), ('booking', bookings[0].pk), ('order', orders[1].pk),
+            ('booking', bookings[1].pk), ('order', orders[2].pk),
+        ]
+        self.sources = [
+            ('order', Order.objects.filter(user=self.buyer)),
+            ('booking', VenueBookingRequest.objects.filter(requester=self.buyer)),
+        ]
+
+    def test_pages_walk_the_merged_timeline_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page = keyset_merge(self.sources, cursor=cursor, per_page=2)
+            seen.extend((entry.kind, entry.object.pk) for entry in page.entries)
+            if page.next_cursor is None:
+                break
+            cursor = decode_cursor(page.next_cursor)
+        self.assertEqual(seen, self.expected)
 
-# Create your tests here.
+    def test_malformed_cursors_start_from_the_top(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.client.force_login(self.buyer)
+        response = self.client.get('/payments/my-orders/', {'after': 'not-a-cursor'})
+        self.assertEqual(
+            [(entry.kind, entry.object.pk) for entry in response.context['entries']],
+            self.expected,
+        )
@@ -9,6 +9,7 @@ urlpatterns = [
     path('manager/order/<str:order_number>/', views.ManageOrderDetailView.as_view(), name='manage_order_detail'),
     path('manager/order/<int:order_id>/confirm/', views.ConfirmOrderView.as_view(), name='confirm_order'),
     path('manager/order/<int:order_id>/decline/', views.DeclineOrderView.as_view(), name='decline_order'),
+    path('manager/orders/bulk/', views.BulkOrderActionView.as_view(), name='bulk_order_action'),
     
     # Checkout flow
     path('checkout/<int:ticket_id>/', views.CheckoutView.as_view(), name='checkout'),
@@ -20,9 +21,11 @@ urlpatterns = [
     path('process/<int:event_id>/', views.ProcessPaymentView.as_view(), name='process_payment'),
     path('success/<int:payment_id>/', views.PaymentSuccessView.as_view(), name='payment_success'),
     path('failed/<int:payment_id>/', views.PaymentFailedView.as_view(), name='payment_failed'),
+    path('payment/<int:payment_id>/status/', views.PaymentStatusView.as_view(), name='payment_status'),
     
     # Ticket management
     path('order/<int:order_id>/ticket/', views.OrderTicketView.as_view(), name='order_ticket'),
+    path('order/<int:order_id>/ticket/pdf/', views.OrderTicketPDFView.as_view(), name='order_ticket_pdf'),
     path('ticket/<str:ticket_number>/', views.TicketDetailView.as_view(), name='ticket_detail'),
     path('ticket/<str:ticket_number>/download/', views.DownloadTicketView.as_view(), name='download_ticket'),
     
@@ -1,14 +1,21 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.views.generic import TemplateView, ListView, View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.utils import timezone
-from apps.core.pagination import CONTENT_CARDS_PER_PAGE, build_query_string
-from .models import Order, Payment
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import FileResponse, JsonResponse
+from apps.core.pagination import CONTENT_CARDS_PER_PAGE, build_query_string, decode_cursor, keyset_merge
+from apps.core.ticket_pdf import open_pdf, order_passes, ticket_pass
+from .gateway import get_gateway
+from .ledger import manager_balance, platform_balance
+from .models import IdempotencyKey, Order, Payment
+from .orders import confirm_orders, decline_orders, manageable_orders
+from .processing import GATEWAY_METHODS, enqueue_charge
 from apps.events.models import Ticket, Event
 from apps.venues.models import VenueBookingRequest
-import random
-import string
 
 
 class ManagerRequiredMixin(UserPassesTestMixin):
@@ -37,9 +44,13 @@ class ManagerOrdersView(ManagerRequiredMixin, ListView):
         
         # Filter by status if provided
         status = self.request.GET.get('status')
-        if status:
+        if status and status != 'all':
             orders = orders.filter(status=status)
         
+        event_id = self.request.GET.get('event', '')
+        if event_id.isdigit():
+            orders = orders.filter(event_id=event_id)
+        
         return orders
     
     def get_context_data(self, **kwargs):
@@ -49,7 +60,7 @@ class ManagerOrdersView(ManagerRequiredMixin, ListView):
         if user.is_admin_user:
             context['pending_count'] = Order.objects.filter(status='pending').count()
             context['confirmed_count'] = Order.objects.filter(status='confirmed').count()
-            context['total_revenue'] = sum(o.total_amount for o in Order.objects.all())
+            context['total_revenue'] = platform_balance().balance
         else:
             context['pending_count'] = Order.objects.filter(
                 event__manager=user, status='pending'
@@ -57,12 +68,14 @@ class ManagerOrdersView(ManagerRequiredMixin, ListView):
             context['confirmed_count'] = Order.objects.filter(
                 event__manager=user, status='confirmed'
             ).count()
-            context['total_revenue'] = sum(
-                o.total_amount for o in Order.objects.filter(event__manager=user)
-            )
+            context['total_revenue'] = manager_balance(user).balance
         
+        events = Event.objects.all() if user.is_admin_user else Event.objects.filter(manager=user)
+        context['events'] = events.filter(orders__isnull=False).distinct().order_by('-event_date').only('id', 'title')
         context['current_status'] = self.request.GET.get('status', 'all')
+        context['current_event'] = self.request.GET.get('event', '')
         context['pagination_query'] = build_query_string(self.request, ['page'])
+        context['current_query'] = self.request.GET.urlencode()
         
         return context
 
@@ -93,31 +106,20 @@ class ConfirmOrderView(ManagerRequiredMixin, View):
     
     def post(self, request, *args, **kwargs):
         order_id = kwargs.get('order_id')
-        order = get_object_or_404(Order, id=order_id)
+        order = get_object_or_404(Order.objects.select_related('event', 'payment'), id=order_id)
         
         # Check permission
         if not request.user.is_admin_user and order.event.manager != request.user:
             messages.error(request, 'Not authorized')
             return redirect('payments:manager_orders')
         
-        order.status = 'confirmed'
-        order.payment.status = 'completed'
-        order.save()
-        order.payment.save()
-        
-        # Notify the buyer
-        from apps.core.models import Notification
-        ticket_url = f"/payments/order/{order.id}/ticket/"
-        Notification.objects.create(
-            recipient=order.user,
-            notification_type=Notification.NotificationType.OTHER,
-            subject=f"Booking Accepted: {order.event.title}",
-            message=f"Your booking for '{order.event.title}' has been accepted! You can now download your ticket.",
-            event=order.event,
-            details={'action_url': ticket_url}
-        )
-        
-        messages.success(request, f'Order {order.order_number} confirmed!')
+        confirmed, skipped = confirm_orders(request.user, order_ids=[order.id])
+        if confirmed:
+            messages.success(request, f'Order {order.order_number} confirmed!')
+        elif skipped:
+            messages.error(request, f'Order {order.order_number} cannot be confirmed: its card payment has not gone through or the event is full.')
+        else:
+            messages.info(request, f'Order {order.order_number} is no longer pending.')
         return redirect('payments:manage_order_detail', order_number=order.order_number)
 
 
@@ -126,7 +128,7 @@ class DeclineOrderView(ManagerRequiredMixin, View):
     
     def post(self, request, *args, **kwargs):
         order_id = kwargs.get('order_id')
-        order = get_object_or_404(Order, id=order_id)
+        order = get_object_or_404(Order.objects.select_related('event'), id=order_id)
         reason = request.POST.get('reason', 'No reason provided')
         
         # Check permission
@@ -134,16 +136,52 @@ class DeclineOrderView(ManagerRequiredMixin, View):
             messages.error(request, 'Not authorized')
             return redirect('payments:manager_orders')
         
-        order.status = 'cancelled'
-        order.payment.status = 'failed'
-        order.payment.notes = reason
-        order.save()
-        order.payment.save()
-        
-        messages.success(request, f'Order {order.order_number} declined!')
+        if decline_orders(request.user, order_ids=[order.id], reason=reason):
+            messages.success(request, f'Order {order.order_number} declined!')
+        elif order.payment.status == Payment.Status.PROCESSING:
+            messages.warning(request, f'Order {order.order_number} cannot be declined while its card payment is processing.')
+        else:
+            messages.info(request, f'Order {order.order_number} was already declined.')
         return redirect('payments:manage_order_detail', order_number=order.order_number)
 
 
+class BulkOrderActionView(ManagerRequiredMixin, View):
+    """Confirm or decline a batch of orders, or every pending order of an event, in one transaction"""
+    
+    def post(self, request, *args, **kwargs):
+        action = request.POST.get('action')
+        reason = request.POST.get('reason', '').strip()
+        order_ids = [pk for pk in request.POST.getlist('order_ids') if pk.isdigit()]
+        event_id = request.POST.get('event_id', '')
+        event_id = int(event_id) if request.POST.get('scope') == 'event' and event_id.isdigit() else None
+        redirect_url = reverse('payments:manager_orders')
+        query = request.POST.get('query', '')
+        if query:
+            redirect_url = f'{redirect_url}?{query}'
+        
+        if not order_ids and event_id is None:
+            messages.warning(request, 'Select at least one order.')
+            return redirect(redirect_url)
+        
+        # An event-wide action covers only the event's pending orders
+        selection = {'event_id': event_id} if event_id is not None else {'order_ids': order_ids}
+        if action == 'confirm':
+            confirmed, skipped = confirm_orders(request.user, **selection)
+            messages.success(request, f'{len(confirmed)} order(s) confirmed.')
+            if skipped:
+                messages.warning(
+                    request,
+                    f'{len(skipped)} order(s) were left pending: their card payment has not gone through or the event is full.'
+                )
+        elif action == 'decline':
+            declined = decline_orders(request.user, reason=reason or 'Declined by manager', **selection)
+            messages.info(request, f'{len(declined)} order(s) declined; payments already taken will be refunded.')
+        else:
+            messages.error(request, 'Unknown action.')
+        
+        return redirect(redirect_url)
+
+
 
 
 
@@ -159,10 +197,14 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
         context['ticket'] = ticket
         context['event'] = ticket.event
         context['user'] = self.request.user
+        context['idempotency_key'] = self._idempotency_key(self.request, ticket)
         
-        # Only show COD as available payment method
+        # Card methods are offered only when a gateway is configured
         context['payment_methods'] = [
             {'value': 'cod', 'label': 'Cash on Delivery (COD)', 'enabled': True}
+        ] + [
+            {'value': method.value, 'label': method.label, 'enabled': get_gateway() is not None}
+            for method in GATEWAY_METHODS
         ]
         
         return context
@@ -172,27 +214,76 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
         ticket = get_object_or_404(Ticket, id=ticket_id, buyer=request.user)
         payment_method = request.POST.get('payment_method')
         
-        # Only COD allowed
-        if payment_method != 'cod':
-            messages.error(request, 'Only Cash on Delivery is available right now.')
+        if payment_method != 'cod' and (payment_method not in GATEWAY_METHODS or get_gateway() is None):
+            messages.error(request, 'This payment method is not available right now.')
             return redirect('payments:checkout', ticket_id=ticket_id)
         
-        # Create payment and order
+        key = self._idempotency_key(request, ticket)
+        
+        # Replays of a completed checkout return the original order without writing anything
+        replay = self._replayable(request.user, key).first()
+        if replay:
+            return self._replay(request, ticket, *replay)
+        
+        # An expired key, or one whose order was declined or expired, no longer stands in the way
+        IdempotencyKey.objects.filter(user=request.user, key=key).filter(
+            Q(expires_at__lte=timezone.now()) | Q(order__status=Order.Status.CANCELLED)
+        ).delete()
+        
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(user=request.user, key=key, ticket=ticket)
+                order = self._place_order(request, ticket, payment_method)
+                record.order = order
+                record.save(update_fields=['order'])
+        except IntegrityError:
+            # A concurrent request with the same key won the race; answer with its order
+            replay = self._replayable(request.user, key).first()
+            if replay:
+                return self._replay(request, ticket, *replay)
+            raise
+        
+        # Redirect to confirmation
+        return redirect('payments:checkout_confirm', order_id=order.id)
+    
+    @staticmethod
+    def _replayable(user, key):
+        """``(ticket_id, order_id)`` of the user's unexpired key whose order is still live"""
+        return IdempotencyKey.objects.filter(user=user, key=key, expires_at__gt=timezone.now()).exclude(
+            order__status=Order.Status.CANCELLED,
+        ).values_list('ticket_id', 'order_id')
+    
+    @staticmethod
+    def _idempotency_key(request, ticket):
+        """Client-supplied key, falling back to one checkout per ticket"""
+        key = (request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key') or '').strip()
+        return key[:64] or f'ticket-{ticket.id}'
+    
+    def _replay(self, request, ticket, replay_ticket_id, order_id):
+        if replay_ticket_id != ticket.id:
+            messages.error(request, 'This checkout key was already used for a different ticket.')
+            return redirect('payments:checkout', ticket_id=ticket.id)
+        return redirect('payments:checkout_confirm', order_id=order_id)
+    
+    def _place_order(self, request, ticket, payment_method):
+        """Create the payment, order and planner notification for a ticket"""
+        # Card payments are charged by process_payments (or the worker pool) after commit; COD waits for the planner
         payment = Payment.objects.create(
             user=request.user,
             event=ticket.event,
             amount=ticket.total_price,
-            payment_method='cod',
-            status='pending'
+            payment_method=payment_method,
+            status='pending' if payment_method == 'cod' else 'processing'
         )
+        if payment.status == Payment.Status.PROCESSING:
+            enqueue_charge(payment.id)
         
         # Create order
-        order_number = self._generate_order_number()
         order = Order.objects.create(
-            order_number=order_number,
             payment=payment,
             user=request.user,
             event=ticket.event,
+            ticket=ticket,
             ticket_quantity=ticket.quantity,
             unit_price=ticket.unit_price,
             total_amount=ticket.total_price,
@@ -203,7 +294,8 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
         
         # Notify the Event Manager (Horizon Planner)
         from apps.core.models import Notification
-        Notification.objects.create(
+        from apps.core.notifications import notify_collapsed
+        notify_collapsed(
             recipient=ticket.event.manager,
             notification_type=Notification.NotificationType.NEW_BOOKING,
             subject=f"New Ticket Booking: {ticket.event.title}",
@@ -212,15 +304,7 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
             details={'order_id': order.id, 'order_number': order.order_number}
         )
         
-        # Redirect to confirmation
-        return redirect('payments:checkout_confirm', order_id=order.id)
-    
-    def _generate_order_number(self):
-        """Generate unique order number"""
-        while True:
-            order_num = 'ORD' + ''.join(random.choices(string.digits, k=8))
-            if not Order.objects.filter(order_number=order_num).exists():
-                return order_num
+        return order
 
 
 class CheckoutConfirmView(LoginRequiredMixin, TemplateView):
@@ -297,6 +381,22 @@ class PaymentSuccessView(LoginRequiredMixin, TemplateView):
         
         return context
 
+class PaymentStatusView(LoginRequiredMixin, View):
+    """Current status of a payment, polled while the gateway settles it"""
+    
+    def get(self, request, *args, **kwargs):
+        payment = get_object_or_404(
+            Payment.objects.only('status', 'processed_at', 'notes'),
+            id=kwargs.get('payment_id'),
+            user=request.user
+        )
+        return JsonResponse({
+            'status': payment.status,
+            'status_display': payment.get_status_display(),
+            'processed_at': payment.processed_at.isoformat() if payment.processed_at else None,
+            'message': payment.notes if payment.status == Payment.Status.FAILED else '',
+        })
+
 class PaymentFailedView(LoginRequiredMixin, TemplateView):
     template_name = 'payments/payment_failed.html'
     
@@ -323,34 +423,41 @@ class TicketDetailView(LoginRequiredMixin, TemplateView):
         
         return context
 
-class DownloadTicketView(LoginRequiredMixin, TemplateView):
-    template_name = 'payments/download_ticket.html'
+class DownloadTicketView(LoginRequiredMixin, View):
+    """Ticket as a PDF, rendered once and served from the PDF cache afterwards"""
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        ticket_number = kwargs.get('ticket_number')
-        ticket = get_object_or_404(Ticket, ticket_number=ticket_number, buyer=self.request.user)
-        
-        context['ticket'] = ticket
-        context['event'] = ticket.event
-        
-        return context
+    def get(self, request, *args, **kwargs):
+        ticket = get_object_or_404(
+            Ticket.objects.select_related('event__venue', 'buyer'),
+            ticket_number=kwargs.get('ticket_number'),
+            buyer=request.user
+        )
+        return _pdf_response([ticket_pass(ticket)], f'ticket-{ticket.ticket_number}.pdf')
 
-class OrderHistoryView(LoginRequiredMixin, ListView):
-    template_name = 'payments/order_history.html'
-    context_object_name = 'orders'
-    paginate_by = CONTENT_CARDS_PER_PAGE
 
-    def get_queryset(self):
-        return Order.objects.filter(
-            user=self.request.user
-        ).select_related('event', 'event__venue', 'event__category', 'payment').order_by('-created_at')
+def _pdf_response(passes, filename):
+    return FileResponse(open_pdf(passes), as_attachment=True, filename=filename, content_type='application/pdf')
+
+
+class OrderHistoryView(LoginRequiredMixin, TemplateView):
+    """Ticket orders and venue bookings in one newest-first timeline"""
+    template_name = 'payments/order_history.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['venue_bookings'] = VenueBookingRequest.objects.filter(
-            requester=self.request.user
-        ).order_by('-created_at')
+        user = self.request.user
+        page = keyset_merge(
+            [
+                ('order', Order.objects.filter(user=user).select_related(
+                    'event', 'event__venue', 'event__category', 'payment'
+                )),
+                ('booking', VenueBookingRequest.objects.filter(requester=user).select_related('venue')),
+            ],
+            cursor=decode_cursor(self.request.GET.get('after')),
+        )
+        context['entries'] = page.entries
+        context['next_cursor'] = page.next_cursor
+        context['is_first_page'] = not self.request.GET.get('after')
         return context
 
 class OrderDetailView(LoginRequiredMixin, TemplateView):
@@ -387,9 +494,27 @@ class OrderTicketView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         order_id = kwargs.get('order_id')
-        order = get_object_or_404(Order, id=order_id, user=self.request.user)
+        order = get_object_or_404(
+            Order.objects.select_related('event__venue', 'payment', 'ticket__event__venue', 'ticket__buyer'),
+            id=order_id,
+            user=self.request.user
+        )
         
         context['order'] = order
         context['event'] = order.event
         context['payment'] = order.payment
+        context['qr_payload'] = order_passes(order)[0].qr_payload
         return context
+
+
+class OrderTicketPDFView(LoginRequiredMixin, View):
+    """All admissions of a confirmed order in one PDF"""
+    
+    def get(self, request, *args, **kwargs):
+        order = get_object_or_404(
+            Order.objects.select_related('event__venue', 'ticket__event__venue', 'ticket__buyer'),
+            id=kwargs.get('order_id'),
+            user=request.user,
+            status=Order.Status.CONFIRMED
+        )
+        return _pdf_response(order_passes(order), f'tickets-{order.order_number}.pdf')
@@ -0,0 +1,173 @@
+"""
+Like and vote counters.
+
+``Comment.likes``, ``Review.helpful_votes`` and ``Review.total_votes`` change
+in the same transaction as the ``CommentLike`` or ``ReviewVote`` row behind
+them, through ``F()`` increments, so concurrent clicks never lose an update.
+
+With ``COUNTER_SHARDS`` set, increments go to one of that many
+``CounterShard`` rows per target instead of the counted row, so a hot
+comment no longer serializes every click on one row lock. Reads that must be
+exact add the pending shard deltas (``read_counts``); ``fold_shards`` moves
+them into the counted rows from the ``fold_counters`` command, and
+``reconcile_counters`` recounts everything from the like and vote tables.
+"""
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .helpfulness import VOTE_FIELDS, wilson_expression
+from .models import Comment, CommentLike, CounterShard, Review, ReviewVote
+
+
+COUNTERS = {
+    'comment.likes': (Comment, 'likes'),
+    'review.helpful_votes': (Review, 'helpful_votes'),
+    'review.total_votes': (Review, 'total_votes'),
+}
+FOLD_BATCH_SIZE = 1000
+
+
+def _updates(model, deltas):
+    updates = {field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items()}
+    if model is Review and VOTE_FIELDS.intersection(deltas):
+        # The ranking score moves with the vote counts, from their new values
+        updates['helpful_score'] = wilson_expression(
+            updates.get('helpful_votes', F('helpful_votes')), updates.get('total_votes', F('total_votes')),
+        )
+    return updates
+
+
+def _shards():
+    return getattr(settings, 'COUNTER_SHARDS', 0)
+
+
+def _add_to_shard(counter, target_id, delta):
+    shard = random.randrange(_shards())
+    rows = CounterShard.objects.filter(counter=counter, target_id=target_id, shard=shard)
+    if not rows.update(delta=F('delta') + delta):
+        CounterShard.objects.bulk_create(
+            [CounterShard(counter=counter, target_id=target_id, shard=shard)], ignore_conflicts=True,
+        )
+        rows.update(delta=F('delta') + delta)
+
+
+def add(model, target_id, deltas):
+    """Add ``{field: delta}`` to the counters of one ``model`` row, in the caller's transaction."""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if _shards() > 0:
+        for field, delta in deltas.items():
+            _add_to_shard(f'{model._meta.model_name}.{field}', target_id, delta)
+        return
+    model.objects.filter(pk=target_id).update(**_updates(model, deltas))
+
+
+def read_counts(model, target_id, fields):
+    """Current ``{field: value}`` of a row's counters, pending shard deltas included."""
+    counts = model.objects.filter(pk=target_id).values(*fields).first() or dict.fromkeys(fields, 0)
+    if _shards() > 0:
+        counters = {f'{model._meta.model_name}.{field}': field for field in fields}
+        pending = CounterShard.objects.filter(counter__in=list(counters), target_id=target_id).values(
+            'counter',
+        ).annotate(total=Sum('delta')).values_list('counter', 'total').order_by()
+        for counter, total in pending:
+            counts[counters[counter]] = max(0, counts[counters[counter]] + total)
+    return counts
+
+
+def toggle_like(comment_id, user):
+    """Like the comment, or unlike it if ``user`` already did; returns ``(liked, likes)``."""
+    with transaction.atomic():
+        deleted, _ = CommentLike.objects.filter(comment_id=comment_id, user=user).delete()
+        if deleted:
+            liked = False
+            add(Comment, comment_id, {'likes': -1})
+        else:
+            liked = True
+            try:
+                with transaction.atomic():
+                    CommentLike.objects.create(comment_id=comment_id, user=user)
+            except IntegrityError:
+                # A concurrent click already liked it and counted the like
+                pass
+            else:
+                add(Comment, comment_id, {'likes': 1})
+    return liked, read_counts(Comment, comment_id, ['likes'])['likes']
+
+
+def cast_vote(review_id, user, is_helpful):
+    """
+    Record ``user``'s vote on a review; voting the same way again withdraws it.
+
+    Returns the review's ``{'helpful_votes', 'total_votes'}`` afterwards.
+    """
+    with transaction.atomic():
+        vote = ReviewVote.objects.select_for_update().filter(review_id=review_id, user=user).first()
+        if vote is None:
+            try:
+                with transaction.atomic():
+                    ReviewVote.objects.create(review_id=review_id, user=user, is_helpful=is_helpful)
+            except IntegrityError:
+                deltas = {}
+            else:
+                deltas = {'total_votes': 1, 'helpful_votes': int(is_helpful)}
+        elif vote.is_helpful == is_helpful:
+            vote.delete()
+            deltas = {'total_votes': -1, 'helpful_votes': -int(is_helpful)}
+        else:
+            ReviewVote.objects.filter(pk=vote.pk).update(is_helpful=is_helpful)
+            deltas = {'helpful_votes': 1 if is_helpful else -1}
+        add(Review, review_id, deltas)
+    return read_counts(Review, review_id, ['helpful_votes', 'total_votes'])
+
+
+def fold_shards(batch_size=FOLD_BATCH_SIZE):
+    """Move pending shard deltas into their counted rows; returns how many shard rows were folded."""
+    with transaction.atomic():
+        shards = list(
+            CounterShard.objects.select_for_update(skip_locked=True).order_by('pk')[:batch_size]
+        )
+        totals = defaultdict(lambda: defaultdict(int))
+        for shard in shards:
+            model, field = COUNTERS[shard.counter]
+            totals[model, shard.target_id][field] += shard.delta
+        for (model, target_id), deltas in totals.items():
+            deltas = {field: delta for field, delta in deltas.items() if delta}
+            if deltas:
+                model.objects.filter(pk=target_id).update(**_updates(model, deltas))
+        CounterShard.objects.filter(pk__in=[shard.pk for shard in shards]).delete()
+    return len(shards)
+
+
+def _recount(subquery):
+    return Coalesce(Subquery(subquery.order_by().values('total')[:1]), Value(0))
+
+
+def reconcile_counters():
+    """
+    Recount every counter from the like and vote tables.
+
+    Pending shards are discarded, since the recount already includes what
+    they held. Returns how many comments and reviews had drifted.
+    """
+    likes = _recount(
+        CommentLike.objects.filter(comment=OuterRef('pk')).values('comment').annotate(total=Count('pk'))
+    )
+    votes = ReviewVote.objects.filter(review=OuterRef('pk')).values('review')
+    helpful = _recount(votes.annotate(total=Count('pk', filter=Q(is_helpful=True))))
+    total = _recount(votes.annotate(total=Count('pk')))
+
+    with transaction.atomic():
+        list(CounterShard.objects.select_for_update().values_list('pk', flat=True))
+        CounterShard.objects.all().delete()
+        comments = Comment.objects.annotate(actual=likes).exclude(likes=F('actual')).update(likes=likes)
+        reviews = Review.objects.annotate(actual_helpful=helpful, actual_total=total).exclude(
+            helpful_votes=F('actual_helpful'), total_votes=F('actual_total'),
+        ).update(helpful_votes=helpful, total_votes=total, helpful_score=wilson_expression(helpful, total))
+    return {'comments': comments, 'reviews': reviews}
@@ -0,0 +1,45 @@
+"""
+"Most helpful" review ranking.
+
+Reviews are ranked by the lower bound of the Wilson score interval on their
+helpful-vote share, so one helpful vote out of one does not outrank 90 out of
+100. The bound is stored in ``Review.helpful_score`` and rewritten in the
+same ``UPDATE`` that moves the vote counters (``counters.add``, or
+``fold_shards`` when counters are sharded), so the reviews pages read a
+sorted page straight from the ``(target, status, helpful_score)`` indexes.
+"""
+import math
+
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast, Sqrt
+from django.db.models.lookups import GreaterThan
+
+
+# 95% confidence
+Z = 1.96
+VOTE_FIELDS = frozenset(['helpful_votes', 'total_votes'])
+
+
+def wilson_lower_bound(positive, total):
+    if total <= 0:
+        return 0.0
+    share = positive / total
+    z2 = Z * Z
+    centre = share + z2 / (2 * total)
+    spread = Z * math.sqrt((share * (1 - share) + z2 / (4 * total)) / total)
+    return (centre - spread) / (1 + z2 / total)
+
+
+def wilson_expression(positive=None, total=None):
+    """``wilson_lower_bound`` as a SQL expression over vote counts (the stored columns by default)."""
+    positive = Cast(F('helpful_votes') if positive is None else positive, FloatField())
+    total = Cast(F('total_votes') if total is None else total, FloatField())
+    z2 = Value(Z * Z)
+    share = positive / total
+    centre = share + z2 / (Value(2.0) * total)
+    spread = Value(Z) * Sqrt((share * (Value(1.0) - share) + z2 / (Value(4.0) * total)) / total)
+    return Case(
+        When(GreaterThan(total, 0), then=(centre - spread) / (Value(1.0) + z2 / total)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.reviews.counters import FOLD_BATCH_SIZE, fold_shards
+
+
+class Command(BaseCommand):
+    help = 'Fold pending like and vote counter shards into their comments and reviews (see COUNTER_SHARDS).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=FOLD_BATCH_SIZE,
+            help=f'Shard rows per transaction (default: {FOLD_BATCH_SIZE})'
+        )
+        parser.add_argument('--loop', action='store_true', help='Keep folding instead of exiting after one pass')
+        parser.add_argument('--interval', type=int, default=10, help='Seconds between passes with --loop (default: 10)')
+
+    def handle(self, *args, **options):
+        while True:
+            folded = 0
+            while True:
+                count = fold_shards(options['batch_size'])
+                folded += count
+                if count < options['batch_size']:
+                    break
+            if folded:
+                self.stdout.write(f'Folded {folded} counter shard(s).')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Counter folding finished.'))
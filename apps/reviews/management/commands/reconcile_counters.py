@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.reviews.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount comment likes and review votes from the like and vote tables; meant to run nightly.'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_counters()
+        self.stdout.write(
+            f'Corrected like counts on {fixed["comments"]} comment(s) and vote counts on {fixed["reviews"]} review(s).'
+        )
+        self.stdout.write(self.style.SUCCESS('Counter reconciliation finished.'))
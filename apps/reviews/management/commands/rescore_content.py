@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.reviews.classifier import SCORE_BATCH_SIZE, load_weights, rescore
+
+
+class Command(BaseCommand):
+    help = 'Score every review and comment with the trained spam classifier.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SCORE_BATCH_SIZE,
+            help=f'Rows scored per chunk (default: {SCORE_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--hold',
+            action='store_true',
+            help='Move approved, unmoderated content that scores as abuse back to pending'
+        )
+
+    def handle(self, *args, **options):
+        weights = load_weights()
+        if weights is None:
+            raise CommandError('No trained classifier; run train_classifier first.')
+
+        totals = rescore(weights, options['batch_size'], options['hold'])
+        self.stdout.write(f'Scored {totals["scored"]} item(s), held {totals["held"]} for moderation.')
+        self.stdout.write(self.style.SUCCESS('Content scoring finished.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.reviews.classifier import fixture_history, history, save_weights, train
+
+
+class Command(BaseCommand):
+    help = 'Train the review and comment spam classifier from approved and rejected content.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fixture',
+            action='append',
+            default=[],
+            help='Train from a dumpdata export such as core_reviews.json instead of the database (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        if options['fixture']:
+            examples = [example for path in options['fixture'] for example in fixture_history(path)]
+        else:
+            examples = list(history())
+        rejected = sum(is_abuse for _, is_abuse in examples)
+        self.stdout.write(f'Training on {len(examples) - rejected} approved and {rejected} rejected item(s).')
+
+        try:
+            weights = train(examples)
+        except ValueError as e:
+            raise CommandError(str(e))
+        save_weights(weights)
+
+        self.stdout.write('Saved the weights to the database.')
+        self.stdout.write(self.style.SUCCESS('Classifier training finished.'))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def build_summaries(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    RatingSummary = apps.get_model('reviews', 'RatingSummary')
+    approved = Q(status='approved')
+    rows = Review.objects.values('event_id', 'venue_id').annotate(
+        rating_sum=Sum('rating', filter=approved, default=0),
+        review_count=Count('pk', filter=approved),
+        **{f'stars_{star}': Count('pk', filter=approved & Q(rating=star)) for star in range(1, 6)},
+    ).order_by()
+    RatingSummary.objects.bulk_create([RatingSummary(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+        ('reviews', '0002_initial'),
+        ('venues', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('event', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rating_summary', to='events.event')),
+                ('venue', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rating_summary', to='venues.venue')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(('event__isnull', False), ('venue__isnull', False), _connector='OR'), name='rating_summary_must_have_event_or_venue'), models.CheckConstraint(condition=models.Q(('event__isnull', False), ('venue__isnull', False), _negated=True), name='rating_summary_cannot_have_both_event_and_venue')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
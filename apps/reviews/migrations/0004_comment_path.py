@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:25
+
+from django.db import migrations, models
+
+
+def build_paths(apps, schema_editor):
+    from apps.reviews.models import PATH_STEP, path_segment
+
+    Comment = apps.get_model('reviews', 'Comment')
+    parents = dict(Comment.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def path_of(pk):
+        if pk not in paths:
+            parent_id = parents[pk]
+            paths[pk] = (path_of(parent_id) if parent_id else '') + path_segment(pk)
+        return paths[pk]
+
+    comments = []
+    for pk in parents:
+        comments.append(Comment(pk=pk, path=path_of(pk), depth=len(path_of(pk)) // PATH_STEP - 1))
+    Comment.objects.bulk_update(comments, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_ratingsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=248),
+        ),
+        migrations.RunPython(build_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_countershard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='comment_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='review_status_created_idx'),
+        ),
+    ]
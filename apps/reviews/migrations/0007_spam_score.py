@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_moderation_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='spam_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='spam_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
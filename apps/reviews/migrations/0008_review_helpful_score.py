@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:30
+
+from django.db import migrations, models
+
+
+def score_reviews(apps, schema_editor):
+    from apps.reviews.helpfulness import wilson_lower_bound
+
+    Review = apps.get_model('reviews', 'Review')
+    reviews = [
+        Review(pk=pk, helpful_score=wilson_lower_bound(helpful, total))
+        for pk, helpful, total in Review.objects.filter(total_votes__gt=0).values_list(
+            'pk', 'helpful_votes', 'total_votes',
+        )
+    ]
+    Review.objects.bulk_update(reviews, ['helpful_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_spam_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='helpful_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(score_reviews, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['event', 'status', '-helpful_score', '-created_at'], name='review_event_helpful_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['venue', 'status', '-helpful_score', '-created_at'], name='review_venue_helpful_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_review_helpful_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassifierWeights',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
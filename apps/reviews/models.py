@@ -37,10 +37,14 @@ class Review(TimeStampedModel):
     )
     moderation_notes = models.TextField(blank=True)
     moderated_at = models.DateTimeField(null=True, blank=True)
+    # Abuse probability from the moderation classifier, when one was trained
+    spam_score = models.FloatField(null=True, blank=True)
     
     # Helpfulness tracking
     helpful_votes = models.PositiveIntegerField(default=0)
     total_votes = models.PositiveIntegerField(default=0)
+    # Wilson lower bound of the helpful share, kept in step by apps.reviews.counters
+    helpful_score = models.FloatField(default=0)
     
     class Meta:
         ordering = ['-created_at']
@@ -54,6 +58,13 @@ class Review(TimeStampedModel):
                 name='review_cannot_have_both_event_and_venue'
             )
         ]
+        indexes = [
+            # Moderation queue, newest first per status
+            models.Index(fields=['status', '-created_at', '-id'], name='review_status_created_idx'),
+            # "Most helpful" ordering on the reviews pages
+            models.Index(fields=['event', 'status', '-helpful_score', '-created_at'], name='review_event_helpful_idx'),
+            models.Index(fields=['venue', 'status', '-helpful_score', '-created_at'], name='review_venue_helpful_idx'),
+        ]
         # Ensure one review per user per event/venue
         unique_together = [
             ['user', 'event'],
@@ -71,6 +82,61 @@ class Review(TimeStampedModel):
         return (self.helpful_votes / self.total_votes) * 100
 
 
+class RatingSummary(models.Model):
+    """Approved review totals for one event or venue, kept up to date by review signals"""
+    
+    event = models.OneToOneField(
+        'events.Event', on_delete=models.CASCADE, null=True, blank=True, related_name='rating_summary'
+    )
+    venue = models.OneToOneField(
+        'venues.Venue', on_delete=models.CASCADE, null=True, blank=True, related_name='rating_summary'
+    )
+    
+    # Approved reviews per star
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(event__isnull=False) | models.Q(venue__isnull=False),
+                name='rating_summary_must_have_event_or_venue'
+            ),
+            models.CheckConstraint(
+                check=~(models.Q(event__isnull=False) & models.Q(venue__isnull=False)),
+                name='rating_summary_cannot_have_both_event_and_venue'
+            )
+        ]
+    
+    def __str__(self):
+        return f"Ratings for {self.event or self.venue}: {self.review_count}"
+    
+    @classmethod
+    def for_target(cls, event=None, venue=None):
+        """Summary row for ``event`` or ``venue``, or an empty unsaved one if it has no approved reviews"""
+        target = {'event': event} if event is not None else {'venue': venue}
+        return cls.objects.filter(**target).first() or cls(**target)
+    
+    @property
+    def average(self):
+        if self.review_count == 0:
+            return 0
+        return self.rating_sum / self.review_count
+    
+    def breakdown(self):
+        """``{star: {'count', 'percentage'}}`` for stars 1 to 5"""
+        total = self.review_count or 1
+        return {
+            star: {'count': count, 'percentage': round(count * 100 / total)}
+            for star, count in ((star, getattr(self, f'stars_{star}')) for star in range(1, 6))
+        }
+
+
 class ReviewVote(models.Model):
     """Track helpfulness votes on reviews"""
     
@@ -86,6 +152,19 @@ class ReviewVote(models.Model):
         return f"{self.user.username} - {'Helpful' if self.is_helpful else 'Not Helpful'}"
 
 
+# Width of one materialized path segment: a comment id in zero-padded base 36
+PATH_STEP = 8
+MAX_PATH_DEPTH = 30
+
+
+def path_segment(pk):
+    digits = ''
+    while pk:
+        pk, remainder = divmod(pk, 36)
+        digits = '0123456789abcdefghijklmnopqrstuvwxyz'[remainder] + digits
+    return digits.rjust(PATH_STEP, '0')
+
+
 class Comment(TimeStampedModel):
     """Comments on events for discussion"""
     
@@ -106,6 +185,11 @@ class Comment(TimeStampedModel):
         related_name='replies'
     )
     
+    # Materialized path: the path segments of every ancestor followed by this comment's own,
+    # so a thread sorts depth-first by path and a subtree is a path prefix
+    path = models.CharField(max_length=PATH_STEP * (MAX_PATH_DEPTH + 1), blank=True, db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     # Comment content
     content = models.TextField()
     
@@ -120,6 +204,8 @@ class Comment(TimeStampedModel):
     )
     moderation_notes = models.TextField(blank=True)
     moderated_at = models.DateTimeField(null=True, blank=True)
+    # Abuse probability from the moderation classifier, when one was trained
+    spam_score = models.FloatField(null=True, blank=True)
     
     # Engagement tracking
     likes = models.PositiveIntegerField(default=0)
@@ -127,10 +213,23 @@ class Comment(TimeStampedModel):
     
     class Meta:
         ordering = ['-is_pinned', '-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at', '-id'], name='comment_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"Comment by {self.user.username} on {self.event.title}"
     
+    def save(self, *args, **kwargs):
+        if self.parent_id and self.parent.depth >= MAX_PATH_DEPTH:
+            # Replies past the deepest level join their parent's siblings
+            self.parent = self.parent.parent
+        super().save(*args, **kwargs)
+        if not self.path:
+            self.path = (self.parent.path if self.parent_id else '') + path_segment(self.pk)
+            self.depth = len(self.path) // PATH_STEP - 1
+            Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+    
     @property
     def is_reply(self):
         return self.parent is not None
@@ -148,3 +247,30 @@ class CommentLike(models.Model):
     
     def __str__(self):
         return f"{self.user.username} likes comment on {self.comment.event.title}"
+
+
+class CounterShard(models.Model):
+    """Pending delta for one shard of a hot counter, folded back into the counted row periodically"""
+    
+    counter = models.CharField(max_length=40)
+    target_id = models.BigIntegerField()
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['counter', 'target_id', 'shard'], name='unique_counter_shard'),
+        ]
+    
+    def __str__(self):
+        return f"{self.counter}:{self.target_id}[{self.shard}] {self.delta:+d}"
+
+
+class ClassifierWeights(models.Model):
+    """Trained spam classifier weights, zlib-compressed; the newest row is the live model"""
+    
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Classifier weights of {self.created_at:%Y-%m-%d %H:%M}"
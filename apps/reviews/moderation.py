@@ -0,0 +1,118 @@
+"""
+Review and comment moderation.
+
+The queue is read a page at a time with ``keyset_merge``, so every page costs
+the same however long the backlog is. Decisions are applied to any number of
+reviews or comments with one ``UPDATE`` that stamps the moderator and time;
+rating summaries, rating analytics and author notifications for the batch
+follow in the same transaction.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from apps.analytics.ratings import apply_rating_changes
+from apps.core.models import Notification
+from .models import Comment, Review
+from .summaries import apply_changes, review_state
+
+
+def review_queue(status=Review.Status.PENDING, target=None, rating=None):
+    reviews = Review.objects.filter(status=status).select_related('user', 'event', 'venue')
+    if target == 'event':
+        reviews = reviews.filter(event__isnull=False)
+    elif target == 'venue':
+        reviews = reviews.filter(venue__isnull=False)
+    if rating:
+        reviews = reviews.filter(rating=rating)
+    return reviews
+
+
+def comment_queue(status=Comment.Status.PENDING):
+    return Comment.objects.filter(status=status).select_related('user', 'event', 'parent')
+
+
+def _notify_reviews(reviews, moderator, verb, notes):
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=review.user_id,
+            admin_user=moderator,
+            notification_type=Notification.NotificationType.OTHER,
+            subject=f'Review {verb.capitalize()}: {review.title}',
+            message=f'Your review "{review.title}" has been {verb}.' + (f'\n\nNotes: {notes}' if notes else ''),
+            event_id=review.event_id,
+            venue_id=review.venue_id,
+            details={'review_id': review.pk, 'status': review.status},
+        )
+        for review in reviews
+    ], batch_size=500)
+
+
+def _notify_comments(comments, moderator, verb, notes):
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=comment.user_id,
+            admin_user=moderator,
+            notification_type=Notification.NotificationType.OTHER,
+            subject=f'Comment {verb.capitalize()}',
+            message=f'Your comment "{comment.content[:100]}" has been {verb}.' + (f'\n\nNotes: {notes}' if notes else ''),
+            event_id=comment.event_id,
+            comment_id=comment.pk,
+            details={'comment_id': comment.pk, 'status': comment.status},
+        )
+        for comment in comments
+    ], batch_size=500)
+
+
+def moderate_reviews(moderator, review_ids, status, notes='', notify=True):
+    """Set ``status`` on the reviews in ``review_ids`` that do not have it yet; returns them."""
+    now = timezone.now()
+    with transaction.atomic():
+        reviews = list(
+            Review.objects.select_for_update().filter(pk__in=review_ids).exclude(status=status).only(
+                'pk', 'user_id', 'event_id', 'venue_id', 'rating', 'status', 'title',
+            )
+        )
+        if not reviews:
+            return []
+        Review.objects.filter(pk__in=[review.pk for review in reviews]).update(
+            status=status,
+            moderated_by=moderator,
+            moderated_at=now,
+            moderation_notes=notes,
+            updated_at=now,
+        )
+        changes = []
+        for review in reviews:
+            changes.append((review_state(review), -1))
+            review.status = status
+            changes.append((review_state(review), 1))
+        apply_changes(changes)
+        apply_rating_changes(changes)
+        if notify:
+            _notify_reviews(reviews, moderator, Review.Status(status).label.lower(), notes)
+    return reviews
+
+
+def moderate_comments(moderator, comment_ids, status, notes='', notify=True):
+    """Set ``status`` on the comments in ``comment_ids`` that do not have it yet; returns them."""
+    now = timezone.now()
+    with transaction.atomic():
+        comments = list(
+            Comment.objects.select_for_update().filter(pk__in=comment_ids).exclude(status=status).only(
+                'pk', 'user_id', 'event_id', 'content', 'status',
+            )
+        )
+        if not comments:
+            return []
+        Comment.objects.filter(pk__in=[comment.pk for comment in comments]).update(
+            status=status,
+            moderated_by=moderator,
+            moderated_at=now,
+            moderation_notes=notes,
+            updated_at=now,
+        )
+        for comment in comments:
+            comment.status = status
+        if notify:
+            _notify_comments(comments, moderator, Comment.Status(status).label.lower(), notes)
+    return comments
@@ -0,0 +1,27 @@
+"""
+Keep rating summaries in step with reviews
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Review
+from .summaries import COUNTED_FIELDS, apply_changes, deleted_changes, previous_states, saved_changes
+
+
+@receiver(pre_save, sender=Review)
+def remember_counted_rating(sender, instance, update_fields=None, **kwargs):
+    # Saves that only touch votes or text cannot move the rating
+    instance._rating_unchanged = update_fields is not None and not COUNTED_FIELDS.intersection(update_fields)
+    instance._rating_previous = None
+    if instance.pk and not instance._rating_unchanged:
+        instance._rating_previous = previous_states([instance.pk]).get(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_summary(sender, instance, **kwargs):
+    apply_changes(saved_changes(instance))
+
+
+@receiver(post_delete, sender=Review)
+def remove_from_rating_summary(sender, instance, **kwargs):
+    apply_changes(deleted_changes(instance))
@@ -0,0 +1,117 @@
+"""
+Per-target rating summaries.
+
+``RatingSummary`` holds how many approved reviews gave an event or venue each
+star, plus their sum and count, so review pages read the histogram, average
+and total from one row. Every create, edit, delete and moderation change is
+turned into signed deltas and applied with ``F()`` increments, which stay
+correct under concurrent writers; ``rebuild_summaries`` recomputes the rows
+from the reviews themselves.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import RatingSummary, Review
+
+
+STARS = range(1, 6)
+
+# Fields of a review that decide whether and where it is counted
+COUNTED_FIELDS = frozenset(['event', 'event_id', 'venue', 'venue_id', 'rating', 'status'])
+
+
+def counted_state(event_id, venue_id, rating, status):
+    """``(event_id, venue_id, rating)`` if a review in this state counts towards ratings, else ``None``."""
+    if status != Review.Status.APPROVED:
+        return None
+    return event_id, venue_id, rating
+
+
+def review_state(review):
+    return counted_state(review.event_id, review.venue_id, review.rating, review.status)
+
+
+def previous_states(review_ids):
+    """Counted state of each review as currently stored, by id."""
+    return {
+        pk: counted_state(event_id, venue_id, rating, status)
+        for pk, event_id, venue_id, rating, status in Review.objects.filter(pk__in=review_ids).values_list(
+            'pk', 'event_id', 'venue_id', 'rating', 'status',
+        )
+    }
+
+
+def saved_changes(review):
+    """``(state, sign)`` pairs for a review just saved, from what ``pre_save`` remembered."""
+    if getattr(review, '_rating_unchanged', False):
+        return []
+    return [(getattr(review, '_rating_previous', None), -1), (review_state(review), 1)]
+
+
+def deleted_changes(review):
+    return [(review_state(review), -1)]
+
+
+def target_deltas(changes):
+    """
+    Net field deltas per ``(event_id, venue_id)`` for ``(state, sign)`` pairs.
+
+    ``sign`` is ``1`` when a review starts counting in ``state`` and ``-1``
+    when it stops. Targets whose changes cancel out are left out.
+    """
+    deltas = defaultdict(Counter)
+    for state, sign in changes:
+        if state is None:
+            continue
+        event_id, venue_id, rating = state
+        delta = deltas[event_id, venue_id]
+        delta[f'stars_{rating}'] += sign
+        delta['rating_sum'] += sign * rating
+        delta['review_count'] += sign
+    return {
+        target: {field: value for field, value in delta.items() if value}
+        for target, delta in deltas.items()
+        if any(delta.values())
+    }
+
+
+def apply_changes(changes):
+    """Apply ``(state, sign)`` pairs to the summaries, one ``UPDATE`` per target."""
+    for (event_id, venue_id), delta in target_deltas(changes).items():
+        target = {'event_id': event_id} if event_id else {'venue_id': venue_id}
+        updates = {field: F(field) + value for field, value in delta.items()}
+        if RatingSummary.objects.filter(**target).update(**updates):
+            continue
+        # A missing row has nothing to take away from, e.g. while its target is being deleted
+        if all(value > 0 for value in delta.values()):
+            RatingSummary.objects.bulk_create([RatingSummary(**target)], ignore_conflicts=True)
+            RatingSummary.objects.filter(**target).update(**updates)
+
+
+def rebuild_summaries(reviews=None):
+    """Recompute the summaries of every target with reviews in ``reviews`` (all by default)."""
+    reviews = Review.objects.all() if reviews is None else reviews
+    approved = Q(status=Review.Status.APPROVED)
+    rows = (
+        Review.objects.filter(
+            Q(event_id__in=reviews.filter(event__isnull=False).values('event_id'))
+            | Q(venue_id__in=reviews.filter(venue__isnull=False).values('venue_id'))
+        )
+        .values('event_id', 'venue_id')
+        .annotate(
+            rating_sum=Sum('rating', filter=approved, default=0),
+            review_count=Count('pk', filter=approved),
+            **{f'stars_{star}': Count('pk', filter=approved & Q(rating=star)) for star in STARS},
+        )
+        .order_by()
+    )
+    summaries = [RatingSummary(**row) for row in rows]
+    with transaction.atomic():
+        RatingSummary.objects.filter(
+            Q(event_id__in=[summary.event_id for summary in summaries if summary.event_id])
+            | Q(venue_id__in=[summary.venue_id for summary in summaries if summary.venue_id])
+        ).delete()
+        RatingSummary.objects.bulk_create(summaries, batch_size=500)
+    return len(summaries)
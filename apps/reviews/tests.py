@@ -1,3 +1,269 @@
-from django.test import TestCase
+from django.db.models import Value
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from apps.core.models import Notification
+from apps.payments.tests import OrderTestCase
+from apps.users.models import User
+from . import classifier, counters
+from .models import ClassifierWeights, Comment, RatingSummary, Review
+from .helpfulness import wilson_expression, wilson_lower_bound
+from .moderation import moderate_comments, moderate_reviews
+from .summaries import rebuild_summaries
+from .threads import attach_reply_windows, subtree_window
+
+
+SPAM = ['Buy cheap pills now, click here', 'Click here for free money', 'Cheap pills, click the link now']
+HAM = ['Great show, loved the band', 'Lovely venue and friendly staff', 'The band played a great set']
+
+
+def examples():
+    return [(text, 1) for text in SPAM] + [(text, 0) for text in HAM]
+
+
+class ReviewTestCase(OrderTestCase):
+    def review(self, rating=5, status=Review.Status.APPROVED, content='Great night out', **target):
+        user = User.objects.create_user(f'reviewer{User.objects.count()}', 'reviewer@example.com', 'pw')
+        return Review.objects.create(
+            user=user, rating=rating, title='-', content=content, status=status, **(target or {'event': self.event}),
+        )
+
+
+class RatingSummaryTests(ReviewTestCase):
+    def summary(self, **target):
+        return RatingSummary.for_target(**(target or {'event': self.event}))
+
+    def test_histogram_follows_reviews(self):
+        five = self.review(5)
+        self.review(3)
+        self.review(1, status=Review.Status.PENDING)
+        self.review(4, venue=self.venue)
+        summary = self.summary()
+        self.assertEqual((summary.review_count, summary.average), (2, 4))
+        self.assertEqual([summary.breakdown()[star]['count'] for star in range(1, 6)], [0, 0, 1, 0, 1])
+        self.assertEqual(self.summary(venue=self.venue).review_count, 1)
+
+        five.rating = 2
+        five.save()
+        self.assertEqual(self.summary().stars_2, 1)
+        five.status = Review.Status.REJECTED
+        five.save()
+        five.delete()
+        summary = self.summary()
+        self.assertEqual((summary.review_count, summary.rating_sum, summary.stars_2), (1, 3, 0))
+
+    def test_saves_that_cannot_move_the_rating_skip_the_lookup(self):
+        review = self.review()
+        review.helpful_votes = 3
+        with self.assertNumQueries(1):
+            review.save(update_fields=['helpful_votes'])
+
+    def test_rebuild_matches_the_running_summary(self):
+        for rating in (5, 4, 4, 2):
+            self.review(rating)
+        running = self.summary()
+        RatingSummary.objects.update(stars_4=0, review_count=0)
+        self.assertEqual(rebuild_summaries(), 1)
+        rebuilt = self.summary()
+        self.assertEqual(
+            [getattr(rebuilt, field) for field in ('stars_2', 'stars_4', 'stars_5', 'rating_sum', 'review_count')],
+            [getattr(running, field) for field in ('stars_2', 'stars_4', 'stars_5', 'rating_sum', 'review_count')],
+        )
+
+
+class ThreadTests(OrderTestCase):
+    def comment(self, parent=None, status=Comment.Status.APPROVED):
+        return Comment.objects.create(user=self.buyer, event=self.event, parent=parent, content='-', status=status)
+
+    def setUp(self):
+        self.root = self.comment()
+        first = self.comment(self.root)
+        nested = self.comment(first)
+        deep = self.comment(nested)
+        self.comment(deep)
+        second = self.comment(self.root)
+        self.comment(self.root, status=Comment.Status.PENDING)
+        self.quiet = self.comment()
+        # Depth-first order of the approved replies up to three levels down
+        self.replies = [first, nested, deep, second]
+
+    def test_pages_get_the_first_replies_of_each_thread(self):
+        page = Comment.objects.filter(pk__in=[self.root.pk, self.quiet.pk]).order_by('pk')
+        root, quiet = attach_reply_windows(page, size=2)
+        self.assertEqual(root.reply_window, self.replies[:2])
+        self.assertEqual((root.reply_count, root.replies_cursor), (4, self.replies[1].path))
+        self.assertEqual([reply.level for reply in root.reply_window], [1, 2])
+        self.assertEqual((quiet.reply_window, quiet.reply_count, quiet.replies_cursor), ([], 0, None))
+
+    def test_windows_continue_through_the_thread(self):
+        seen = []
+        cursor = None
+        while True:
+            window, cursor = subtree_window(self.root, after=cursor, size=3)
+            seen.extend(window)
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.replies)
+        deep = seen[2]
+        # The reply below the third level is loaded from the comment it hangs off
+        self.assertTrue(deep.continues)
+        self.assertEqual(len(subtree_window(deep)[0]), 1)
+
+
+class CounterTests(ReviewTestCase):
+    def test_likes_toggle(self):
+        comment = Comment.objects.create(user=self.buyer, event=self.event, content='-')
+        self.assertEqual(counters.toggle_like(comment.pk, self.buyer), (True, 1))
+        self.assertEqual(counters.toggle_like(comment.pk, self.planner), (True, 2))
+        self.assertEqual(counters.toggle_like(comment.pk, self.buyer), (False, 1))
+
+    def test_votes_change_and_withdraw(self):
+        review = self.review()
+        self.assertEqual(counters.cast_vote(review.pk, self.buyer, True), {'helpful_votes': 1, 'total_votes': 1})
+        self.assertEqual(counters.cast_vote(review.pk, self.buyer, False), {'helpful_votes': 0, 'total_votes': 1})
+        self.assertEqual(counters.cast_vote(review.pk, self.buyer, False), {'helpful_votes': 0, 'total_votes': 0})
+
+    @override_settings(COUNTER_SHARDS=4)
+    def test_sharded_counts_read_exactly_and_fold(self):
+        review = self.review()
+        voters = [User.objects.create_user(f'voter{index}', 'voter@example.com', 'pw') for index in range(6)]
+        for index, voter in enumerate(voters):
+            counts = counters.cast_vote(review.pk, voter, index % 3 != 0)
+        self.assertEqual(counts, {'helpful_votes': 4, 'total_votes': 6})
+        review.refresh_from_db()
+        self.assertEqual(review.total_votes, 0)
+
+        self.assertGreater(counters.fold_shards(), 0)
+        review.refresh_from_db()
+        self.assertEqual((review.helpful_votes, review.total_votes), (4, 6))
+        self.assertGreater(review.helpful_score, 0)
+
+    def test_reconcile_recounts_drifted_rows(self):
+        review = self.review()
+        counters.cast_vote(review.pk, self.buyer, True)
+        Review.objects.filter(pk=review.pk).update(helpful_votes=7, total_votes=9)
+        self.assertEqual(counters.reconcile_counters(), {'comments': 0, 'reviews': 1})
+        review.refresh_from_db()
+        self.assertEqual((review.helpful_votes, review.total_votes), (1, 1))
+
+
+class ModerationTests(ReviewTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+
+    def test_bulk_decisions_update_ratings_and_notify_authors(self):
+        pending = [self.review(rating, status=Review.Status.PENDING) for rating in (5, 3)]
+        approved = self.review(4)
+        moderated = moderate_reviews(self.admin, [review.pk for review in pending + [approved]], Review.Status.APPROVED)
+        self.assertEqual({review.pk for review in moderated}, {review.pk for review in pending})
+        summary = RatingSummary.for_target(event=self.event)
+        self.assertEqual((summary.review_count, summary.rating_sum), (3, 12))
+        self.assertEqual(Notification.objects.filter(admin_user=self.admin).count(), 2)
+
+        comment = Comment.objects.create(user=self.buyer, event=self.event, content='-')
+        self.assertEqual(moderate_comments(self.admin, [comment.pk], Comment.Status.REJECTED, notify=False), [comment])
+        comment.refresh_from_db()
+        self.assertEqual((comment.status, comment.moderated_by), (Comment.Status.REJECTED, self.admin))
+
+    def test_dashboard_filters_and_pages_the_queue(self):
+        reviews = [self.review(rating, status=Review.Status.PENDING) for rating in (1, 1, 5)]
+        comment = Comment.objects.create(user=self.buyer, event=self.event, content='-', status=Comment.Status.PENDING)
+        self.client.force_login(self.admin)
+        url = reverse('reviews:moderation_dashboard')
+
+        response = self.client.get(url, {'rating': 1})
+        self.assertEqual([entry.object for entry in response.context['entries']], [reviews[1], reviews[0]])
+
+        response = self.client.get(url, {'kind': 'comment'})
+        self.assertEqual([entry.object for entry in response.context['entries']], [comment])
+        response = self.client.get(url)
+        self.assertEqual(
+            [entry.object for entry in response.context['entries']], [comment, reviews[2], reviews[1], reviews[0]],
+        )
+
+    def test_bulk_view_applies_one_action_to_reviews_and_comments(self):
+        review = self.review(status=Review.Status.PENDING)
+        comment = Comment.objects.create(user=self.buyer, event=self.event, content='-', status=Comment.Status.PENDING)
+        self.client.force_login(self.admin)
+        self.client.post(reverse('reviews:bulk_moderate'), {
+            'action': 'approve', 'review_ids': [review.pk], 'comment_ids': [comment.pk],
+        })
+        review.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual((review.status, comment.status), (Review.Status.APPROVED, Comment.Status.APPROVED))
+
+
+class HelpfulnessTests(ReviewTestCase):
+    def voted(self, helpful, total):
+        review = self.review()
+        Review.objects.filter(pk=review.pk).update(
+            helpful_votes=helpful, total_votes=total, helpful_score=wilson_expression(Value(helpful), Value(total)),
+        )
+        review.refresh_from_db()
+        return review
+
+    def test_confidence_outweighs_a_perfect_share_of_few_votes(self):
+        self.assertEqual(wilson_lower_bound(0, 0), 0)
+        self.assertLess(wilson_lower_bound(1, 1), wilson_lower_bound(90, 100))
+        self.assertAlmostEqual(wilson_lower_bound(90, 100), 0.8256, places=4)
+
+    def test_stored_scores_match_the_python_bound(self):
+        for helpful, total in ((0, 0), (1, 1), (3, 10), (90, 100)):
+            self.assertAlmostEqual(self.voted(helpful, total).helpful_score, wilson_lower_bound(helpful, total))
+
+    def test_helpful_sort_ranks_by_the_bound(self):
+        lucky = self.voted(1, 1)
+        trusted = self.voted(90, 100)
+        unrated = self.voted(0, 0)
+        response = self.client.get(reverse('reviews:event_all_reviews', args=[self.event.pk]), {'sort': 'helpful'})
+        self.assertEqual(list(response.context['reviews']), [trusted, lucky, unrated])
+
+
+class ClassifierTests(TestCase):
+    def test_scores_separate_spam_from_real_reviews(self):
+        weights = classifier.train(examples())
+        self.assertGreater(classifier.score('cheap pills, click here', weights), 0.9)
+        self.assertLess(classifier.score('loved the band', weights), 0.1)
+        self.assertEqual(
+            classifier.score_many(['cheap pills', 'great venue'], weights),
+            [classifier.score('cheap pills', weights), classifier.score('great venue', weights)],
+        )
+
+    def test_training_needs_both_kinds(self):
+        with self.assertRaises(ValueError):
+            classifier.train([(text, 0) for text in HAM])
+
+    def test_nothing_is_held_without_a_model(self):
+        self.assertIsNone(classifier.load_weights())
+        self.assertEqual(classifier.screen('cheap pills, click here'), (None, Review.Status.APPROVED))
+
+    def test_saved_weights_load_back(self):
+        weights = classifier.train(examples())
+        classifier.save_weights(weights)
+        self.assertEqual(classifier.load_weights(), weights)
+        probability, status = classifier.screen('cheap pills, click here')
+        self.assertEqual(probability, classifier.score('cheap pills, click here', weights))
+        self.assertEqual(status, Review.Status.PENDING)
+
+    def test_newer_models_replace_the_loaded_one(self):
+        classifier.save_weights(classifier.train(examples()))
+        classifier.load_weights()
+        retrained = classifier.train(examples() + [('loved the band', 1)] * 5)
+        classifier.save_weights(retrained)
+        self.assertEqual(classifier.load_weights(), retrained)
+        self.assertEqual(ClassifierWeights.objects.count(), 1)
+
+
+class RescoreTests(OrderTestCase):
+    def test_holds_unmoderated_content_that_now_looks_like_abuse(self):
+        spam = Review.objects.create(
+            user=self.buyer, event=self.event, rating=5, title='Deal', content='Cheap pills, click here',
+            status=Review.Status.APPROVED,
+        )
+        totals = classifier.rescore(classifier.train(examples()), batch_size=1, hold=True)
+        self.assertEqual(totals, {'scored': 1, 'held': 1})
+        spam.refresh_from_db()
+        self.assertEqual(spam.status, Review.Status.PENDING)
+        self.assertGreater(spam.spam_score, 0.9)
@@ -0,0 +1,92 @@
+"""
+Comment threads.
+
+Every comment stores a materialized ``path`` (see ``Comment.path``), so a
+subtree is a single ``path LIKE 'prefix%'`` range read in depth-first order.
+Pages of top-level comments get the first few replies of each thread from
+one query that numbers replies per thread with a window function; the rest
+of a thread, and anything nested deeper than ``REPLY_DEPTH``, is fetched a
+window at a time through ``subtree_window``.
+"""
+from django.db.models import Count, Exists, F, OuterRef, Window
+from django.db.models.functions import RowNumber, Substr
+
+from .models import PATH_STEP, Comment
+
+
+REPLY_WINDOW = 5
+# Reply levels shown under a comment before the thread continues on demand
+REPLY_DEPTH = 3
+
+
+def visible_replies():
+    return Comment.objects.filter(status=Comment.Status.APPROVED).select_related('user').annotate(
+        has_replies=Exists(Comment.objects.filter(parent=OuterRef('pk'), status=Comment.Status.APPROVED)),
+    )
+
+
+def _set_levels(replies, base_depth, depth):
+    for reply in replies:
+        reply.level = reply.depth - base_depth
+        # Replies nested deeper than the window shows are loaded through this one
+        reply.continues = reply.has_replies and reply.level == depth
+    return replies
+
+
+def attach_reply_windows(comments, size=REPLY_WINDOW, depth=REPLY_DEPTH):
+    """
+    Give each top-level comment in ``comments`` its first ``size`` replies.
+
+    Sets ``reply_window`` (replies up to ``depth`` levels down, depth-first),
+    ``reply_count`` (how many replies exist within that depth) and
+    ``replies_cursor`` (the path to continue after, or ``None`` when the
+    window holds them all). One query for the whole page.
+    """
+    comments = list(comments)
+    by_path = {comment.path: comment for comment in comments}
+    for comment in comments:
+        comment.reply_window = []
+        comment.reply_count = 0
+        comment.replies_cursor = None
+    if not by_path:
+        return comments
+
+    thread = Substr('path', 1, PATH_STEP)
+    replies = (
+        visible_replies()
+        .annotate(thread=thread)
+        .filter(thread__in=list(by_path), depth__gte=1, depth__lte=depth)
+        .annotate(
+            position=Window(RowNumber(), partition_by=[thread], order_by=F('path').asc()),
+            thread_replies=Window(Count('pk'), partition_by=[thread]),
+        )
+        .filter(position__lte=size)
+        .order_by('path')
+    )
+    for reply in _set_levels(list(replies), 0, depth):
+        comment = by_path[reply.thread]
+        comment.reply_window.append(reply)
+        comment.reply_count = reply.thread_replies
+    for comment in comments:
+        if comment.reply_count > len(comment.reply_window):
+            comment.replies_cursor = comment.reply_window[-1].path
+    return comments
+
+
+def subtree_window(root, after=None, size=REPLY_WINDOW, depth=REPLY_DEPTH):
+    """
+    Up to ``size`` replies under ``root``, depth-first, following the path ``after``.
+
+    Returns ``(replies, cursor)`` where ``cursor`` is the path to pass as
+    ``after`` for the next window, or ``None`` after the last one.
+    """
+    replies = visible_replies().filter(
+        path__startswith=root.path,
+        depth__gt=root.depth,
+        depth__lte=root.depth + depth,
+    )
+    if after and after.startswith(root.path):
+        replies = replies.filter(path__gt=after)
+    replies = list(replies.order_by('path')[:size + 1])
+    cursor = replies[size - 1].path if len(replies) > size else None
+    return _set_levels(replies[:size], root.depth, depth), cursor
@@ -20,6 +20,7 @@ urlpatterns = [
     
     # Comment management
     path('comment/<int:pk>/reply/', views.ReplyToCommentView.as_view(), name='reply_comment'),
+    path('comment/<int:pk>/replies/', views.CommentRepliesView.as_view(), name='comment_replies'),
     path('comment/<int:pk>/like/', views.LikeCommentView.as_view(), name='like_comment'),
     path('comment/<int:pk>/edit/', views.EditCommentView.as_view(), name='edit_comment'),
     path('comment/<int:pk>/delete/', views.DeleteCommentView.as_view(), name='delete_comment'),
@@ -29,6 +30,7 @@ urlpatterns = [
     
     # Moderation (for admins)
     path('moderate/', views.ModerationDashboardView.as_view(), name='moderation_dashboard'),
+    path('moderate/bulk/', views.BulkModerationView.as_view(), name='bulk_moderate'),
     path('review/<int:pk>/approve/', views.ApproveReviewView.as_view(), name='approve_review'),
     path('review/<int:pk>/reject/', views.RejectReviewView.as_view(), name='reject_review'),
     path('comment/<int:pk>/approve/', views.ApproveCommentView.as_view(), name='approve_comment'),
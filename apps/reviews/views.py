@@ -1,17 +1,26 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import TemplateView, View, ListView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Avg, Count, Q
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.db.models import Count, Q
 from django.utils import timezone
 from django.core.paginator import Paginator
 
-from .models import Review, ReviewVote, Comment, CommentLike
+from .models import RatingSummary, Review, ReviewVote, Comment, CommentLike
+from .classifier import is_suspicious, review_text, score, screen
+from .counters import cast_vote, toggle_like
+from .moderation import comment_queue, moderate_comments, moderate_reviews, review_queue
+from .threads import attach_reply_windows, subtree_window
 from apps.events.models import Event
 from apps.venues.models import Venue, VenueBookingRequest
 from apps.payments.models import Order
 from apps.core.models import Notification
+from apps.core.notifications import notify_collapsed
+from apps.core.pagination import build_query_string, decode_cursor, keyset_merge
 
 
 class AdminRequiredMixin(UserPassesTestMixin):
@@ -35,16 +44,21 @@ class CreateCommentView(LoginRequiredMixin, View):
             messages.error(request, 'Comment cannot be empty.')
             return redirect('events:event_detail', pk=event.pk)
 
+        spam_score, status = screen(content)
         comment = Comment.objects.create(
             user=request.user,
             event=event,
             content=content,
-            status=Comment.Status.APPROVED,
+            status=status,
+            spam_score=spam_score,
         )
+        if status == Comment.Status.PENDING:
+            messages.info(request, 'Your comment will appear once a moderator has reviewed it.')
+            return redirect('events:event_detail', pk=event.pk)
 
         # Send notification to the event manager
         if event.manager != request.user:
-            Notification.objects.create(
+            notify_collapsed(
                 recipient=event.manager,
                 admin_user=None,
                 notification_type=Notification.NotificationType.NEW_COMMENT,
@@ -75,17 +89,22 @@ class ReplyToCommentView(LoginRequiredMixin, View):
             messages.error(request, 'Reply cannot be empty.')
             return redirect('reviews:event_comments', event_id=parent_comment.event.pk)
 
+        spam_score, status = screen(content)
         reply = Comment.objects.create(
             user=request.user,
             event=parent_comment.event,
             parent=parent_comment,
             content=content,
-            status=Comment.Status.APPROVED,
+            status=status,
+            spam_score=spam_score,
         )
+        if status == Comment.Status.PENDING:
+            messages.info(request, 'Your reply will appear once a moderator has reviewed it.')
+            return redirect('reviews:event_comments', event_id=parent_comment.event.pk)
 
         # Notify the parent comment author
         if parent_comment.user != request.user:
-            Notification.objects.create(
+            notify_collapsed(
                 recipient=parent_comment.user,
                 notification_type=Notification.NotificationType.COMMENT_REPLY,
                 subject=f'New reply to your comment on "{parent_comment.event.title}"',
@@ -103,7 +122,7 @@ class ReplyToCommentView(LoginRequiredMixin, View):
         # Also notify event manager if reply is from someone else
         event = parent_comment.event
         if event.manager != request.user and event.manager != parent_comment.user:
-            Notification.objects.create(
+            notify_collapsed(
                 recipient=event.manager,
                 notification_type=Notification.NotificationType.NEW_COMMENT,
                 subject=f'New reply on "{event.title}"',
@@ -126,29 +145,14 @@ class LikeCommentView(LoginRequiredMixin, View):
 
     def post(self, request, pk):
         comment = get_object_or_404(Comment, pk=pk, status='approved')
-
-        like, created = CommentLike.objects.get_or_create(
-            comment=comment,
-            user=request.user,
-        )
-
-        if not created:
-            # Unlike — remove the like
-            like.delete()
-            comment.likes = max(0, comment.likes - 1)
-            comment.save(update_fields=['likes'])
-            liked = False
-        else:
-            comment.likes += 1
-            comment.save(update_fields=['likes'])
-            liked = True
+        liked, likes = toggle_like(comment.pk, request.user)
 
         # Return JSON for AJAX or redirect for regular form submit
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
                 'success': True,
                 'liked': liked,
-                'likes_count': comment.likes,
+                'likes_count': likes,
             })
 
         return redirect(request.META.get('HTTP_REFERER', 'events:home'))
@@ -165,8 +169,13 @@ class EditCommentView(LoginRequiredMixin, View):
             messages.error(request, 'Comment cannot be empty.')
         else:
             comment.content = content
-            comment.save(update_fields=['content', 'updated_at'])
-            messages.success(request, 'Comment updated successfully!')
+            comment.spam_score = score(content)
+            if comment.status == Comment.Status.APPROVED and is_suspicious(comment.spam_score):
+                comment.status = Comment.Status.PENDING
+                messages.info(request, 'Your comment will reappear once a moderator has reviewed the change.')
+            else:
+                messages.success(request, 'Comment updated successfully!')
+            comment.save(update_fields=['content', 'spam_score', 'status', 'updated_at'])
 
         return redirect('reviews:event_comments', event_id=comment.event.pk)
 
@@ -193,14 +202,12 @@ class EventCommentsPageView(View):
     def get(self, request, event_id):
         event = get_object_or_404(Event, pk=event_id, status='published')
 
-        # Get top-level comments (no parent) with their replies
+        # Top-level comments (no parent); each gets a window of its thread below
         comments = Comment.objects.filter(
             event=event,
             status='approved',
             parent__isnull=True,
-        ).select_related('user').prefetch_related(
-            'replies__user', 'comment_likes'
-        ).order_by('-is_pinned', '-created_at')
+        ).select_related('user').order_by('-is_pinned', '-created_at')
 
         # Track which comments the user has liked
         user_liked_ids = set()
@@ -215,6 +222,7 @@ class EventCommentsPageView(View):
         paginator = Paginator(comments, 15)
         page_number = request.GET.get('page', 1)
         comments_page = paginator.get_page(page_number)
+        comments_page.object_list = attach_reply_windows(comments_page.object_list)
 
         context = {
             'event': event,
@@ -225,6 +233,33 @@ class EventCommentsPageView(View):
         return render(request, 'reviews/event_comments.html', context)
 
 
+class CommentRepliesView(View):
+    """Next window of replies under a comment, for "load more replies" links"""
+
+    def get(self, request, pk):
+        root = get_object_or_404(Comment, pk=pk, status='approved', event__status='published')
+        replies, cursor = subtree_window(root, after=request.GET.get('after'))
+
+        user_liked_ids = set()
+        if request.user.is_authenticated:
+            user_liked_ids = set(
+                CommentLike.objects.filter(
+                    user=request.user,
+                    comment__in=replies,
+                ).values_list('comment_id', flat=True)
+            )
+
+        html = render_to_string('reviews/_comment_replies.html', {
+            'event': root.event,
+            'replies': replies,
+            'user_liked_ids': user_liked_ids,
+        }, request=request)
+        return JsonResponse({
+            'html': html,
+            'next': reverse('reviews:comment_replies', args=[root.pk]) + f'?after={cursor}' if cursor else None,
+        })
+
+
 # ─────────────────────────────────────────────
 # REVIEW VIEWS
 # ─────────────────────────────────────────────
@@ -292,14 +327,19 @@ class CreateEventReviewView(LoginRequiredMixin, View):
             messages.error(request, 'Please fill in both the title and review content.')
             return redirect('reviews:create_event_review', event_id=event.pk)
 
+        spam_score, status = screen(review_text(title, content))
         review = Review.objects.create(
             user=request.user,
             event=event,
             rating=rating,
             title=title,
             content=content,
-            status=Review.Status.APPROVED,
+            status=status,
+            spam_score=spam_score,
         )
+        if status == Review.Status.PENDING:
+            messages.info(request, 'Thank you! Your review will appear once a moderator has reviewed it.')
+            return redirect('events:event_detail', pk=event.pk)
 
         # Notify event manager
         if event.manager != request.user:
@@ -399,14 +439,19 @@ class CreateVenueReviewView(LoginRequiredMixin, View):
             messages.error(request, 'Please fill in both the title and review content.')
             return redirect('reviews:create_venue_review', venue_id=venue.pk)
 
+        spam_score, status = screen(review_text(title, content))
         review = Review.objects.create(
             user=request.user,
             venue=venue,
             rating=rating,
             title=title,
             content=content,
-            status=Review.Status.APPROVED,
+            status=status,
+            spam_score=spam_score,
         )
+        if status == Review.Status.PENDING:
+            messages.info(request, 'Thank you! Your review will appear once a moderator has reviewed it.')
+            return redirect('venues:venue_detail', slug=venue.slug)
 
         # Notify venue manager
         if venue.manager != request.user:
@@ -462,9 +507,13 @@ class EditReviewView(LoginRequiredMixin, View):
         review.rating = rating
         review.title = title
         review.content = content
-        review.save(update_fields=['rating', 'title', 'content', 'updated_at'])
-
-        messages.success(request, 'Your review has been updated!')
+        review.spam_score = score(review_text(title, content))
+        if review.status == Review.Status.APPROVED and is_suspicious(review.spam_score):
+            review.status = Review.Status.PENDING
+            messages.info(request, 'Your review will reappear once a moderator has reviewed the change.')
+        else:
+            messages.success(request, 'Your review has been updated!')
+        review.save(update_fields=['rating', 'title', 'content', 'spam_score', 'status', 'updated_at'])
 
         if review.event:
             return redirect('events:event_detail', pk=review.event.pk)
@@ -502,41 +551,13 @@ class VoteReviewView(LoginRequiredMixin, View):
         review = get_object_or_404(Review, pk=pk, status='approved')
         is_helpful = request.POST.get('is_helpful', 'true').lower() == 'true'
 
-        vote, created = ReviewVote.objects.get_or_create(
-            review=review,
-            user=request.user,
-            defaults={'is_helpful': is_helpful},
-        )
-
-        if not created:
-            if vote.is_helpful == is_helpful:
-                # Remove vote
-                vote.delete()
-                review.total_votes = max(0, review.total_votes - 1)
-                if is_helpful:
-                    review.helpful_votes = max(0, review.helpful_votes - 1)
-                review.save(update_fields=['total_votes', 'helpful_votes'])
-            else:
-                # Change vote
-                old_helpful = vote.is_helpful
-                vote.is_helpful = is_helpful
-                vote.save(update_fields=['is_helpful'])
-                if is_helpful:
-                    review.helpful_votes += 1
-                else:
-                    review.helpful_votes = max(0, review.helpful_votes - 1)
-                review.save(update_fields=['helpful_votes'])
-        else:
-            review.total_votes += 1
-            if is_helpful:
-                review.helpful_votes += 1
-            review.save(update_fields=['total_votes', 'helpful_votes'])
+        counts = cast_vote(review.pk, request.user, is_helpful)
 
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
                 'success': True,
-                'helpful_votes': review.helpful_votes,
-                'total_votes': review.total_votes,
+                'helpful_votes': counts['helpful_votes'],
+                'total_votes': counts['total_votes'],
             })
 
         return redirect(request.META.get('HTTP_REFERER', 'events:home'))
@@ -546,32 +567,28 @@ class VoteReviewView(LoginRequiredMixin, View):
 # ALL-REVIEWS PAGES
 # ─────────────────────────────────────────────
 
+# Orderings offered on the reviews pages; "helpful" reads the (target, status, helpful_score) indexes
+REVIEW_SORTS = {
+    'newest': ('-created_at',),
+    'helpful': ('-helpful_score', '-created_at'),
+}
+
 class EventAllReviewsView(View):
     """View all reviews for a specific event"""
 
     def get(self, request, event_id):
         event = get_object_or_404(Event, pk=event_id)
 
+        sort = request.GET.get('sort')
+        if sort not in REVIEW_SORTS:
+            sort = 'newest'
         reviews = Review.objects.filter(
             event=event,
             status='approved',
-        ).select_related('user').order_by('-created_at')
-
-        # Stats
-        stats = reviews.aggregate(
-            avg_rating=Avg('rating'),
-            total_count=Count('id'),
-        )
+        ).select_related('user').order_by(*REVIEW_SORTS[sort])
 
-        # Rating breakdown
-        rating_breakdown = {}
-        for i in range(1, 6):
-            count = reviews.filter(rating=i).count()
-            total = stats['total_count'] or 1
-            rating_breakdown[i] = {
-                'count': count,
-                'percentage': round((count / total) * 100) if total > 0 else 0,
-            }
+        # Stats and rating breakdown come from the precomputed summary row
+        summary = RatingSummary.for_target(event=event)
 
         # Check if current user can review
         can_review = False
@@ -604,12 +621,13 @@ class EventAllReviewsView(View):
         context = {
             'event': event,
             'reviews': reviews_page,
-            'avg_rating': stats['avg_rating'] or 0,
-            'total_reviews': stats['total_count'] or 0,
-            'rating_breakdown': rating_breakdown,
+            'avg_rating': summary.average,
+            'total_reviews': summary.review_count,
+            'rating_breakdown': summary.breakdown(),
             'can_review': can_review,
             'has_reviewed': has_reviewed,
             'user_votes': user_votes,
+            'sort': sort,
         }
         return render(request, 'reviews/event_reviews.html', context)
 
@@ -620,26 +638,16 @@ class VenueAllReviewsView(View):
     def get(self, request, venue_id):
         venue = get_object_or_404(Venue, pk=venue_id)
 
+        sort = request.GET.get('sort')
+        if sort not in REVIEW_SORTS:
+            sort = 'newest'
         reviews = Review.objects.filter(
             venue=venue,
             status='approved',
-        ).select_related('user').order_by('-created_at')
-
-        # Stats
-        stats = reviews.aggregate(
-            avg_rating=Avg('rating'),
-            total_count=Count('id'),
-        )
+        ).select_related('user').order_by(*REVIEW_SORTS[sort])
 
-        # Rating breakdown
-        rating_breakdown = {}
-        for i in range(1, 6):
-            count = reviews.filter(rating=i).count()
-            total = stats['total_count'] or 1
-            rating_breakdown[i] = {
-                'count': count,
-                'percentage': round((count / total) * 100) if total > 0 else 0,
-            }
+        # Stats and rating breakdown come from the precomputed summary row
+        summary = RatingSummary.for_target(venue=venue)
 
         # Check if current user can review
         can_review = False
@@ -677,12 +685,13 @@ class VenueAllReviewsView(View):
         context = {
             'venue': venue,
             'reviews': reviews_page,
-            'avg_rating': stats['avg_rating'] or 0,
-            'total_reviews': stats['total_count'] or 0,
-            'rating_breakdown': rating_breakdown,
+            'avg_rating': summary.average,
+            'total_reviews': summary.review_count,
+            'rating_breakdown': summary.breakdown(),
             'can_review': can_review,
             'has_reviewed': has_reviewed,
             'user_votes': user_votes,
+            'sort': sort,
         }
         return render(request, 'reviews/venue_reviews.html', context)
 
@@ -692,93 +701,111 @@ class VenueAllReviewsView(View):
 # ─────────────────────────────────────────────
 
 class ModerationDashboardView(AdminRequiredMixin, TemplateView):
+    """Reviews and comments awaiting a decision, newest first, a keyset page at a time"""
     template_name = 'reviews/moderation_dashboard.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-
-        # Get pending reviews and comments for moderation
+        params = self.request.GET
+        kind = params.get('kind', '')
+        status = params.get('status', Review.Status.PENDING)
+        if status not in Review.Status.values:
+            status = Review.Status.PENDING
+        target = params.get('target', '')
+        rating = params.get('rating', '')
+        rating = int(rating) if rating.isdigit() else None
+
+        sources = []
+        if kind in ('', 'review'):
+            sources.append(('review', review_queue(status, target, rating)))
+        # Comments belong to events and carry no rating
+        if kind in ('', 'comment') and target != 'venue' and rating is None:
+            sources.append(('comment', comment_queue(status)))
+        page = keyset_merge(sources, cursor=decode_cursor(params.get('after')))
+
+        review_counts = Review.objects.aggregate(
+            pending=Count('pk', filter=Q(status=Review.Status.PENDING)),
+            approved=Count('pk', filter=Q(status=Review.Status.APPROVED)),
+            rejected=Count('pk', filter=Q(status=Review.Status.REJECTED)),
+        )
         context.update({
-            'pending_reviews': Review.objects.filter(status='pending').select_related('user', 'event', 'venue').order_by('-created_at'),
-            'pending_comments': Comment.objects.filter(status='pending').select_related('user', 'event').order_by('-created_at'),
-            'recent_approved_reviews': Review.objects.filter(status='approved').select_related('user', 'event', 'venue').order_by('-updated_at')[:10],
-            'recent_rejected_reviews': Review.objects.filter(status='rejected').select_related('user', 'event', 'venue').order_by('-updated_at')[:10],
-            'total_pending_reviews': Review.objects.filter(status='pending').count(),
-            'total_pending_comments': Comment.objects.filter(status='pending').count(),
-            'total_approved_reviews': Review.objects.filter(status='approved').count(),
-            'total_rejected_reviews': Review.objects.filter(status='rejected').count(),
+            'entries': page.entries,
+            'next_cursor': page.next_cursor,
+            'is_first_page': not params.get('after'),
+            'query_string': build_query_string(self.request, exclude_params=['after']),
+            'filters': {'kind': kind, 'status': status, 'target': target, 'rating': rating},
+            'status_choices': Review.Status.choices,
+            'spam_threshold': settings.MODERATION_SPAM_THRESHOLD,
+            'recent_approved_reviews': Review.objects.filter(status=Review.Status.APPROVED).select_related('user', 'event', 'venue').order_by('-updated_at')[:10],
+            'recent_rejected_reviews': Review.objects.filter(status=Review.Status.REJECTED).select_related('user', 'event', 'venue').order_by('-updated_at')[:10],
+            'total_pending_reviews': review_counts['pending'],
+            'total_pending_comments': Comment.objects.filter(status=Comment.Status.PENDING).count(),
+            'total_approved_reviews': review_counts['approved'],
+            'total_rejected_reviews': review_counts['rejected'],
         })
 
         return context
 
 
-class ApproveReviewView(AdminRequiredMixin, View):
-    def post(self, request, pk):
-        try:
-            review = get_object_or_404(Review, pk=pk)
-            review.status = 'approved'
-            review.save()
+class BulkModerationView(AdminRequiredMixin, View):
+    def post(self, request):
+        """Approve or reject a batch of reviews and comments in one transaction each"""
+        action = request.POST.get('action')
+        notes = request.POST.get('notes', '').strip()
+        review_ids = [pk for pk in request.POST.getlist('review_ids') if pk.isdigit()]
+        comment_ids = [pk for pk in request.POST.getlist('comment_ids') if pk.isdigit()]
+        redirect_url = reverse('reviews:moderation_dashboard')
+        query = request.POST.get('query', '')
+        if query:
+            redirect_url = f'{redirect_url}?{query}'
 
-            return JsonResponse({
-                'success': True,
-                'message': 'Review approved successfully'
-            })
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'error': str(e)
-            }, status=400)
+        if not review_ids and not comment_ids:
+            messages.warning(request, 'Select at least one review or comment.')
+            return redirect(redirect_url)
 
+        statuses = {'approve': Review.Status.APPROVED, 'reject': Review.Status.REJECTED}
+        if action not in statuses:
+            messages.error(request, 'Unknown action.')
+            return redirect(redirect_url)
 
-class RejectReviewView(AdminRequiredMixin, View):
-    def post(self, request, pk):
-        try:
-            review = get_object_or_404(Review, pk=pk)
-            review.status = 'rejected'
-            review.save()
+        reviews = moderate_reviews(request.user, review_ids, statuses[action], notes) if review_ids else []
+        comments = moderate_comments(request.user, comment_ids, statuses[action], notes) if comment_ids else []
+        verb = 'approved' if action == 'approve' else 'rejected'
+        messages.success(request, f'{len(reviews)} review(s) and {len(comments)} comment(s) {verb}.')
+        return redirect(redirect_url)
 
-            return JsonResponse({
-                'success': True,
-                'message': 'Review rejected successfully'
-            })
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'error': str(e)
-            }, status=400)
 
+class ModerateItemView(AdminRequiredMixin, View):
+    """Approve or reject a single review or comment from the dashboard"""
+    model = None
+    status = None
 
-class ApproveCommentView(AdminRequiredMixin, View):
     def post(self, request, pk):
-        try:
-            comment = get_object_or_404(Comment, pk=pk)
-            comment.status = 'approved'
-            comment.save()
+        item = get_object_or_404(self.model, pk=pk)
+        notes = request.POST.get('notes', '').strip()
+        moderate = moderate_reviews if self.model is Review else moderate_comments
+        moderate(request.user, [item.pk], self.status, notes)
+        return JsonResponse({
+            'success': True,
+            'message': f'{self.model._meta.verbose_name.capitalize()} {self.status.label.lower()} successfully'
+        })
 
-            return JsonResponse({
-                'success': True,
-                'message': 'Comment approved successfully'
-            })
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'error': str(e)
-            }, status=400)
 
+class ApproveReviewView(ModerateItemView):
+    model = Review
+    status = Review.Status.APPROVED
 
-class RejectCommentView(AdminRequiredMixin, View):
-    def post(self, request, pk):
-        try:
-            comment = get_object_or_404(Comment, pk=pk)
-            comment.status = 'rejected'
-            comment.save()
 
-            return JsonResponse({
-                'success': True,
-                'message': 'Comment rejected successfully'
-            })
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'error': str(e)
-            }, status=400)
+class RejectReviewView(ModerateItemView):
+    model = Review
+    status = Review.Status.REJECTED
+
+
+class ApproveCommentView(ModerateItemView):
+    model = Comment
+    status = Comment.Status.APPROVED
+
+
+class RejectCommentView(ModerateItemView):
+    model = Comment
+    status = Comment.Status.REJECTED
@@ -9,7 +9,8 @@ from django.contrib import messages
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.http import JsonResponse
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from apps.core import outbox
 from .models import User, RoleUpgradeRequest
 from .forms import CustomUserCreationForm, ProfileUpdateForm, RoleUpgradeRequestForm
 
@@ -116,7 +117,13 @@ class RoleUpgradeRequestView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.user = self.request.user
-        response = super().form_valid(form)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            # Admins are emailed from the outbox, not while the user waits
+            outbox.publish(outbox.message(self.object, outbox.ROLE_UPGRADE_REQUESTED, {
+                'username': self.request.user.username,
+                'requested_role': self.object.get_requested_role_display(),
+            }))
         messages.success(self.request, 'Your role upgrade request has been submitted for review.')
         return response
     
@@ -0,0 +1,183 @@
+"""
+Approval workflow for venue booking requests.
+
+Approvals and rejections are applied with bulk ``UPDATE`` statements inside a
+single transaction, so a manager can clear hundreds of requests in one POST.
+Approving a request automatically rejects every pending request that overlaps
+it at the same venue. A request ending at or before its start time runs past
+midnight into the next day.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.analytics.occupancy import refresh_on_commit
+from apps.core.models import Notification
+from .models import Venue, VenueBookingRequest
+
+
+CONFLICT_NOTE = 'Automatically rejected: the requested time overlaps an approved booking.'
+
+
+def _span(booking):
+    start = datetime.combine(booking.booking_date, booking.start_time)
+    end = datetime.combine(booking.booking_date, booking.end_time)
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+def _overlaps(booking, other):
+    start, end = _span(booking)
+    other_start, other_end = _span(other)
+    return start < other_end and other_start < end
+
+
+def _notify(bookings, reviewer, approved):
+    """Tell each requester about the decision on their booking request."""
+    if approved:
+        notification_type = Notification.NotificationType.VENUE_BOOKING_APPROVED
+        verb = 'approved'
+    else:
+        notification_type = Notification.NotificationType.VENUE_BOOKING_REJECTED
+        verb = 'rejected'
+
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=booking.requester_id,
+            admin_user=reviewer,
+            notification_type=notification_type,
+            subject=f'Booking Request {verb.capitalize()}: {booking.venue.name}',
+            message=(
+                f'Your booking request for "{booking.event_name}" at {booking.venue.name} '
+                f'on {booking.booking_date:%b %d, %Y} has been {verb}.'
+                + (f'\n\nNotes: {booking.review_notes}' if booking.review_notes else '')
+            ),
+            venue_id=booking.venue_id,
+            details={
+                'booking_id': booking.pk,
+                'event_name': booking.event_name,
+                'booking_date': booking.booking_date.isoformat(),
+            },
+        )
+        for booking in bookings
+    ])
+
+
+def _refresh_occupancy(bookings):
+    days_by_venue = defaultdict(set)
+    for booking in bookings:
+        days_by_venue[booking.venue_id].add(booking.booking_date)
+    for venue_id, days in days_by_venue.items():
+        refresh_on_commit(venue_id, days)
+
+
+def _attach_venues(bookings):
+    """Load the venues of ``bookings`` with one query instead of one per booking."""
+    venues = Venue.objects.in_bulk({booking.venue_id for booking in bookings})
+    for booking in bookings:
+        booking.venue = venues[booking.venue_id]
+
+
+def _mark(bookings, status, reviewer, notes, reviewed_at):
+    VenueBookingRequest.objects.filter(pk__in=[booking.pk for booking in bookings]).update(
+        status=status,
+        reviewed_by=reviewer,
+        reviewed_at=reviewed_at,
+        review_notes=notes,
+    )
+    for booking in bookings:
+        booking.status = status
+        booking.review_notes = notes
+
+
+def approve_booking_requests(reviewer, booking_ids, notes=''):
+    """
+    Approve the reviewer's pending requests in ``booking_ids``.
+
+    Requests are approved oldest first. A request that overlaps an already
+    approved booking, or one approved earlier in the same batch, is rejected
+    instead, as is every other pending request that overlaps a newly approved
+    one. Returns ``(approved, rejected)`` lists of booking requests.
+    """
+    reviewed_at = timezone.now()
+
+    with transaction.atomic():
+        selected = list(
+            VenueBookingRequest.objects.select_for_update(of=('self',)).filter(
+                pk__in=booking_ids,
+                venue__manager=reviewer,
+                status=VenueBookingRequest.Status.PENDING,
+            ).order_by('created_at', 'pk')
+        )
+        if not selected:
+            return [], []
+
+        # Every approved or pending request at the selection's venues on its days or either side of
+        # them, where overnight bookings reach into or over from
+        days = {booking.booking_date + timedelta(days=shift) for booking in selected for shift in (-1, 0, 1)}
+        candidates = VenueBookingRequest.objects.select_for_update().filter(
+            venue_id__in={booking.venue_id for booking in selected},
+            booking_date__in=days,
+            status__in=[VenueBookingRequest.Status.APPROVED, VenueBookingRequest.Status.PENDING],
+        ).exclude(pk__in=[booking.pk for booking in selected])
+
+        taken = defaultdict(list)
+        pending = defaultdict(list)
+        for booking in candidates:
+            if booking.status == VenueBookingRequest.Status.APPROVED:
+                taken[booking.venue_id].append(booking)
+            else:
+                pending[booking.venue_id].append(booking)
+
+        approved = []
+        rejected = []
+        for booking in selected:
+            if any(_overlaps(booking, other) for other in taken[booking.venue_id]):
+                rejected.append(booking)
+                continue
+            approved.append(booking)
+            taken[booking.venue_id].append(booking)
+
+        rejected_ids = {booking.pk for booking in rejected}
+        for booking in approved:
+            for other in pending[booking.venue_id]:
+                if other.pk not in rejected_ids and _overlaps(booking, other):
+                    rejected.append(other)
+                    rejected_ids.add(other.pk)
+
+        _mark(approved, VenueBookingRequest.Status.APPROVED, reviewer, notes, reviewed_at)
+        _mark(rejected, VenueBookingRequest.Status.REJECTED, reviewer, CONFLICT_NOTE, reviewed_at)
+
+        _attach_venues(approved + rejected)
+        _notify(approved, reviewer, approved=True)
+        _notify(rejected, reviewer, approved=False)
+        _refresh_occupancy(approved + rejected)
+
+    return approved, rejected
+
+
+def reject_booking_requests(reviewer, booking_ids, notes=''):
+    """Reject the reviewer's pending requests in ``booking_ids``. Returns the rejected requests."""
+    reviewed_at = timezone.now()
+
+    with transaction.atomic():
+        rejected = list(
+            VenueBookingRequest.objects.select_for_update(of=('self',)).filter(
+                pk__in=booking_ids,
+                venue__manager=reviewer,
+                status=VenueBookingRequest.Status.PENDING,
+            )
+        )
+        if not rejected:
+            return []
+
+        _mark(rejected, VenueBookingRequest.Status.REJECTED, reviewer, notes, reviewed_at)
+        _attach_venues(rejected)
+        _notify(rejected, reviewer, approved=False)
+        _refresh_occupancy(rejected)
+
+    return rejected
+
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0003_alter_venuebookingrequest_requester'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venuebookingrequest',
+            index=models.Index(fields=['requester', '-created_at', '-id'], name='venues_booking_requester_hist'),
+        ),
+    ]
@@ -160,6 +160,9 @@ class VenueBookingRequest(TimeStampedModel):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['requester', '-created_at', '-id'], name='venues_booking_requester_hist'),
+        ]
     
     def __str__(self):
         return f"{self.event_name} at {self.venue.name} - {self.get_status_display()}"
@@ -1,3 +1,88 @@
-from django.test import TestCase
+from datetime import time, timedelta
 
-# Create your tests here.
+from django.urls import reverse
+
+from apps.analytics.models import VenueOccupancy
+from apps.core.models import Notification
+from apps.payments.tests import OrderTestCase
+from apps.users.models import User
+from .bookings import CONFLICT_NOTE, approve_booking_requests, reject_booking_requests
+from .models import VenueBookingRequest
+
+
+class BookingQueueTests(OrderTestCase):
+    def book(self, start, end, days=10, status=VenueBookingRequest.Status.PENDING):
+        return VenueBookingRequest.objects.create(
+            venue=self.venue, requester=self.planner, event_name='Gig', event_description='-',
+            booking_date=self.event.event_date + timedelta(days=days), start_time=time(start), end_time=time(end),
+            expected_attendees=50, status=status,
+        )
+
+    def statuses(self, *bookings):
+        return [VenueBookingRequest.objects.get(pk=booking.pk).status for booking in bookings]
+
+    def test_approving_rejects_overlapping_requests(self):
+        first = self.book(10, 14)
+        overlapping = self.book(13, 16)
+        later = self.book(14, 18)
+        other_day = self.book(10, 14, days=11)
+
+        approved, rejected = approve_booking_requests(self.venue.manager, [first.pk])
+        self.assertEqual((approved, rejected), ([first], [overlapping]))
+        self.assertEqual(
+            self.statuses(first, overlapping, later, other_day),
+            ['approved', 'rejected', 'pending', 'pending'],
+        )
+        self.assertEqual(VenueBookingRequest.objects.get(pk=overlapping.pk).review_notes, CONFLICT_NOTE)
+
+    def test_overnight_bookings_overlap_across_midnight(self):
+        overnight = self.book(22, 2)
+        same_evening = self.book(20, 23)
+        next_morning = self.book(1, 3, days=11)
+        after = self.book(2, 6, days=11)
+        approved, rejected = approve_booking_requests(self.venue.manager, [overnight.pk])
+        self.assertEqual((approved, sorted(rejected, key=lambda booking: booking.pk)), ([overnight], [same_evening, next_morning]))
+        self.assertEqual(self.statuses(after), ['pending'])
+
+        previous_night = self.book(23, 1, days=9)
+        self.assertEqual(approve_booking_requests(self.venue.manager, [previous_night.pk]), ([previous_night], []))
+
+    def test_batches_approve_oldest_first(self):
+        first = self.book(10, 14)
+        second = self.book(12, 16)
+        approved, rejected = approve_booking_requests(self.venue.manager, [second.pk, first.pk])
+        self.assertEqual((approved, rejected), ([first], [second]))
+
+    def test_requests_overlapping_an_approval_are_rejected(self):
+        self.book(10, 14, status=VenueBookingRequest.Status.APPROVED)
+        late = self.book(12, 16)
+        self.assertEqual(approve_booking_requests(self.venue.manager, [late.pk]), ([], [late]))
+
+    def test_managers_only_review_their_own_venues(self):
+        booking = self.book(10, 14)
+        stranger = User.objects.create_user('stranger', 'stranger@example.com', 'pw', role='venue_manager')
+        self.assertEqual(approve_booking_requests(stranger, [booking.pk]), ([], []))
+        self.assertEqual(reject_booking_requests(stranger, [booking.pk], 'No'), [])
+        self.assertEqual(self.statuses(booking), ['pending'])
+
+    def test_decisions_notify_requesters_and_refresh_occupancy(self):
+        first = self.book(10, 14)
+        second = self.book(18, 20)
+        with self.captureOnCommitCallbacks(execute=True):
+            approve_booking_requests(self.venue.manager, [first.pk])
+            reject_booking_requests(self.venue.manager, [second.pk], 'Closed for maintenance')
+        self.assertEqual(
+            sorted(Notification.objects.filter(recipient=self.planner).values_list('notification_type', flat=True)),
+            [Notification.NotificationType.VENUE_BOOKING_APPROVED, Notification.NotificationType.VENUE_BOOKING_REJECTED],
+        )
+        occupancy = VenueOccupancy.objects.get(venue=self.venue, month=first.booking_date.replace(day=1))
+        self.assertEqual(occupancy.bookings_count, 1)
+
+    def test_bulk_rejections_need_a_reason(self):
+        booking = self.book(10, 14)
+        self.client.force_login(self.venue.manager)
+        url = reverse('venues:bulk_booking_action')
+        self.client.post(url, {'action': 'reject', 'booking_ids': [booking.pk]})
+        self.assertEqual(self.statuses(booking), ['pending'])
+        self.client.post(url, {'action': 'reject', 'booking_ids': [booking.pk], 'notes': 'Closed'})
+        self.assertEqual(self.statuses(booking), ['rejected'])
@@ -25,6 +25,7 @@ urlpatterns = [
     path('manage/bookings/', views.VenueBookingsView.as_view(), name='venue_bookings'),
     path('booking-request/<int:pk>/approve/', views.ApproveBookingRequestView.as_view(), name='approve_booking'),
     path('booking-request/<int:pk>/reject/', views.RejectBookingRequestView.as_view(), name='reject_booking'),
+    path('booking-request/bulk/', views.BulkBookingRequestActionView.as_view(), name='bulk_booking_action'),
     
     # Availability management
     path('manage/availability/', views.ManageVenueAvailabilityView.as_view(), name='manage_availability'),
@@ -5,10 +5,15 @@ from django.contrib import messages
 from django.urls import reverse_lazy, reverse
 from django.db.models import Count, Sum, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.http import JsonResponse
+from django.db import transaction
+from apps.core import outbox
 from apps.core.pagination import CONTENT_CARDS_PER_PAGE, build_query_string, paginate_queryset
+from .bookings import approve_booking_requests, reject_booking_requests
 from .models import Venue, VenueImage, VenueBookingRequest
 from apps.events.models import Event
+from apps.reviews.models import Review
 
 
 class VenueListView(ListView):
@@ -366,14 +371,65 @@ class DeleteVenueView(VenueManagerRequiredMixin, DeleteView):
         messages.success(request, f'Venue "{venue.name}" has been deleted successfully.')
         return super().delete(request, *args, **kwargs)
 
-class VenueBookingsView(VenueManagerRequiredMixin, TemplateView):
+class VenueBookingsView(VenueManagerRequiredMixin, ListView):
+    """Paginated, filterable queue of booking requests for the manager's venues"""
     template_name = 'venues/venue_bookings.html'
+    context_object_name = 'booking_requests'
+    paginate_by = CONTENT_CARDS_PER_PAGE
+    
+    def get_queryset(self):
+        queryset = VenueBookingRequest.objects.filter(
+            venue__manager=self.request.user
+        ).select_related('venue', 'requester')
+        
+        status = self.request.GET.get('status')
+        if status in VenueBookingRequest.Status.values:
+            queryset = queryset.filter(status=status)
+        
+        venue_id = self.request.GET.get('venue')
+        if venue_id and venue_id.isdigit():
+            queryset = queryset.filter(venue_id=venue_id)
+        
+        date_from = self._date_param('date_from')
+        if date_from:
+            queryset = queryset.filter(booking_date__gte=date_from)
+        
+        date_to = self._date_param('date_to')
+        if date_to:
+            queryset = queryset.filter(booking_date__lte=date_to)
+        
+        return queryset.order_by('-created_at')
+    
+    def _date_param(self, name):
+        try:
+            return parse_date(self.request.GET.get(name) or '')
+        except ValueError:
+            return None
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['booking_requests'] = VenueBookingRequest.objects.filter(
+        
+        counts = VenueBookingRequest.objects.filter(
             venue__manager=self.request.user
-        ).order_by('-created_at')
+        ).aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status=VenueBookingRequest.Status.PENDING)),
+            approved=Count('id', filter=Q(status=VenueBookingRequest.Status.APPROVED)),
+        )
+        
+        context.update({
+            'total_count': counts['total'],
+            'pending_count': counts['pending'],
+            'approved_count': counts['approved'],
+            'venues': Venue.objects.filter(manager=self.request.user).order_by('name'),
+            'statuses': VenueBookingRequest.Status.choices,
+            'current_status': self.request.GET.get('status', ''),
+            'current_venue': self.request.GET.get('venue', ''),
+            'current_date_from': self.request.GET.get('date_from', ''),
+            'current_date_to': self.request.GET.get('date_to', ''),
+            'pagination_query': build_query_string(self.request, ['page']),
+            'current_query': self.request.GET.urlencode(),
+        })
         return context
 
 class ApproveBookingRequestView(VenueManagerRequiredMixin, View):
@@ -386,17 +442,25 @@ class ApproveBookingRequestView(VenueManagerRequiredMixin, View):
         )
         
         try:
-            booking_request.status = 'approved'
-            booking_request.reviewed_at = timezone.now()
-            booking_request.reviewed_by = request.user
-            booking_request.review_notes = request.POST.get('notes', '')
-            booking_request.save()
-            
-            messages.success(
-                request, 
-                f'Booking request for "{booking_request.event_name}" has been approved.'
+            approved, rejected = approve_booking_requests(
+                request.user, [booking_request.pk], request.POST.get('notes', '')
             )
             
+            if approved:
+                messages.success(
+                    request, 
+                    f'Booking request for "{booking_request.event_name}" has been approved.'
+                )
+                if rejected:
+                    messages.info(request, f'{len(rejected)} overlapping request(s) were rejected automatically.')
+            elif rejected:
+                messages.warning(
+                    request,
+                    f'Booking request for "{booking_request.event_name}" overlaps an approved booking and was rejected.'
+                )
+            else:
+                messages.info(request, f'Booking request for "{booking_request.event_name}" is no longer pending.')
+            
             return redirect('venues:venue_bookings')
             
         except Exception as e:
@@ -413,11 +477,7 @@ class RejectBookingRequestView(VenueManagerRequiredMixin, View):
         )
         
         try:
-            booking_request.status = 'rejected'
-            booking_request.reviewed_at = timezone.now()
-            booking_request.reviewed_by = request.user
-            booking_request.review_notes = request.POST.get('notes', '')
-            booking_request.save()
+            reject_booking_requests(request.user, [booking_request.pk], request.POST.get('notes', ''))
             
             messages.info(
                 request, 
@@ -430,111 +490,146 @@ class RejectBookingRequestView(VenueManagerRequiredMixin, View):
             messages.error(request, f'Error rejecting booking request: {str(e)}')
             return redirect('venues:venue_bookings')
 
+class BulkBookingRequestActionView(VenueManagerRequiredMixin, View):
+    def post(self, request):
+        """Approve or reject a batch of venue booking requests in one transaction"""
+        action = request.POST.get('action')
+        notes = request.POST.get('notes', '').strip()
+        booking_ids = [pk for pk in request.POST.getlist('booking_ids') if pk.isdigit()]
+        redirect_url = reverse('venues:venue_bookings')
+        query = request.POST.get('query', '')
+        if query:
+            redirect_url = f'{redirect_url}?{query}'
+        
+        if not booking_ids:
+            messages.warning(request, 'Select at least one booking request.')
+            return redirect(redirect_url)
+        
+        if action == 'approve':
+            approved, rejected = approve_booking_requests(request.user, booking_ids, notes)
+            messages.success(request, f'{len(approved)} booking request(s) approved.')
+            if rejected:
+                messages.info(request, f'{len(rejected)} overlapping request(s) were rejected automatically.')
+        elif action == 'reject':
+            if not notes:
+                messages.error(request, 'Please provide a reason for rejection.')
+                return redirect(redirect_url)
+            rejected = reject_booking_requests(request.user, booking_ids, notes)
+            messages.info(request, f'{len(rejected)} booking request(s) rejected.')
+        else:
+            messages.error(request, 'Unknown action.')
+        
+        return redirect(redirect_url)
+
 class ManageVenueAvailabilityView(VenueManagerRequiredMixin, TemplateView):
     template_name = 'venues/manage_availability.html'
 
 class VenueAnalyticsView(VenueManagerRequiredMixin, TemplateView):
     template_name = 'venues/analytics.html'
+    periods = {7: 'Last 7 Days', 30: 'Last 30 Days', 90: 'Last 3 Months', 365: 'Last Year'}
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
-        # Get venues for the current user
-        user_venues = Venue.objects.filter(manager=self.request.user)
-        
-        # Calculate analytics data
-        from django.utils import timezone
         from datetime import timedelta
-        from django.db.models import Sum, Count, Avg
-        
-        # Date range for analytics (last 30 days by default)
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=30)
+        from django.db.models import Avg
+        from apps.analytics.occupancy import (
+            add_months, booking_minutes, booking_value, month_start, monthly_revenue, summarize_occupancy,
+        )
         
-        # Sample data - in real implementation, this would come from booking models
-        total_bookings = 0
-        total_revenue = 0
-        total_guests = 0
+        # Get venues for the current user
+        user_venues = list(Venue.objects.filter(manager=self.request.user))
         
-        # Try to get real data from events if available
         try:
-            from apps.events.models import Event
-            venue_events = Event.objects.filter(
-                venue__in=user_venues,
-                event_date__range=[start_date, end_date]
-            )
-            total_bookings = venue_events.count()
-            # Estimate revenue based on events (this would be from actual booking records)
-            total_revenue = total_bookings * 1500  # Average revenue per event
-        except:
-            # Fallback to sample data
-            total_bookings = 24
-            total_revenue = 36000
-        
-        total_guests = total_bookings * 150  # Average guests per event
+            period = int(self.request.GET.get('period', 30))
+        except (TypeError, ValueError):
+            period = 30
+        if period not in self.periods:
+            period = 30
         
-        # Calculate average rating
-        try:
-            average_rating = user_venues.aggregate(
-                avg_rating=Avg('reviews__rating')
-            )['avg_rating'] or 4.2
-        except:
-            average_rating = 4.2
-        
-        # Sample recent bookings data
-        recent_bookings = [
-            {
-                'event_title': 'Corporate Annual Meeting',
-                'organizer_name': 'Tech Solutions Inc',
-                'event_date': timezone.now().date() - timedelta(days=2),
-                'duration': 8,
-                'guest_count': 200,
-                'revenue': 2400,
-                'status': 'success',
-                'status_display': 'Completed'
-            },
-            {
-                'event_title': 'Wedding Reception',
-                'organizer_name': 'Sarah & Mike Johnson',
-                'event_date': timezone.now().date() - timedelta(days=5),
-                'duration': 6,
-                'guest_count': 150,
-                'revenue': 1800,
-                'status': 'success',
-                'status_display': 'Completed'
-            },
-            {
-                'event_title': 'Product Launch Event',
-                'organizer_name': 'Marketing Pro Ltd',
-                'event_date': timezone.now().date() + timedelta(days=10),
-                'duration': 4,
-                'guest_count': 100,
-                'revenue': 1200,
-                'status': 'warning',
-                'status_display': 'Confirmed'
-            },
-        ]
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=period - 1)
+        summary = summarize_occupancy(user_venues, start_date, end_date)
+        
+        # Revenue per month for the trailing year, read from the precomputed rows
+        current_month = month_start(end_date)
+        revenue_series = monthly_revenue(user_venues, add_months(current_month, -11), current_month)
+        revenue_by_month = dict(revenue_series)
+        this_month = revenue_by_month[current_month]
+        last_month = revenue_by_month[add_months(current_month, -1)]
+        this_quarter = sum(revenue_by_month[add_months(current_month, -offset)] for offset in range(3))
+        last_quarter = sum(revenue_by_month[add_months(current_month, -offset)] for offset in range(3, 6))
+        
+        average_rating = Review.objects.filter(
+            venue__in=user_venues,
+            status=Review.Status.APPROVED,
+        ).aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
+        
+        status_badges = {
+            VenueBookingRequest.Status.APPROVED: 'success',
+            VenueBookingRequest.Status.PENDING: 'warning',
+        }
+        recent_bookings = []
+        for booking in VenueBookingRequest.objects.filter(
+            venue__in=user_venues
+        ).select_related('venue', 'requester').order_by('-booking_date', '-start_time')[:10]:
+            recent_bookings.append({
+                'event_title': booking.event_name,
+                'organizer_name': booking.requester.get_full_name() or booking.requester.username,
+                'event_date': booking.booking_date,
+                'duration': round(booking_minutes(booking.start_time, booking.end_time) / 60, 1),
+                'guest_count': booking.expected_attendees,
+                'revenue': booking_value(
+                    booking.quoted_price, booking.venue.hourly_rate, booking.start_time, booking.end_time
+                ),
+                'status': status_badges.get(booking.status, 'danger'),
+                'status_display': booking.get_status_display(),
+            })
+        
+        event_types = Event.objects.filter(
+            venue__in=user_venues,
+            event_date__range=[start_date, end_date],
+        ).exclude(status=Event.Status.CANCELLED).values('category__name').annotate(
+            total=Count('id')
+        ).order_by('-total')
         
         context.update({
-            'total_bookings': total_bookings,
-            'total_revenue': total_revenue,
-            'total_guests': total_guests,
+            'period': period,
+            'period_label': self.periods[period],
+            'periods': self.periods.items(),
+            'total_bookings': summary['bookings'],
+            'total_revenue': summary['revenue'],
+            'total_guests': summary['guests'],
+            'booked_hours': summary['booked_minutes'] / 60,
+            'average_booking_value': summary['revenue'] / summary['bookings'] if summary['bookings'] else 0,
+            'events_hosted': sum(row['total'] for row in event_types),
             'average_rating': round(average_rating, 1),
             'recent_bookings': recent_bookings,
-            'utilization_percentage': 78,
-            'weekday_utilization': 65,
-            'weekend_utilization': 88,
-            'monthly_progress': 82,
-            'quarterly_progress': 70,
-            'venue_rental': total_revenue * 0.7,
-            'catering_revenue': total_revenue * 0.2,
-            'av_equipment': total_revenue * 0.05,
-            'extras': total_revenue * 0.05,
-            'projected_monthly': total_revenue * 1.3,
+            'utilization_percentage': summary['utilization'],
+            'weekday_utilization': summary['weekday_utilization'],
+            'weekend_utilization': summary['weekend_utilization'],
+            'monthly_progress': self._progress(this_month, last_month),
+            'quarterly_progress': self._progress(this_quarter, last_quarter),
+            'projected_monthly': this_month,
+            'revenue_chart': {
+                'labels': [month.strftime('%b %Y') for month, _ in revenue_series],
+                'data': [float(amount) for _, amount in revenue_series],
+            },
+            'bookings_by_weekday': summary['bookings_by_weekday'],
+            'event_types_chart': {
+                'labels': [row['category__name'] for row in event_types],
+                'data': [row['total'] for row in event_types],
+            },
             'user_venues': user_venues,
         })
         
         return context
+    
+    @staticmethod
+    def _progress(current, previous):
+        """Revenue so far as a percentage of the previous period, capped at 100"""
+        if not previous:
+            return 100 if current else 0
+        return min(100, round(current * 100 / previous))
 
 class BookVenueView(LoginRequiredMixin, DetailView):
     model = Venue
@@ -554,18 +649,24 @@ class BookVenueView(LoginRequiredMixin, DetailView):
         venue = self.get_object()
         
         try:
-            # Create booking request
-            booking_request = VenueBookingRequest.objects.create(
-                venue=venue,
-                requester=request.user,
-                event_name=request.POST.get('event_title'),
-                event_description=request.POST.get('event_description', ''),
-                booking_date=request.POST.get('start_date'),
-                start_time=request.POST.get('start_time'),
-                end_time=request.POST.get('end_time'),
-                expected_attendees=request.POST.get('expected_guests'),
-                status='pending'
-            )
+            # Create booking request; the venue manager is notified from the outbox
+            with transaction.atomic():
+                booking_request = VenueBookingRequest.objects.create(
+                    venue=venue,
+                    requester=request.user,
+                    event_name=request.POST.get('event_title'),
+                    event_description=request.POST.get('event_description', ''),
+                    booking_date=request.POST.get('start_date'),
+                    start_time=request.POST.get('start_time'),
+                    end_time=request.POST.get('end_time'),
+                    expected_attendees=request.POST.get('expected_guests'),
+                    status='pending'
+                )
+                outbox.publish(outbox.message(
+                    booking_request,
+                    outbox.VENUE_BOOKING_REQUESTED,
+                    {'booking_id': booking_request.pk},
+                ))
             
             messages.success(
                 request, 
@@ -5,3 +5,7 @@ echo "Running collectstatic..."
 python3 manage.py collectstatic --noinput --clear
 echo "Running migrations..."
 python3 manage.py migrate
+echo "Creating cache table..."
+python3 manage.py createcachetable
+echo "Backfilling venue occupancy..."
+python3 manage.py rebuild_venue_occupancy --missing
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'horizon_planner.settings')
 
 application = get_asgi_application()
+
+# Periodic reaper for abandoned checkouts; a no-op unless REAPER_INTERVAL_SECONDS is set
+from apps.payments.reaper import start_scheduler  # noqa: E402
+
+start_scheduler()
@@ -141,6 +141,13 @@ if (BASE_DIR / 'static').exists():
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered ticket PDFs and QR codes, kept on local disk and keyed by content hash
+TICKET_PDF_ROOT = config('TICKET_PDF_ROOT', default=str(BASE_DIR / 'media' / 'ticket_pdfs'))
+QR_CACHE_ROOT = config('QR_CACHE_ROOT', default=str(BASE_DIR / 'media' / 'qr'))
+
+# Key for signing ticket check-in tokens; falls back to SECRET_KEY. Changing it invalidates issued tickets
+TICKET_SIGNING_KEY = config('TICKET_SIGNING_KEY', default=None)
+
 # Cloudinary configuration
 if config('CLOUDINARY_URL', default=None):
     DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
@@ -159,6 +166,75 @@ LOGOUT_REDIRECT_URL = 'core:home'
 # Card grids across the site show this many items per page
 CONTENT_CARDS_PER_PAGE = 15
 
+# Checkout idempotency keys are remembered for this many hours before being swept
+CHECKOUT_IDEMPOTENCY_TTL_HOURS = 24
+
+# Pending Cash on Delivery orders expire, and unpaid tickets are deleted, after these many hours
+PENDING_ORDER_TTL_HOURS = config('PENDING_ORDER_TTL_HOURS', default=48, cast=int)
+ABANDONED_TICKET_TTL_HOURS = config('ABANDONED_TICKET_TTL_HOURS', default=24, cast=int)
+
+# Send outbox messages from a thread in each web process as soon as they commit. Off by default: serverless
+# functions freeze between requests, so messages are sent by dispatch_outbox run from cron or a worker
+OUTBOX_DISPATCH_IN_PROCESS = config('OUTBOX_DISPATCH_IN_PROCESS', default=False, cast=bool)
+
+# Cache shared by the web processes, since notification polling relies on every process seeing the same
+# invalidations. Defaults to a table in the database (created by createcachetable in build.sh); a
+# per-process backend such as LocMemCache only suits a single runserver
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('CACHE_LOCATION', default='django_cache'),
+    }
+}
+
+# Seconds a user's cached unread notification state lives without being invalidated
+NOTIFICATION_STATE_TTL = config('NOTIFICATION_STATE_TTL', default=300, cast=int)
+
+# Push new notifications to open pages over Server-Sent Events when served through ASGI: 'local' within
+# one process, 'postgres' across processes with LISTEN/NOTIFY; empty leaves browsers polling
+NOTIFICATION_PUSH_BACKEND = config('NOTIFICATION_PUSH_BACKEND', default='')
+# Seconds between keep-alive comments on idle notification streams
+NOTIFICATION_STREAM_HEARTBEAT = config('NOTIFICATION_STREAM_HEARTBEAT', default=15, cast=int)
+# Seconds over which bookings and comments of one kind about one event share a single notification
+NOTIFICATION_COLLAPSE_WINDOW = config('NOTIFICATION_COLLAPSE_WINDOW', default=3600, cast=int)
+# Hours a notification stays unread before build_notification_digests folds it into a digest
+NOTIFICATION_DIGEST_AFTER_HOURS = config('NOTIFICATION_DIGEST_AFTER_HOURS', default=24, cast=int)
+
+# Spread like and vote counter increments over this many rows per comment or review, folded back by
+# fold_counters; 0 updates the counter column directly
+COUNTER_SHARDS = config('COUNTER_SHARDS', default=0, cast=int)
+
+# New reviews and comments scored by the classifier that train_classifier saves to the database at
+# least this likely to be spam wait in the moderation queue instead of being published
+MODERATION_SPAM_THRESHOLD = config('MODERATION_SPAM_THRESHOLD', default=0.9, cast=float)
+
+# Run the reaper in each web process every this many seconds; 0 leaves it to reap_abandoned
+REAPER_INTERVAL_SECONDS = config('REAPER_INTERVAL_SECONDS', default=0, cast=int)
+
+# Node id (0-1023) embedded in order, ticket and payment references; each process leases
+# its own from the database when unset. Only pin it for a deployment running a single process
+REFERENCE_NODE_ID = config('REFERENCE_NODE_ID', default=None)
+
+# Card payment gateway; an empty backend offers Cash on Delivery only.
+# The local simulator is on by default while DEBUG is set.
+PAYMENT_GATEWAY = {
+    'BACKEND': config(
+        'PAYMENT_GATEWAY_BACKEND',
+        default='apps.payments.gateway.SimulatorGateway' if DEBUG else ''
+    ),
+    'OPTIONS': {
+        'latency_ms': config('PAYMENT_GATEWAY_LATENCY_MS', default=500, cast=int),
+        'failure_rate': config('PAYMENT_GATEWAY_FAILURE_RATE', default=0.05, cast=float),
+    },
+}
+
+# Threads per web process settling card payments and refunds. 0 (the default, since serverless functions
+# freeze between requests) leaves them to process_payments and process_refunds run from cron or a worker
+PAYMENT_WORKERS = config('PAYMENT_WORKERS', default=0, cast=int)
+
+# Bulk order and booking actions post one field per selected id
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 5000
+
 # Messages framework tags mapping to Bootstrap classes
 from django.contrib.messages import constants as messages
 MESSAGE_TAGS = {
@@ -15,3 +15,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'horizon_planner.settings')
 
 application = get_wsgi_application()
 app = application  # Required by Vercel
+
+# Periodic reaper for abandoned checkouts; a no-op unless REAPER_INTERVAL_SECONDS is set
+from apps.payments.reaper import start_scheduler  # noqa: E402
+
+start_scheduler()